@@ -7,382 +7,865 @@ CLIでの操作をサポートする.
 
 """
 
-from sys import argv, exit, stderr
-from time import sleep
-from mazegen.generator import MazeGenerator
-from dataclasses import dataclass
+import threading
+from argparse import ArgumentParser, Namespace
+from collections.abc import Callable, Iterable
+from contextlib import suppress
+from functools import partial
+from shutil import get_terminal_size
+from sys import exit, stderr, stdin
+from typing import TYPE_CHECKING, Any, Generic, TypeVar
+from mazegen.config import (
+    BINARY_SUFFIX,
+    MazeConfig,
+    config_error,
+    parse_config,
+)
+from mazegen.generator import GenerationCancelled, MazeGenerator
+from mazegen.headless import write_maze
+from mazegen.stats import MazeStats
+
+# asyncio(対話モード)、mazegen.batch(プロセスプール)、mazegen.cacheは
+# 使うモードの時だけ読み込む(--headlessの起動を速くするため)
+if TYPE_CHECKING:
+    import asyncio
+
+# パンのキー -> (横, 縦)の向き
+PAN_KEYS = {"w": (0, -1), "a": (-1, 0), "s": (0, 1), "d": (1, 0)}
+
+# 迷路を生成し直す(または終了する)ので、止めた迷路を表示しなくてよい操作
+# (表示はしないが、出力ファイルは完成させて保存してから行う)
+RESTART_OPERATIONS = frozenset("1456789")
+
+T = TypeVar("T")
 
 
-@dataclass
-class MazeConfig:
-    """迷路を生成するための設定.
+def save_to_file(
+    file_path: str,
+    hex_grid: Iterable[str],
+    entry_point: tuple[int, int],
+    exit_point: tuple[int, int],
+    path_str: str
+) -> int:
+    """迷路をファイルに保存する.
 
-    Attributes:
+    行をまとめて書き込み、書き終わってから出力先に置き換える
+    (拡張子が.gz, .xz, .lzmaなら圧縮する. mazegen.exportを参照).
+
+    Args:
+        file_path (str): 保存するファイルパス
+        hex_grid (Iterable[str]): 迷路のHexGrid(1行ずつ書き込む)
+        entry_point (tuple[int, int]): 入口の座標
+        exit_point (tuple[int, int]): 出口の座標
+        path_str (str): 迷路のパス
+
+    Returns:
+        int: 書き込んだバイト数.
+
+    Raises:
+        OSError: 書き込めなかった場合(出力先は変わらない).
+    """
+    from mazegen.export import write_maze_text
+
+    result = write_maze_text(
+        file_path, (row.encode("ascii") for row in hex_grid),
+        entry_point, exit_point, path_str
+    )
+    return result.bytes_written
+
+
+def parse_args() -> Namespace:
+    """コマンドライン引数を解析する.
+
+    Returns:
+        Namespace: 解析したコマンドライン引数.
+    """
+    parser = ArgumentParser(
+        prog="a_maze_ing.py",
+        usage="python3 a_maze_ing.py "
+        "[--headless | --stream | "
+        "--batch START-END [--output PATH] [--jobs N] [--analytics]] "
+        "[--stats] [--cache-dir DIR] <config_file>.txt"
+    )
+    parser.add_argument("config_file", help="迷路の設定ファイル")
+    # 描画しないモードは1つだけ選べる(どれもなければ対話モード)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--headless", action="store_true",
+        help="描画せずに生成して最短経路を求め、OUTPUT_FILEに書き込んで終了する"
+        "(大きさの制限なし. python3 -m mazegen と同じ)"
+    )
+    mode.add_argument(
+        "--stream", action="store_true",
+        help="描画せずに1行ずつ生成してOUTPUT_FILEに書き込む"
+        "(最短経路は出力しない)"
+    )
+    parser.add_argument(
+        "--stats", action="store_true",
+        help="迷路を生成するたびに処理ごとの時間とカウンタを表示する"
+    )
+    parser.add_argument(
+        "--cache-dir", default=None,
+        help="生成した迷路をこのディレクトリにも保存し、次回の起動でも使う"
+    )
+    mode.add_argument(
+        "--batch", metavar="START-END",
+        help="シード値START-END(両端を含む)の迷路を複数プロセスで生成する"
+    )
+    parser.add_argument(
+        "--output", default=None,
+        help="--batchの出力先. .zip/.tar/.tar.gz/.tgzならアーカイブ、"
+        "それ以外はディレクトリ(既定: mazes)"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=None,
+        help="--batchのプロセス数(既定: CPUの数)"
+    )
+    parser.add_argument(
+        "--analytics", action="store_true",
+        help="--batchで迷路ごとの指標(行き止まり、分岐、ループなど)を"
+        "analytics.jsonlに書き込む"
+    )
+    args = parser.parse_args()
+    if args.batch is None and (
+        args.output is not None or args.jobs is not None or args.analytics
+    ):
+        parser.error("--output, --jobs and --analytics require --batch")
+    if args.output is None:
+        args.output = "mazes"
+    return args
+
+
+def stream_to_file(config: MazeConfig) -> None:
+    """迷路を1行ずつ生成しながらファイルに書き込み、バイト数を表示する.
+
+    迷路全体を保持しないので、メモリは迷路の幅にのみ比例する.
+    最短経路は迷路全体がないと求められないため空にする.
+
+    Args:
+        config (MazeConfig): 迷路の設定.
+
+    Raises:
+        OSError: 書き込めなかった場合.
+        ValueError: 設定が無効な場合.
+    """
+    generator = MazeGenerator(
+        width=config.width,
+        height=config.height,
+        entry_point=config.entry_point,
+        exit_point=config.exit_point,
+        perfect=config.perfect,
+        seed=config.seed,
+        pattern=config.pattern,
+        algorithm=config.algorithm,
+        loop_density=config.loop_density
+    )
+    if config.output_file.endswith(BINARY_SUFFIX):
+        written = generator.save_binary(config.output_file, stream=True)
+    else:
+        written = generator.export_text(
+            config.output_file, stream=True
+        ).bytes_written
+    print(f"Wrote {written} bytes to '{config.output_file}'")
+
+
+def viewport_size(width: int, height: int) -> tuple[int, int] | None:
+    """ターミナルに収まる表示範囲のセル数を求める.
+
+    迷路がターミナルに収まり、描画の上限(49 * 49)以下なら迷路全体を描画する.
+    メニューは迷路の下にスクロールして表示するので、高さはターミナルの
+    行数だけで決める(メニューの行数は引かない).
+
+    Args:
         width (int): 迷路の幅.
         height (int): 迷路の高さ.
-        entry_point (tuple[int, int]): 迷路のスタート座標.
-        exit_point (tuple[int, int]): 迷路のゴール座標.
-        output_file (str): 生成された迷路を保存するファイルパス.
-        perfect (bool): 完全迷路にするかどうかの設定.
-        seed (int): seedを元にランダムに再現性を持たせる.
-        pattern (bool): 42ロゴを表示させるかの設定.
-    """
 
-    width: int
-    height: int
-    entry_point: tuple[int, int]
-    exit_point: tuple[int, int]
-    output_file: str
-    perfect: bool
-    seed: int
-    pattern: bool
+    Returns:
+        tuple[int, int] | None: 表示範囲の横と縦のセル数.
+            迷路全体を描画する時はNone.
+    """
+    columns, lines = get_terminal_size()
+    # 1マスは全角(2文字)、迷路の外壁の分を1マス引く
+    cols = max(1, (columns // 2 - 1) // 2)
+    rows = max(1, (lines - 1) // 2)
+    if width <= min(cols, 49) and height <= min(rows, 49):
+        return None
+    return min(cols, width), min(rows, height)
 
 
-def parse_config(file_path: str) -> MazeConfig:
-    """設定ファイルを解析してMazeconfigオブジェクトを返す.
+def parse_seed_range(value: str) -> range:
+    """'START-END'形式のシード値の範囲を解析する.
 
     Args:
-        file_path (str): 設定ファイルへのパス.
+        value (str): 'START-END'(両端を含む)か、1つのシード値.
 
     Returns:
-        MazeConfig: 解析した設定ファイルのオブジェクト.
+        range: シード値の範囲.
 
     Raises:
-        FileNotFoundError: 設定ファイルがない場合.
-        ValueError: 設定ファイルの値が無効な場合.
-        KeyError: 設定ファイルのkeyが無効な場合.
-        except: 上記以外のエラーが発生した場合.
+        ValueError: 形式が無効な場合.
     """
-    config_data = {}
-    with open(file_path) as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-            key, value = line.split("=", 1)
-            key = key.strip().upper()
-            if key in config_data:
-                raise ValueError(f"Config key: '{key}' duplicated")
-            config_data[key] = value.strip()
-
-    def strtobool(val: str | None) -> bool:
-        if val == "True":
-            return True
-        if val == "False":
-            return False
-        if not val:
-            raise ValueError("missing config key or value")
-        raise ValueError("invalid value 'True or False'")
-
-    entry_row = config_data["ENTRY"].split(",")
-    exit_row = config_data["EXIT"].split(",")
-
-    return MazeConfig(
-        width=int(config_data["WIDTH"]),
-        height=int(config_data["HEIGHT"]),
-        entry_point=(int(entry_row[0]), int(entry_row[1])),
-        exit_point=(int(exit_row[0]), int(exit_row[1])),
-        output_file=config_data["OUTPUT_FILE"],
-        perfect=strtobool(config_data.get("PERFECT")),
-        seed=int(config_data.get("SEED", 0)),
-        pattern=strtobool(config_data.get("PATTERN", "True"))
+    start, _, end = value.partition("-")
+    first = int(start)
+    last = int(end) if end else first
+    if last < first:
+        raise ValueError(f"invalid seed range '{value}'")
+    return range(first, last + 1)
+
+
+def batch_to_files(config: MazeConfig, args: Namespace) -> None:
+    """シード値の範囲の迷路をまとめて生成し、生成速度を表示する.
+
+    Args:
+        config (MazeConfig): 迷路の設定(SEEDは使わない).
+        args (Namespace): コマンドライン引数.
+    """
+    from mazegen.batch import ANALYTICS_FILE_NAME, generate_batch
+
+    seeds = parse_seed_range(args.batch)
+    result = generate_batch(
+        params=(
+            config.width, config.height, config.entry_point,
+            config.exit_point, config.perfect, config.pattern,
+            config.algorithm, config.loop_density
+        ),
+        seeds=seeds,
+        output=args.output,
+        workers=args.jobs,
+        analytics=args.analytics
+    )
+    print(
+        f"Generated {result.count} mazes to '{args.output}' "
+        f"in {result.seconds:.2f}s ({result.rate:.1f} mazes/sec)"
     )
+    if args.analytics:
+        print(f"Wrote metrics to '{ANALYTICS_FILE_NAME}' in '{args.output}'")
 
 
-def save_to_file(
-    file_path: str,
-    hex_grid: list[str],
-    entry_point: tuple[int, int],
-    exit_point: tuple[int, int],
-    path_str: str
+class LineReader:
+    """標準入力を別のスレッドで1行ずつ読み、イベントループに渡すクラス.
+
+    入力を待っている間もイベントループは止まらないので、
+    迷路の生成やアニメーションと同時に入力を受け付けられる.
+
+    Attributes:
+        closed (bool): 標準入力が終わった(これ以上読めない)かどうか.
+        _lines (asyncio.Queue[str | None]): 読んだ行(Noneは入力の終わり).
+    """
+
+    def __init__(self) -> None:
+        """LineReaderを初期化し、読み込むスレッドを開始する.
+
+        イベントループの中で作る.
+        """
+        import asyncio
+
+        self.closed = False
+        self._lines: asyncio.Queue[str | None] = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        thread = threading.Thread(
+            target=self._read, args=(loop,), daemon=True
+        )
+        thread.start()
+
+    def _read(self, loop: "asyncio.AbstractEventLoop") -> None:
+        """標準入力を1行ずつ読んでキューに入れる(別スレッドで動く).
+
+        Ctrl + dはNoneを入れる. ターミナルでなければそこで終わる.
+        """
+        while True:
+            line = stdin.readline()
+            loop.call_soon_threadsafe(
+                self._lines.put_nowait, line.rstrip("\n") if line else None
+            )
+            if not line and not stdin.isatty():
+                return
+
+    async def readline(self, prompt: str = "") -> str | None:
+        """promptを表示して1行読む.
+
+        Returns:
+            str | None: 読んだ行. Ctrl + dか入力の終わりならNone.
+        """
+        print(prompt, end="", flush=True)
+        if self.closed:
+            return None
+        line = await self._lines.get()
+        if line is None and not stdin.isatty():
+            self.closed = True
+        return line
+
+    async def readline_until(
+        self, task: "asyncio.Future[Any]"
+    ) -> str | None:
+        """taskが終わるまでに入力された行を返す.
+
+        Returns:
+            str | None: 読んだ行. 先にtaskが終わればNone.
+        """
+        import asyncio
+
+        while not self.closed:
+            getter = asyncio.ensure_future(self._lines.get())
+            await asyncio.wait(
+                {getter, task}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if getter.done():
+                line = getter.result()
+                if line is not None:
+                    return line
+                # 生成中のCtrl + dは無視する
+                if not stdin.isatty():
+                    self.closed = True
+                continue
+            getter.cancel()
+            return None
+        await asyncio.wait({task})
+        return None
+
+
+class BackgroundJob(Generic[T]):
+    """止められる処理をスレッドで実行するタスク.
+
+    処理にはthreading.Eventを渡し、stop()でsetしてから処理が抜けるまで待つ.
+    stop()から戻った時にはスレッドは終わっているので、
+    次の処理と描画が混ざらない.
+
+    Attributes:
+        task (asyncio.Task[T]): 処理の結果を待つタスク.
+        _cancel (threading.Event): 処理を止める合図.
+    """
+
+    def __init__(self, func: Callable[[threading.Event], T]) -> None:
+        """処理を開始する(イベントループの中で呼ぶ).
+
+        Args:
+            func (Callable[[threading.Event], T]): 止める合図を受け取る処理.
+        """
+        import asyncio
+
+        self._cancel = threading.Event()
+        self.task = asyncio.create_task(self._run(func))
+
+    async def _run(self, func: Callable[[threading.Event], T]) -> T:
+        """処理をスレッドで実行し、止められたらスレッドが抜けるまで待つ."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(None, func, self._cancel)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            self._cancel.set()
+            with suppress(GenerationCancelled):
+                await future
+            raise
+
+    async def stop(self) -> None:
+        """処理を止め、スレッドが抜けるまで待つ."""
+        import asyncio
+
+        if self.task.done():
+            return
+        self.task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self.task
+
+
+def save_output(
+    generator: MazeGenerator, config: MazeConfig, path_str: str
 ) -> None:
-    """迷路をファイルに保存する.
+    """生成した迷路をOUTPUT_FILEに保存する(拡張子で形式を決める).
+
+    保存できなくても迷路の表示とメニューは続けるので、
+    エラーは標準エラー出力に表示するだけにする.
 
     Args:
-        file_path (str): 保存するファイルパス
-        hex_grid (list[str]): 迷路のHexGrid
-        entry_point (tuple[int, int]): 入口の座標
-        exit_point (tuple[int, int]): 出口の座標
-        path_str (str): 迷路のパス
+        generator (MazeGenerator): 生成した迷路.
+        config (MazeConfig): 迷路の設定.
+        path_str (str): 最短経路.
     """
     try:
-        with open(file_path, "w", encoding="utf-8") as f:
-            for row in hex_grid:
-                f.write(f"{row}\n")
-            f.write("\n")
-
-            f.write(f"{entry_point[0]},{entry_point[1]}\n")
-            f.write(f"{exit_point[0]},{exit_point[1]}\n")
-            f.write(f"{path_str}")
-
+        if config.output_file.endswith(BINARY_SUFFIX):
+            generator.save_binary(config.output_file, path_str)
+        else:
+            # output_file(maze.txt)に情報書き込み
+            generator.export_text(config.output_file, path_str)
     except OSError as e:
-        print(f"Error: Failed to save the maze to '{file_path}'."
+        print(f"Error: Failed to save the maze to '{config.output_file}'. "
               f"Details: {e}", file=stderr)
 
 
-def main() -> None:
-    """迷路生成デモメイン関数."""
-    # 引数が2個でない時にエラー
-    if len(argv) != 2:
-        print("Usage: python3 a_maze_ing.py <config_file>.txt", file=stderr)
-        exit(1)
+def complete_and_save(
+    generator: MazeGenerator, config: MazeConfig, cancel: threading.Event
+) -> str:
+    """止めた迷路を描画せずに完成させて保存する(スレッドで実行する).
 
-    config_file = argv[1]
-    try:
-        # configにconfig.txtをパースする(MazeConfigクラスが返ってくる)
-        config = parse_config(config_file)
+    生成し直す操作や終了の前に呼び、止めた迷路でも
+    出力ファイルが書かれないまま終わらないようにする.
 
-    except KeyError as e:
-        print(f"Error: missing config key: {e.args[0].upper()}", file=stderr)
-        exit(1)
-    except FileNotFoundError:
-        print("Error: No such file or dir", file=stderr)
-        exit(1)
-    except IsADirectoryError:
-        print("Error: Is a directory", file=stderr)
-        exit(1)
-    except (ValueError) as e:
-        print(f"Error: {e}", file=stderr)
-        exit(1)
-    except Exception as e:
-        print(f"Error:{e}", file=stderr)
-        exit(1)
+    Args:
+        generator (MazeGenerator): 迷路の生成器.
+        config (MazeConfig): 迷路の設定.
+        cancel (threading.Event): setされたら生成を止める合図.
+
+    Returns:
+        str: 最短経路.
+
+    Raises:
+        GenerationCancelled: cancelで止められた場合.
+    """
+    generator.generate(cancel=cancel)
+    path_str = generator.solve_maze()
+    save_output(generator, config, path_str)
+    return path_str
 
+
+def generate_and_show(
+    generator: MazeGenerator,
+    config: MazeConfig,
+    sleep_anime: bool,
+    cancel: threading.Event
+) -> str:
+    """迷路を生成して保存し、経路を表示する(スレッドで実行する).
+
+    Args:
+        generator (MazeGenerator): 迷路の生成器.
+        config (MazeConfig): 迷路の設定.
+        sleep_anime (bool): アニメーションするかどうか.
+        cancel (threading.Event): setされたら生成を止める合図.
+
+    Returns:
+        str: 最短経路.
+
+    Raises:
+        GenerationCancelled: cancelで止められた場合.
+    """
+    # 迷路生成、出力
+    generator.generate(
+        sleep_anime=sleep_anime, print_flag=True, cancel=cancel
+    )
+    # 最短経路受け取り
+    path_str = generator.solve_maze()
+    save_output(generator, config, path_str)
+    # アニメーションの後は少し見せてから経路を表示する
+    # (キャッシュから読んだ時はアニメーションしないので待たない)
+    if sleep_anime and not generator.is_from_cache() and cancel.wait(1):
+        raise GenerationCancelled("The maze animation was cancelled")
+    generator.print_maze(show_path=True)
+    return path_str
+
+
+async def interactive(config: MazeConfig, args: Namespace) -> None:
+    """迷路を表示し、メニューで操作する.
+
+    生成とアニメーション(経路の追跡を含む)は止められるタスクとして
+    スレッドで実行し、その間も入力を受け付ける. 実行中に入力があれば
+    アニメーションを止めて、その入力をメニューの選択として扱う.
+    止めた迷路は、選択が表示の操作ならアニメーションなしで完成させて
+    表示し(Enterだけならアニメーションを飛ばす)、生成し直す操作や終了なら
+    描画せずに完成させて保存してから行う.
+
+    Args:
+        config (MazeConfig): 迷路の設定(メニューで変更する).
+        args (Namespace): コマンドライン引数.
+    """
+    from mazegen.cache import MazeCache
+
+    reader = LineReader()
     # 迷路の描画、最短経路表示、カラースキームを初期化
     needs_generation = True
     show_path = True
     color_scheme = 0
     sleep_anime = True
-    print_flag = True
-
-    while True:
-        # 迷路を生成するフラグがTrueの時のみ描画処理
-        if needs_generation:
-            # CLIでの変更を引き継がない
-            show_path = True
-            color_scheme = 0
-            print(f"Generating a {config.width} × {config.height} maze")
-            try:
-                # generatorにconfig.txtの内容送り初期化
-                generator = MazeGenerator(
-                    width=config.width,
-                    height=config.height,
-                    entry_point=config.entry_point,
-                    exit_point=config.exit_point,
-                    perfect=config.perfect,
-                    seed=config.seed,
-                    pattern=config.pattern
-                )
-                # 迷路生成、出力
-                generator.generate(
-                    sleep_anime=sleep_anime,
-                    print_flag=print_flag
-                )
-                # 最短経路受け取り
-                path_str = generator.solve_maze()
-                # 16進数の文字列リスト受け取り
-                hex_grid = generator.get_hex_grid()
-                # output_file(maze.txt)に情報書き込み
-                save_to_file(
-                    file_path=config.output_file,
-                    hex_grid=hex_grid,
-                    entry_point=config.entry_point,
-                    exit_point=config.exit_point,
-                    path_str=path_str
-                )
-                # 一度生成したらフラグを折る
-                needs_generation = False
-                # プリントフラグがなければここで終了
-                if not print_flag:
-                    return
+    # 設定を切り替えて戻した時などに同じ迷路を生成し直さない(SEED=0は除く)
+    cache = MazeCache(directory=args.cache_dir)
+    generator: MazeGenerator | None = None
+    job: BackgroundJob[str | None] | None = None
+    job_is_generation = False
+    # 生成を途中で止めて、迷路がまだ完成していないかどうか
+    incomplete = False
+    stats: MazeStats | None = None
+    path_str = ""
+    # 生成中に入力された選択、変更した設定の表示
+    pending: str | None = None
+    notice = ""
 
-                # 迷路描画後に最短経路表示
-                sleep(1)
-                generator.print_maze(show_path=show_path)
-
-                # 42スタンプフラグがTrueかつwidthかheightが既定値以下で表示
-                if config.pattern and (config.width < 9 or config.height < 7):
-                    print("Pattern 42 requires a more than 8 * 6 maze size.")
-
-            except Exception as e:
-                print(f"Error: {e}", file=stderr)
-                exit(1)
-            except KeyboardInterrupt:
+    try:
+        while True:
+            # 迷路を生成するフラグがTrueの時のみ描画処理
+            if needs_generation:
                 needs_generation = False
-
-        # ここからCLIの操作
-        print("\n=== A-Maze-ing ===")
-
-        # operations: CLIで選択できる操作一覧
-        # operation: ユーザーに実際に選択された操作
-        operations = {
-            "1": "Re-generate",
-            "2": "Show/Hide path from entry to exit "
-            f"[Current: {'Show' if show_path else 'Hide'}]",
-            "3": "Rotate maze colors",
-            "4": "New maze size "
-            f"[Current: {config.width} × {config.height}]",
-            "5": f"{'un' if config.perfect else ''}perfect maze",
-            "6": f"Seed value [Current: {config.seed}]",
-            "7": f"42 pattern [Current: {config.pattern}]",
-            "8": f"Animation [Current: {sleep_anime}]",
-            "9": "Quit",
-        }
-        for key, value in operations.items():
-            print("%s. %s" % (key, value))
-        operation = ""
-
-        # 入力を受け付ける
-        # Ctrl + d か Enter の場合すぐリトライ
-        try:
-            choice = input("Choice? (1-9): ").strip()
-        except EOFError:
-            print(f"\x1b[{len(operations) + 2}A\x1b[0J", end="")
-            continue
-        if not choice:
-            print(f"\x1b[{len(operations) + 3}A\x1b[0J", end="")
-            continue
-
-        # 指定された入力(数字)をキーとして、operationsから合う数字を取得
-        # 入力がキーでない場合、値を部分一致で検索して数字を取得
-        ope_list = [key for key in operations if key == choice]
-        if not ope_list:
-            ope_list = [
-                key
-                for key, command in operations.items()
-                if choice.lower() in command.lower()
-            ]
-
-        # 入力と一致する選択肢が一つの時に決定
-        # 入力と一致する選択肢が見つからない場合と
-        # 入力が複数の選択肢と一致している場合を弾く
-        if len(ope_list) == 1:
-            operation = ope_list[0]
-        elif len(ope_list) == 0:
-            print(f"\x1b[{len(operations) + 4}A\x1b[0J", end="")
-            print("Invalid choice. Please enter correct command.")
-            continue
-        elif len(ope_list) > 1:
-            print(f"\x1b[{len(operations) + 4}A\x1b[0J", end="")
-            print(
-                "command conflict with multiple operations: "
-                f"""{', '.join(
-                    '%s: %s' % (key, operations[key]) for key in ope_list
-                )}."""
-                "Please enter correct command."
-            )
-            continue
-
-        if operation == "1":
-            # 再描画、初回はseed値0
-            needs_generation = True
-            continue
-
-        elif operation == "2":
-            show_path = not show_path
-            print("\x1b[H\x1b[0J", end="")
-            # その場ですぐ表示
-            generator.print_maze(0, show_path, color_scheme)
-
-        elif operation == "3":
-            color_scheme = (color_scheme + 1) % 3
-            print("\x1b[H\x1b[0J", end="")
-            # その場ですぐ表示
-            generator.print_maze(0, show_path, color_scheme)
-
-        elif operation == "4":
-            try:
-                width_tmp = int(input("Enter width value: ").strip())
-                height_tmp = int(input("Enter height value: ").strip())
-            # 整数値 or Ctrl + d
-            except (ValueError, EOFError):
-                print(f"\x1b[{len(operations) + 4}A\x1b[0J", end="")
-                print("Error: Invalid width or height value")
+                incomplete = False
+                # CLIでの変更を引き継がない
+                show_path = True
+                color_scheme = 0
+                print(f"Generating a {config.width} × {config.height} maze")
+                # 処理ごとの時間とカウンタ(--statsの時だけ記録する)
+                stats = MazeStats() if args.stats else None
+                try:
+                    # generatorにconfig.txtの内容送り初期化
+                    generator = MazeGenerator(
+                        width=config.width,
+                        height=config.height,
+                        entry_point=config.entry_point,
+                        exit_point=config.exit_point,
+                        perfect=config.perfect,
+                        seed=config.seed,
+                        pattern=config.pattern,
+                        stats=stats,
+                        cache=cache,
+                        algorithm=config.algorithm,
+                        loop_density=config.loop_density
+                    )
+                    # ターミナルに収まらない時は表示範囲だけ描画する
+                    generator.set_viewport(
+                        viewport_size(config.width, config.height)
+                    )
+                except ValueError as e:
+                    print(f"Error: {e}", file=stderr)
+                    exit(1)
+                job = BackgroundJob(partial(
+                    generate_and_show, generator, config, sleep_anime
+                ))
+                job_is_generation = True
+
+            if generator is None:
+                return
+
+            # 生成(または経路の追跡)が終わるまで入力を待つ
+            if job is not None:
+                line = await reader.readline_until(job.task)
+                if line is not None:
+                    # アニメーションを止め、入力をメニューの選択にする
+                    await job.stop()
+                    pending = line
+                    incomplete = job_is_generation and job.task.cancelled()
+                # ここではタスクは終わっている(止めた時は結果なし)
+                result = None
+                if not job.task.cancelled():
+                    error = job.task.exception()
+                    if error is not None:
+                        print(f"Error: {error}", file=stderr)
+                        exit(1)
+                    result = job.task.result()
+                if job_is_generation and isinstance(result, str):
+                    path_str = result
+                    # 42スタンプフラグがTrueかつwidthかheightが既定値以下で表示
+                    if config.pattern and (
+                        config.width < 9 or config.height < 7
+                    ):
+                        print(
+                            "Pattern 42 requires a more than 8 * 6 maze size."
+                        )
+                    if stats is not None:
+                        print(f"\n=== Stats ===\n{stats.report()}")
+                job = None
+
+            # ここからCLIの操作
+            if notice:
+                print(notice)
+                notice = ""
+            print("\n=== A-Maze-ing ===")
+
+            # operations: CLIで選択できる操作一覧
+            # operation: ユーザーに実際に選択された操作
+            operations = {
+                "1": "Re-generate",
+                "2": "Show/Hide path from entry to exit "
+                f"[Current: {'Show' if show_path else 'Hide'}]",
+                "3": "Rotate maze colors",
+                "4": "New maze size "
+                f"[Current: {config.width} × {config.height}]",
+                "5": f"{'un' if config.perfect else ''}perfect maze",
+                "6": f"Seed value [Current: {config.seed}]",
+                "7": f"42 pattern [Current: {config.pattern}]",
+                "8": f"Animation [Current: {sleep_anime}]",
+                "9": "Quit",
+            }
+            # 表示範囲を絞っている時はパンと経路の追跡を選べる
+            viewport = generator.get_viewport()
+            if viewport[2:] != (config.width, config.height):
+                x0, y0, cols, rows = viewport
+                operations["p"] = (
+                    "Pan view (w/a/s/d) "
+                    f"[Current: ({x0}, {y0}) - "
+                    f"({x0 + cols - 1}, {y0 + rows - 1})]"
+                )
+                operations["f"] = "Follow route from entry to exit"
+            for key, value in operations.items():
+                print("%s. %s" % (key, value))
+            operation = ""
+
+            # 入力を受け付ける
+            # Ctrl + d か Enter の場合すぐリトライ
+            prompt = f"Choice? (1-9{', p, f' if 'p' in operations else ''}): "
+            if pending is not None:
+                # 生成中に入力された選択を使う
+                print(f"{prompt}{pending}")
+                choice: str | None = pending.strip()
+                pending = None
+            else:
+                choice = await reader.readline(prompt)
+            if choice is None:
+                if reader.closed:
+                    # 入力が終わっても止めた迷路は保存してから終了する
+                    if incomplete:
+                        await BackgroundJob(partial(
+                            complete_and_save, generator, config
+                        )).task
+                    return
+                print(f"\x1b[{len(operations) + 2}A\x1b[0J", end="")
                 continue
-            if width_tmp < 2 or height_tmp < 2:
-                print(f"\x1b[{len(operations) + 5}A\x1b[0J", end="")
-                print("Error: Width or height value more than 2")
+            choice = choice.strip()
+            # Enterだけでアニメーションを止めた時は迷路を完成させる
+            if incomplete and not choice:
+                incomplete = False
+                job = BackgroundJob(partial(
+                    generate_and_show, generator, config, False
+                ))
+                job_is_generation = True
                 continue
-            if width_tmp == config.width and height_tmp == config.height:
-                print(f"\x1b[{len(operations) + 5}A\x1b[0J", end="")
-                print("Error: Maze size is the same as last time.")
+            if not choice:
+                print(f"\x1b[{len(operations) + 3}A\x1b[0J", end="")
                 continue
-            print(
-                f"Change maze size "
-                f"{config.width} × {config.height}"
-                f" -> {width_tmp} × {height_tmp}"
-            )
-            sleep(2)
-            # 再描画準備
-            config.width = width_tmp
-            config.height = height_tmp
-            config.exit_point = (config.width - 1, config.height - 1)
-            needs_generation = True
-            print("\x1b[H\x1b[0J", end="")
-
-        elif operation == "5":
-            print(
-                f"Change perfect "
-                f"{config.perfect} -> {not config.perfect}"
-            )
-            sleep(2)
-            # 再描画準備
-            config.perfect = not config.perfect
-            needs_generation = True
-            print("\x1b[H\x1b[0J", end="")
-
-        elif operation == "6":
-            try:
-                seed_tmp = int(input("Enter seed value: ").strip())
-            # 整数値 or Ctrl + d
-            except (ValueError, EOFError):
+
+            # 指定された入力(数字)をキーとして、operationsから合う数字を取得
+            # 入力がキーでない場合、値を部分一致で検索して数字を取得
+            ope_list = [key for key in operations if key == choice]
+            if not ope_list:
+                ope_list = [
+                    key
+                    for key, command in operations.items()
+                    if choice.lower() in command.lower()
+                ]
+
+            # 入力と一致する選択肢が一つの時に決定
+            # 入力と一致する選択肢が見つからない場合と
+            # 入力が複数の選択肢と一致している場合を弾く
+            if len(ope_list) == 1:
+                operation = ope_list[0]
+            elif len(ope_list) == 0:
+                print(f"\x1b[{len(operations) + 4}A\x1b[0J", end="")
+                print("Invalid choice. Please enter correct command.")
+                continue
+            elif len(ope_list) > 1:
                 print(f"\x1b[{len(operations) + 4}A\x1b[0J", end="")
-                print("Error: Invalid seed value.")
+                print(
+                    "command conflict with multiple operations: "
+                    f"""{', '.join(
+                        '%s: %s' % (key, operations[key]) for key in ope_list
+                    )}."""
+                    "Please enter correct command."
+                )
                 continue
-            if seed_tmp < 0:
-                print(f"\x1b[{len(operations) + 5}A\x1b[0J", end="")
-                print("Error: Seed value is 0 or positive.")
+
+            # 止めた迷路を表示する操作なら、先にアニメーションなしで完成させる
+            if incomplete and operation not in RESTART_OPERATIONS:
+                incomplete = False
+                pending = choice
+                job = BackgroundJob(partial(
+                    generate_and_show, generator, config, False
+                ))
+                job_is_generation = True
                 continue
-            if seed_tmp == config.seed:
-                print(f"\x1b[{len(operations) + 5}A\x1b[0J", end="")
-                print("Error: Seed value is the same as last time.")
+            # 生成し直す操作や終了でも、止めた迷路を完成させて保存してから行う
+            if incomplete:
+                incomplete = False
+                path_str = await BackgroundJob(partial(
+                    complete_and_save, generator, config
+                )).task
+
+            if operation == "1":
+                # 再描画、初回はseed値0
+                needs_generation = True
                 continue
-            print(f"Change Seed value {config.seed} -> {seed_tmp}")
-            sleep(2)
-            # 再描画準備
-            config.seed = seed_tmp
-            needs_generation = True
-            print("\x1b[H\x1b[0J", end="")
-
-        elif operation == "7":
-            print(
-                f"Change 42 pattern "
-                f"{config.pattern} -> {not config.pattern}"
-            )
-            sleep(2)
-            # 再描画準備
-            config.pattern = not config.pattern
-            needs_generation = True
-            print("\x1b[H\x1b[0J", end="")
-
-        elif operation == "8":
-            print(
-                f"Change animation "
-                f"{sleep_anime} -> {not sleep_anime}"
-            )
-            sleep(2)
-            # 再描画準備
-            sleep_anime = not sleep_anime
-            needs_generation = True
-            print("\x1b[H\x1b[0J", end="")
 
-        elif operation == "9":
-            print("Exiting...")
-            break
+            elif operation == "2":
+                show_path = not show_path
+                print("\x1b[H\x1b[0J", end="")
+                # その場ですぐ表示
+                generator.print_maze(0, show_path, color_scheme)
+
+            elif operation == "3":
+                color_scheme = (color_scheme + 1) % 3
+                print("\x1b[H\x1b[0J", end="")
+                # その場ですぐ表示
+                generator.print_maze(0, show_path, color_scheme)
+
+            elif operation == "4":
+                try:
+                    width_line = await reader.readline("Enter width value: ")
+                    height_line = await reader.readline(
+                        "Enter height value: "
+                    )
+                    width_tmp = int((width_line or "").strip())
+                    height_tmp = int((height_line or "").strip())
+                # 整数値 or Ctrl + d
+                except ValueError:
+                    print(f"\x1b[{len(operations) + 4}A\x1b[0J", end="")
+                    print("Error: Invalid width or height value")
+                    continue
+                if width_tmp < 2 or height_tmp < 2:
+                    print(f"\x1b[{len(operations) + 5}A\x1b[0J", end="")
+                    print("Error: Width or height value more than 2")
+                    continue
+                if width_tmp == config.width and height_tmp == config.height:
+                    print(f"\x1b[{len(operations) + 5}A\x1b[0J", end="")
+                    print("Error: Maze size is the same as last time.")
+                    continue
+                notice = (
+                    f"Change maze size "
+                    f"{config.width} × {config.height}"
+                    f" -> {width_tmp} × {height_tmp}"
+                )
+                # 再描画準備
+                config.width = width_tmp
+                config.height = height_tmp
+                config.exit_point = (config.width - 1, config.height - 1)
+                needs_generation = True
+                print("\x1b[H\x1b[0J", end="")
+
+            elif operation == "5":
+                notice = (
+                    f"Change perfect "
+                    f"{config.perfect} -> {not config.perfect}"
+                )
+                # 再描画準備
+                config.perfect = not config.perfect
+                needs_generation = True
+                print("\x1b[H\x1b[0J", end="")
+
+            elif operation == "6":
+                try:
+                    seed_line = await reader.readline("Enter seed value: ")
+                    seed_tmp = int((seed_line or "").strip())
+                # 整数値 or Ctrl + d
+                except ValueError:
+                    print(f"\x1b[{len(operations) + 4}A\x1b[0J", end="")
+                    print("Error: Invalid seed value.")
+                    continue
+                if seed_tmp < 0:
+                    print(f"\x1b[{len(operations) + 5}A\x1b[0J", end="")
+                    print("Error: Seed value is 0 or positive.")
+                    continue
+                if seed_tmp == config.seed:
+                    print(f"\x1b[{len(operations) + 5}A\x1b[0J", end="")
+                    print("Error: Seed value is the same as last time.")
+                    continue
+                notice = f"Change Seed value {config.seed} -> {seed_tmp}"
+                # 再描画準備
+                config.seed = seed_tmp
+                needs_generation = True
+                print("\x1b[H\x1b[0J", end="")
+
+            elif operation == "7":
+                notice = (
+                    f"Change 42 pattern "
+                    f"{config.pattern} -> {not config.pattern}"
+                )
+                # 再描画準備
+                config.pattern = not config.pattern
+                needs_generation = True
+                print("\x1b[H\x1b[0J", end="")
+
+            elif operation == "8":
+                notice = (
+                    f"Change animation "
+                    f"{sleep_anime} -> {not sleep_anime}"
+                )
+                # 再描画準備
+                sleep_anime = not sleep_anime
+                needs_generation = True
+                print("\x1b[H\x1b[0J", end="")
+
+            elif operation == "9":
+                print("Exiting...")
+                break
+
+            elif operation == "p":
+                pan_line = await reader.readline(
+                    "Enter pan keys (e.g. 'dds'): "
+                )
+                keys = (pan_line or "").strip().lower()
+                if not keys or any(key not in PAN_KEYS for key in keys):
+                    print(f"\x1b[{len(operations) + 4}A\x1b[0J", end="")
+                    print("Error: Pan keys are w, a, s and d.")
+                    continue
+                # 1キーで表示範囲の半分ずつずらす
+                _, _, cols, rows = viewport
+                for key in keys:
+                    dx, dy = PAN_KEYS[key]
+                    generator.pan_viewport(
+                        dx * max(1, cols // 2), dy * max(1, rows // 2)
+                    )
+                print("\x1b[H\x1b[0J", end="")
+                generator.print_maze(0, show_path, color_scheme)
+
+            elif operation == "f":
+                print("\x1b[H\x1b[0J", end="")
+                # 経路を表示したまま入口から出口まで表示範囲を動かす
+                # (途中で入力があれば止める)
+                show_path = True
+                job = BackgroundJob(partial(
+                    generator.follow_path, path_str, 0.05, color_scheme
+                ))
+                job_is_generation = False
+
+            else:
+                print("\x1b[12A\x1b[0J", end="")
+                print("Invalid choice. Please enter a number between 1 and 9.")
+    finally:
+        # Ctrl + cなどで抜ける時も実行中のスレッドを止める
+        if job is not None:
+            await job.stop()
 
-        else:
-            print("\x1b[12A\x1b[0J", end="")
-            print("Invalid choice. Please enter a number between 1 and 9.")
+
+def main() -> None:
+    """迷路生成デモメイン関数."""
+    args = parse_args()
+    config_file = args.config_file
+    try:
+        # configにconfig.txtをパースする(MazeConfigクラスが返ってくる)
+        config = parse_config(config_file)
+    except Exception as e:
+        print(config_error(e), file=stderr)
+        exit(1)
+
+    # ヘッドレスモードは描画せずに生成して書き込んだら終了
+    if args.headless:
+        stats = MazeStats() if args.stats else None
+        try:
+            written = write_maze(config, stats)
+        except (ValueError, OSError) as e:
+            print(f"Error: {e}", file=stderr)
+            exit(1)
+        print(f"Wrote {written} bytes to '{config.output_file}'")
+        if stats is not None:
+            print(f"\n=== Stats ===\n{stats.report()}")
+        return
+
+    # ストリーミングモードは書き込んだら終了
+    if args.stream:
+        try:
+            stream_to_file(config)
+        except (ValueError, OSError) as e:
+            print(f"Error: {e}", file=stderr)
+            exit(1)
+        return
+
+    # バッチモードは書き込んだら終了
+    if args.batch:
+        try:
+            batch_to_files(config, args)
+        except (ValueError, OSError) as e:
+            print(f"Error: {e}", file=stderr)
+            exit(1)
+        return
+
+    import asyncio
+
+    asyncio.run(interactive(config, args))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,417 @@
+"""MazeGeneratorのベンチマーク.
+
+迷路の大きさ、完全迷路/不完全迷路、42ロゴの有無、生成アルゴリズムの
+組み合わせごとに
+generate, solve_maze, get_hex_grid, print_maze(捨てる出力先に描画),
+save_to_file, export_text(16進数の行を作らずに書き出す)の時間と
+ピークメモリを測り、JSONに書き出す.
+起動時間(python3 -m mazegen と a_maze_ing.py --headless で小さな迷路を
+書き出すまでの時間)も別のプロセスで測り、起動を遅くするモジュール
+(asyncioなど)を読み込んでいれば遅くなった項目として表示する.
+前回のJSON(ベースライン)を渡すと比較し、遅くなった項目を表示する.
+--check を付けると測る代わりに、棒倒し法の"batch"エンジンと"scalar"エンジンの
+完全迷路の16進数と経路が同じか(不完全迷路は同じシード値で同じ迷路になるか)を
+いくつかのシード値・大きさ・42ロゴの有無で確かめる.
+
+    python3 benchmark.py --output benchmark.json
+    python3 benchmark.py --check
+    python3 benchmark.py --sizes 10 100 --baseline benchmark.json
+    python3 benchmark.py --sizes 100 1000 --algorithms kruskal eller
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from argparse import ArgumentParser, Namespace
+from collections.abc import Callable
+from contextlib import redirect_stdout
+from time import perf_counter
+from typing import Any
+
+from a_maze_ing import save_to_file
+from mazegen.algorithms import ALGORITHMS, DEFAULT_ALGORITHM
+from mazegen.generator import MazeGenerator
+
+DEFAULT_SIZES = [10, 100, 500, 1000, 2000]
+# このセル数を超える迷路は時間がかかるので1回だけ測る
+LARGE_CELLS = 250_000
+# 起動時間を測る回数(最小値を使う)
+STARTUP_REPEAT = 10
+# 起動時間を測るコマンド名 -> python3の後の引数(最後に設定ファイルを付ける)
+STARTUP_COMMANDS = {
+    "python -m mazegen": ["-m", "mazegen"],
+    "a_maze_ing --headless": ["a_maze_ing.py", "--headless"],
+}
+# 起動のコマンドが読み込んではいけないモジュール(読み込むと遅くなるもの)
+STARTUP_FORBIDDEN = (
+    "asyncio", "concurrent.futures", "hashlib", "tempfile",
+    "mazegen.batch", "mazegen.render",
+)
+# --checkでエンジンの結果を比べるシード値と迷路の大きさ(幅, 高さ)
+CHECK_SEEDS = (1, 2, 42)
+CHECK_SIZES = ((2, 2), (10, 10), (31, 17), (100, 100))
+
+
+def parse_args() -> Namespace:
+    """コマンドライン引数を解析する.
+
+    Returns:
+        Namespace: 解析したコマンドライン引数.
+    """
+    parser = ArgumentParser(
+        prog="benchmark.py",
+        usage="python3 benchmark.py [--sizes N ...] [--algorithms NAME ...] "
+        "[--repeat N] [--output FILE] [--baseline FILE] "
+        "[--threshold RATIO] [--min-delta MS] [--no-memory] [--no-startup] "
+        "[--check]"
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+        help="迷路の一辺の大きさ(既定: 10 100 500 1000 2000)"
+    )
+    parser.add_argument(
+        "--algorithms", nargs="+", choices=list(ALGORITHMS),
+        default=list(ALGORITHMS),
+        help="測る生成アルゴリズム(既定: 全て)"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3,
+        help="1項目を測る回数(最小値を使う)"
+    )
+    parser.add_argument(
+        "--output", default=None, help="結果を書き出すJSONファイル"
+    )
+    parser.add_argument(
+        "--baseline", default=None, help="比較するJSONファイル"
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=0.2,
+        help="ベースラインよりこの割合以上遅ければ遅くなったとみなす"
+    )
+    parser.add_argument(
+        "--min-delta", type=float, default=1.0,
+        help="遅くなった時間がこのミリ秒未満なら誤差とみなす"
+    )
+    parser.add_argument(
+        "--no-memory", action="store_true",
+        help="ピークメモリを測らない(tracemallocで1回多く実行しない)"
+    )
+    parser.add_argument(
+        "--no-startup", action="store_true",
+        help="起動時間を測らない"
+    )
+    parser.add_argument(
+        "--check", action="store_true",
+        help="測らずに棒倒し法のbatchとscalarエンジンの結果が同じか確かめる"
+    )
+    return parser.parse_args()
+
+
+def measure(
+    func: Callable[[], object], repeat: int, memory: bool
+) -> tuple[float, int | None]:
+    """関数の実行時間(repeat回の最小値)とピークメモリを測る.
+
+    ピークメモリはtracemallocで遅くなるので、時間とは別に1回実行して測る.
+
+    Returns:
+        tuple[float, int | None]: 秒、ピークメモリ(バイト. 測らなければNone).
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        best = min(best, perf_counter() - start)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return best, peak
+
+
+def run_case(
+    size: int, perfect: bool, pattern: bool, algorithm: str, repeat: int,
+    memory: bool, work_dir: str
+) -> list[dict[str, Any]]:
+    """1つの組み合わせの迷路で各項目を測る.
+
+    Returns:
+        list[dict[str, Any]]: 項目ごとの結果.
+    """
+    generator = MazeGenerator(
+        width=size,
+        height=size,
+        entry_point=(0, 0),
+        exit_point=(size - 1, size - 1),
+        perfect=perfect,
+        seed=1,
+        pattern=pattern,
+        algorithm=algorithm
+    )
+    output_file = os.path.join(work_dir, "maze.txt")
+    if size * size > LARGE_CELLS:
+        repeat = 1
+
+    def render() -> None:
+        # 描画は捨てる出力先に書き込む
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            generator.print_maze(0, True, 0)
+
+    # save_to_fileだけを測るため、経路と16進数は前の項目の結果を使う
+    state: dict[str, Any] = {}
+
+    def solve() -> None:
+        state["path"] = generator.solve_maze()
+
+    def to_hex() -> None:
+        state["hex"] = generator.get_hex_grid()
+
+    def save() -> None:
+        save_to_file(
+            output_file, state["hex"], (0, 0), (size - 1, size - 1),
+            state["path"]
+        )
+
+    def export() -> None:
+        generator.export_text(output_file, state["path"])
+
+    steps: list[tuple[str, Callable[[], object]]] = [
+        ("generate", generator.generate),
+        ("solve_maze", solve),
+        ("get_hex_grid", to_hex),
+        ("print_maze", render),
+        ("save_to_file", save),
+        ("export_text", export),
+    ]
+    case = f"{size}x{size}-{'perfect' if perfect else 'imperfect'}" \
+        f"-{'pattern' if pattern else 'nopattern'}"
+    # 従来の棒倒し法は前回のJSONと比べられるように名前を変えない
+    if algorithm != DEFAULT_ALGORITHM:
+        case += f"-{algorithm}"
+    results = []
+    for name, func in steps:
+        seconds, peak = measure(func, repeat, memory)
+        results.append({
+            "case": case, "op": name, "seconds": seconds, "peak_bytes": peak
+        })
+        print(
+            f"{case:40} {name:13} {seconds * 1000:10.2f} ms"
+            + (f" {peak / 2**20:9.1f} MiB" if peak is not None else ""),
+            file=sys.stderr
+        )
+    return results
+
+
+def run_startup(work_dir: str) -> list[dict[str, Any]]:
+    """新しいプロセスで10×10の迷路を書き出して終了するまでの時間を測る.
+
+    インポートを含めた起動の時間なので、STARTUP_REPEAT回の最小値を使う.
+
+    Returns:
+        list[dict[str, Any]]: コマンドごとの結果.
+    """
+    config_file = os.path.join(work_dir, "startup.txt")
+    with open(config_file, "w") as f:
+        f.write(
+            "WIDTH=10\nHEIGHT=10\nENTRY=0,0\nEXIT=9,9\n"
+            f"OUTPUT_FILE={os.path.join(work_dir, 'startup_maze.txt')}\n"
+            "PERFECT=True\nSEED=1\n"
+        )
+    # a_maze_ing.pyとmazegenがある場所で実行する
+    root = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for name, command in STARTUP_COMMANDS.items():
+        best = float("inf")
+        for _ in range(STARTUP_REPEAT):
+            start = perf_counter()
+            subprocess.run(
+                [sys.executable, *command, config_file], cwd=root,
+                check=True, stdout=subprocess.DEVNULL
+            )
+            best = min(best, perf_counter() - start)
+        results.append({
+            "case": "startup", "op": name, "seconds": best, "peak_bytes": None
+        })
+        print(f"{'startup':40} {name:13} {best * 1000:10.2f} ms",
+              file=sys.stderr)
+    return results
+
+
+def check_startup_imports(work_dir: str) -> list[str]:
+    """起動のコマンドがSTARTUP_FORBIDDENのモジュールを読み込んでいないか調べる.
+
+    run_startup()の後に呼び、同じ設定ファイルを-X importtimeで実行する.
+
+    Returns:
+        list[str]: 読み込んでいたコマンドとモジュール(なければ空).
+    """
+    config_file = os.path.join(work_dir, "startup.txt")
+    root = os.path.dirname(os.path.abspath(__file__))
+    problems: list[str] = []
+    for name, command in STARTUP_COMMANDS.items():
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", *command, config_file],
+            cwd=root, check=True, stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE, text=True
+        )
+        # 各行は "import time: 自分 | 合計 | モジュール名"
+        imported = {
+            line.rsplit("|", 1)[-1].strip()
+            for line in result.stderr.splitlines()
+            if line.startswith("import time:")
+        }
+        problems.extend(
+            f"startup {name}: imports {module}"
+            for module in STARTUP_FORBIDDEN if module in imported
+        )
+    return problems
+
+
+def check_engines() -> list[str]:
+    """棒倒し法の"batch"エンジンと"scalar"エンジンの結果を比べる.
+
+    完全迷路はCHECK_SEEDSとCHECK_SIZESの組み合わせ、42ロゴの有無ごとに
+    16進数と経路が同じことを確かめる. 不完全迷路は乱数の使い方が異なり
+    結果は一致しないので、"batch"が同じシード値で同じ迷路になることを確かめる.
+
+    Returns:
+        list[str]: 一致しなかった組み合わせの説明(なければ空).
+    """
+    def build(
+        width: int, height: int, seed: int, perfect: bool, pattern: bool,
+        engine: str
+    ) -> tuple[list[str], str]:
+        generator = MazeGenerator(
+            width=width,
+            height=height,
+            entry_point=(0, 0),
+            exit_point=(width - 1, height - 1),
+            perfect=perfect,
+            seed=seed,
+            pattern=pattern,
+            engine=engine,
+            algorithm="knock"
+        )
+        generator.generate()
+        return generator.get_hex_grid(), generator.solve_maze()
+
+    mismatches = []
+    for width, height in CHECK_SIZES:
+        for seed in CHECK_SEEDS:
+            for pattern in (True, False):
+                case = f"{width}x{height}-seed{seed}" \
+                    f"-{'pattern' if pattern else 'nopattern'}"
+                batch = build(width, height, seed, True, pattern, "batch")
+                scalar = build(width, height, seed, True, pattern, "scalar")
+                if batch[0] != scalar[0]:
+                    mismatches.append(f"{case}-perfect: hex differs")
+                elif batch[1] != scalar[1]:
+                    mismatches.append(f"{case}-perfect: path differs")
+                first = build(width, height, seed, False, pattern, "batch")
+                again = build(width, height, seed, False, pattern, "batch")
+                if first != again:
+                    mismatches.append(
+                        f"{case}-imperfect: batch is not reproducible"
+                    )
+    print(
+        f"engine check: {len(CHECK_SIZES) * len(CHECK_SEEDS) * 2} cases, "
+        f"{len(mismatches)} mismatches", file=sys.stderr
+    )
+    return mismatches
+
+
+def compare(
+    results: list[dict[str, Any]],
+    baseline: dict[str, Any],
+    threshold: float,
+    min_delta: float
+) -> list[str]:
+    """ベースラインと比べて遅くなった項目を返す.
+
+    割合(threshold)と時間の差(min_delta秒)の両方を超えた時に遅くなったとする.
+
+    Returns:
+        list[str]: 遅くなった項目の説明.
+    """
+    before = {
+        (item["case"], item["op"]): item["seconds"]
+        for item in baseline.get("results", [])
+    }
+    regressions = []
+    for item in results:
+        old = before.get((item["case"], item["op"]))
+        if not old:
+            continue
+        ratio = item["seconds"] / old
+        item["baseline_seconds"] = old
+        item["regression"] = (
+            ratio > 1 + threshold and item["seconds"] - old > min_delta
+        )
+        if item["regression"]:
+            regressions.append(
+                f"{item['case']} {item['op']}: "
+                f"{old * 1000:.2f} ms -> {item['seconds'] * 1000:.2f} ms "
+                f"(x{ratio:.2f})"
+            )
+    return regressions
+
+
+def main() -> None:
+    """ベンチマークのメイン関数."""
+    args = parse_args()
+    if args.repeat < 1:
+        print("Error: --repeat must be 1 or more", file=sys.stderr)
+        sys.exit(1)
+    if args.check:
+        mismatches = check_engines()
+        for line in mismatches:
+            print(f"  {line}", file=sys.stderr)
+        sys.exit(1 if mismatches else 0)
+    results = []
+    regressions = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in args.sizes:
+            for algorithm in args.algorithms:
+                for perfect in (True, False):
+                    for pattern in (True, False):
+                        results.extend(run_case(
+                            size, perfect, pattern, algorithm, args.repeat,
+                            not args.no_memory, work_dir
+                        ))
+        if not args.no_startup:
+            results.extend(run_startup(work_dir))
+            regressions.extend(check_startup_imports(work_dir))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions += compare(
+                results, json.load(f), args.threshold, args.min_delta / 1000
+            )
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if regressions:
+        print("Regressions:", file=sys.stderr)
+        for line in regressions:
+            print(f"  {line}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
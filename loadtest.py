@@ -0,0 +1,219 @@
+"""迷路サーバー(mazegen.server)の負荷試験.
+
+複数のスレッドがそれぞれ1本の接続を使い回して /maze にリクエストを送り、
+レイテンシのp50/p90/p99/最大と、1秒あたりの成功したリクエスト数
+(とエラーの数)を表示する.
+シード値は1~--seedsを順に使うので、2周目からはキャッシュから返る
+(--seeds 0 なら毎回SEED=0でキャッシュを使わない).
+
+    python3 -m mazegen.server --port 8000 &
+    python3 loadtest.py --port 8000 --requests 2000 --concurrency 16
+    python3 loadtest.py --spawn --size 200 --seeds 0 --output loadtest.json
+"""
+
+import json
+import subprocess
+import sys
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection, HTTPException
+from itertools import count
+from math import ceil
+from threading import Lock
+from time import perf_counter, sleep
+from urllib.parse import urlencode
+
+from mazegen.server import DEFAULT_PORT
+
+# --spawnで起動したサーバーを待つ秒数
+SPAWN_TIMEOUT = 10.0
+
+
+def parse_args() -> Namespace:
+    """コマンドライン引数を解析する.
+
+    Returns:
+        Namespace: 解析したコマンドライン引数.
+    """
+    parser = ArgumentParser(
+        prog="loadtest.py",
+        usage="python3 loadtest.py [--host HOST] [--port PORT] [--spawn] "
+        "[--requests N] [--concurrency N] [--size N] [--seeds N] "
+        "[--format json|text] [--output FILE]"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="サーバーのホスト")
+    parser.add_argument(
+        "--port", type=int, default=DEFAULT_PORT, help="サーバーのポート"
+    )
+    parser.add_argument(
+        "--spawn", action="store_true",
+        help="python3 -m mazegen.server を起動してから試験し、最後に止める"
+    )
+    parser.add_argument(
+        "--requests", type=int, default=1000, help="送るリクエストの数"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="同時に送るスレッドの数"
+    )
+    parser.add_argument(
+        "--size", type=int, default=30, help="迷路の一辺の大きさ"
+    )
+    parser.add_argument(
+        "--seeds", type=int, default=100,
+        help="使うシード値の数(0なら毎回SEED=0)"
+    )
+    parser.add_argument(
+        "--format", choices=("json", "text"), default="json",
+        help="レスポンスの形式"
+    )
+    parser.add_argument(
+        "--output", default=None, help="結果を書き出すJSONファイル"
+    )
+    return parser.parse_args()
+
+
+def percentile(values: list[float], ratio: float) -> float:
+    """並べ替え済みの値の百分位数を返す(最近傍順位法)."""
+    if not values:
+        return 0.0
+    rank = max(1, ceil(len(values) * ratio))
+    return values[rank - 1]
+
+
+def wait_for_server(host: str, port: int, timeout: float) -> None:
+    """/healthが返るまで待つ.
+
+    Raises:
+        TimeoutError: timeout秒たっても返らない場合.
+    """
+    deadline = perf_counter() + timeout
+    while True:
+        try:
+            conn = HTTPConnection(host, port, timeout=1.0)
+            conn.request("GET", "/health")
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            if perf_counter() > deadline:
+                raise TimeoutError(f"No server on {host}:{port}")
+            sleep(0.1)
+
+
+def run(args: Namespace) -> dict[str, float | int]:
+    """負荷試験を行い、結果を返す.
+
+    Args:
+        args (Namespace): コマンドライン引数.
+
+    Returns:
+        dict[str, float | int]: リクエスト数、エラー数、秒、
+            成功したリクエストのreq/s、エラーの数/s、
+            レイテンシ(ミリ秒)の百分位数.
+    """
+    size = args.size
+    base = {
+        "WIDTH": size, "HEIGHT": size, "ENTRY": "0,0",
+        "EXIT": f"{size - 1},{size - 1}", "PERFECT": "True",
+        "format": args.format,
+    }
+    numbers = count()
+    lock = Lock()
+    latencies: list[float] = []
+    errors = 0
+
+    def worker() -> None:
+        nonlocal errors
+        conn = HTTPConnection(args.host, args.port, timeout=60.0)
+        try:
+            while True:
+                with lock:
+                    number = next(numbers)
+                if number >= args.requests:
+                    return
+                seed = number % args.seeds + 1 if args.seeds > 0 else 0
+                query = urlencode({**base, "SEED": seed})
+                start = perf_counter()
+                try:
+                    conn.request("GET", f"/maze?{query}")
+                    response = conn.getresponse()
+                    response.read()
+                    ok = response.status == 200
+                # 応答が壊れていても(BadStatusLineなど)数えて続ける
+                except (OSError, HTTPException):
+                    conn.close()
+                    ok = False
+                elapsed = perf_counter() - start
+                with lock:
+                    if ok:
+                        latencies.append(elapsed)
+                    else:
+                        errors += 1
+        finally:
+            conn.close()
+
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for future in [
+            executor.submit(worker) for _ in range(args.concurrency)
+        ]:
+            future.result()
+    seconds = perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": args.requests,
+        "errors": errors,
+        "seconds": seconds,
+        # 失敗したリクエストは速く返ることが多いので、成功した分だけで数える
+        "requests_per_sec": (
+            len(latencies) / seconds if seconds > 0 else 0.0
+        ),
+        "errors_per_sec": errors / seconds if seconds > 0 else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p90_ms": percentile(latencies, 0.90) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+    }
+
+
+def main() -> None:
+    """負荷試験を実行して結果を表示する."""
+    args = parse_args()
+    server = None
+    if args.spawn:
+        server = subprocess.Popen(
+            [sys.executable, "-m", "mazegen.server",
+             "--host", args.host, "--port", str(args.port)],
+            stdout=subprocess.DEVNULL
+        )
+    try:
+        wait_for_server(
+            args.host, args.port, SPAWN_TIMEOUT if server else 1.0
+        )
+        result = run(args)
+    except TimeoutError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(
+        f"{result['requests']} requests ({result['errors']} errors) "
+        f"in {result['seconds']:.2f}s: "
+        f"{result['requests_per_sec']:.1f} req/s "
+        f"({result['errors_per_sec']:.1f} errors/s)"
+    )
+    print(
+        f"latency p50 {result['p50_ms']:.2f} ms, "
+        f"p90 {result['p90_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms, "
+        f"max {result['max_ms']:.2f} ms"
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "result": result}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 """迷路生成ライブラリ."""
 
 from .generator import MazeGenerator
+from .packed import PackedMaze
 
-__all__ = ["MazeGenerator"]
+__all__ = ["MazeGenerator", "PackedMaze"]
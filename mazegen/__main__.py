@@ -0,0 +1,5 @@
+"""python3 -m mazegen で描画せずに迷路を生成する(mazegen.headlessを参照)."""
+from .headless import main
+
+if __name__ == "__main__":
+    main()
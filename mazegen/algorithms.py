@@ -0,0 +1,349 @@
+"""迷路生成のアルゴリズムを切り替えるモジュール.
+
+どのアルゴリズムも同じ形の関数(MazeAlgorithm)で、上の行から順に
+1セル1バイトの壁(N=1, E=2, S=4, W=8)の行を返す. MazeGenerator,
+PackedMaze, iter_hex_rows()などはこの行を受け取るだけなので、
+ALGORITHMSに登録した名前を渡せばどのアルゴリズムでも使える.
+
+    "knock": 棒倒し法(mazegen.rows). 従来と同じ迷路になる.
+    "kruskal": 壁をランダムな順に見て、繋がっていないセル同士の壁だけを
+        開けるクラスカル法. 繋がりはarrayで持つUnion-Findで判定する.
+        迷路全体の壁を保持するので、メモリはセル数に比例する.
+    "eller": 1行ずつ集合をまとめて下の行へ繋ぐEller法.
+        今の行の集合だけを保持するので、メモリは迷路の幅にのみ比例する.
+
+42スタンプのセルはどのアルゴリズムでも通路にせず、4方向とも壁のまま残す.
+不完全迷路では"kruskal"と"eller"は、既に繋がっているセル同士の壁を
+loop_densityの確率で開けてループを作る(棒倒し法は従来通り4割の柱を倒さない).
+"""
+import random
+from array import array
+from collections.abc import Iterator
+from typing import Protocol
+
+from .constants import FT_PATTERN, WALL_E, WALL_N, WALL_S, WALL_W, ft_start
+from .rows import iter_cell_rows
+
+DEFAULT_ALGORITHM = "knock"
+DEFAULT_LOOP_DENSITY = 0.1
+
+
+class MazeAlgorithm(Protocol):
+    """迷路を1行ずつ生成する関数の形."""
+
+    def __call__(
+        self,
+        width: int,
+        height: int,
+        perfect: bool,
+        pattern: bool,
+        rng: random.Random,
+        engine: str,
+        loop_density: float
+    ) -> Iterator[bytes]:
+        """迷路を生成し、上の行から順に各セルの壁を返す.
+
+        Args:
+            width (int): 迷路の幅.
+            height (int): 迷路の高さ.
+            perfect (bool): 完全迷路にするかどうか.
+            pattern (bool): 42ロゴを埋め込むかどうか.
+            rng (random.Random): 乱数生成器(シード値は呼び出し側で設定する).
+            engine (str): 棒倒しのエンジン(棒倒し法以外は使わない).
+            loop_density (float): 不完全迷路でループを作る確率.
+
+        Yields:
+            bytes: 各セルの壁(0~15)を1セル1バイトで並べた行.
+        """
+        ...
+
+
+class DisjointSet:
+    """要素を0~size - 1の番号で扱うUnion-Find.
+
+    親と階数を番号をそのまま添字にする配列で持つ. findは根までの
+    経路上の要素を全て根に繋ぎ直し(経路圧縮)、unionは階数の低い方の根を
+    高い方の根に繋ぐ(ランクによる併合).
+
+    Attributes:
+        _parent (array): 各要素の親(根は自分自身).
+        _rank (bytearray): 根の木の高さの上限(高々log2(size)).
+    """
+
+    def __init__(self, size: int) -> None:
+        """要素が全て別々の集合の状態で初期化する."""
+        self._parent = array("i", range(size))
+        self._rank = bytearray(size)
+
+    def find(self, node: int) -> int:
+        """nodeの集合の根を返す."""
+        parent = self._parent
+        root = node
+        while parent[root] != root:
+            root = parent[root]
+        while parent[node] != root:
+            parent[node], node = root, parent[node]
+        return root
+
+    def union(self, a: int, b: int) -> bool:
+        """aとbの集合をまとめる. 既に同じ集合ならFalseを返す."""
+        root_a = self.find(a)
+        root_b = self.find(b)
+        if root_a == root_b:
+            return False
+        rank = self._rank
+        if rank[root_a] < rank[root_b]:
+            root_a, root_b = root_b, root_a
+        self._parent[root_b] = root_a
+        if rank[root_a] == rank[root_b]:
+            rank[root_a] += 1
+        return True
+
+
+def _stamp_rows(width: int, height: int, pattern: bool) -> dict[int, bytes]:
+    """行 -> その行の42スタンプのセル(1/0)を返す. スタンプがなければ空."""
+    start = ft_start(width, height) if pattern else None
+    if start is None:
+        return {}
+    start_x, start_y = start
+    rows = {}
+    for row, pattern_row in enumerate(FT_PATTERN):
+        cells = bytearray(width)
+        cells[start_x:start_x + len(pattern_row)] = bytes(pattern_row)
+        rows[start_y + row] = bytes(cells)
+    return rows
+
+
+def knock_rows(
+    width: int,
+    height: int,
+    perfect: bool,
+    pattern: bool,
+    rng: random.Random,
+    engine: str,
+    loop_density: float
+) -> Iterator[bytes]:
+    """棒倒し法(mazegen.rows.iter_cell_rows). loop_densityは使わない."""
+    return iter_cell_rows(width, height, perfect, pattern, engine, rng)
+
+
+def kruskal_rows(
+    width: int,
+    height: int,
+    perfect: bool,
+    pattern: bool,
+    rng: random.Random,
+    engine: str,
+    loop_density: float
+) -> Iterator[bytes]:
+    """クラスカル法で迷路を作る.
+
+    隣り合うセル同士の壁をシャッフルし、順に見て別々の集合のセルを
+    隔てている壁だけを開ける. 全ての壁を見終わると42スタンプ以外の
+    全セルが1つの木になる. 不完全迷路では開けなかった壁を
+    loop_densityの確率で開ける. engineは使わない.
+    """
+    size = width * height
+    walls = bytearray(b"\x0f") * size
+    # 壁の番号: セルiの東の壁はi * 2、南の壁はi * 2 + 1
+    edges: list[int] = []
+    for y in range(height):
+        row = y * width
+        edges.extend(range(row * 2, (row + width - 1) * 2, 2))
+        if y < height - 1:
+            edges.extend(range(row * 2 + 1, (row + width) * 2, 2))
+    stamp = _stamp_rows(width, height, pattern)
+    if stamp:
+        blocked = bytearray(size)
+        for y, cells in stamp.items():
+            blocked[y * width:(y + 1) * width] = cells
+        edges = [
+            edge for edge in edges
+            if not blocked[edge >> 1]
+            and not blocked[(edge >> 1) + (width if edge & 1 else 1)]
+        ]
+    rng.shuffle(edges)
+
+    sets = DisjointSet(size)
+    union = sets.union
+    loops = not perfect and loop_density > 0
+    for edge in edges:
+        cell = edge >> 1
+        if edge & 1:
+            other = cell + width
+            if union(cell, other) or (
+                loops and rng.random() < loop_density
+            ):
+                walls[cell] &= ~WALL_S
+                walls[other] &= ~WALL_N
+        else:
+            other = cell + 1
+            if union(cell, other) or (
+                loops and rng.random() < loop_density
+            ):
+                walls[cell] &= ~WALL_E
+                walls[other] &= ~WALL_W
+    for y in range(height):
+        yield bytes(walls[y * width:(y + 1) * width])
+
+
+def _merge(
+    cells: bytearray,
+    labels: list[int],
+    members: dict[int, list[int]],
+    x: int
+) -> None:
+    """セルxとx + 1の間の壁を開け、2つの集合を大きい方にまとめる."""
+    cells[x] &= ~WALL_E
+    cells[x + 1] &= ~WALL_W
+    keep, drop = labels[x], labels[x + 1]
+    if len(members[keep]) < len(members[drop]):
+        keep, drop = drop, keep
+    moved = members.pop(drop)
+    for moved_x in moved:
+        labels[moved_x] = keep
+    members[keep].extend(moved)
+
+
+def eller_rows(
+    width: int,
+    height: int,
+    perfect: bool,
+    pattern: bool,
+    rng: random.Random,
+    engine: str,
+    loop_density: float
+) -> Iterator[bytes]:
+    """Eller法で迷路を1行ずつ作る.
+
+    各行で、隣り合う別々の集合のセルを1/2の確率でまとめ(最後の行は全て)、
+    集合ごとに1つ以上のセルから下の行へ繋ぐ. 下に42スタンプしかない
+    集合は隣の集合とまとめてから繋ぐので、どの集合も途中で途切れない.
+    不完全迷路では同じ集合のセル同士の壁をloop_densityの確率で開ける.
+    engineは使わない.
+    """
+    stamp = _stamp_rows(width, height, pattern)
+    no_stamp = bytes(width)
+    # labels: 今の行の各セルの集合の番号、members: 集合の番号 -> セルのx
+    labels = [0] * width
+    opened = bytes(width)
+    next_label = 0
+    for y in range(height):
+        blocked = stamp.get(y, no_stamp)
+        last = y == height - 1
+        cells = bytearray(b"\x0f") * width
+        members: dict[int, list[int]] = {}
+        for x in range(width):
+            if blocked[x]:
+                continue
+            if opened[x]:
+                # 上の行から繋がったセルは上の集合のまま
+                cells[x] &= ~WALL_N
+            else:
+                labels[x] = next_label
+                next_label += 1
+            members.setdefault(labels[x], []).append(x)
+
+        for x in range(width - 1):
+            if blocked[x] or blocked[x + 1]:
+                continue
+            if labels[x] != labels[x + 1]:
+                if last or rng.random() < 0.5:
+                    _merge(cells, labels, members, x)
+            elif not perfect and rng.random() < loop_density:
+                cells[x] &= ~WALL_E
+                cells[x + 1] &= ~WALL_W
+        if last:
+            yield bytes(cells)
+            break
+
+        below = stamp.get(y + 1, no_stamp)
+        if below is not no_stamp:
+            # 下が全て42スタンプの集合は、隣の集合とまとめる
+            changed = True
+            while changed:
+                changed = False
+                for xs in list(members.values()):
+                    if any(not below[x] for x in xs):
+                        continue
+                    for x in xs:
+                        if x > 0 and not blocked[x - 1] \
+                                and labels[x - 1] != labels[x]:
+                            _merge(cells, labels, members, x - 1)
+                        elif x < width - 1 and not blocked[x + 1] \
+                                and labels[x + 1] != labels[x]:
+                            _merge(cells, labels, members, x)
+                        else:
+                            continue
+                        changed = True
+                        break
+                    if changed:
+                        break
+
+        down = bytearray(width)
+        for xs in members.values():
+            candidates = [x for x in xs if not below[x]]
+            if not candidates:
+                continue
+            chosen = [x for x in candidates if rng.random() < 0.5]
+            if not chosen:
+                chosen = [rng.choice(candidates)]
+            for x in chosen:
+                cells[x] &= ~WALL_S
+                down[x] = 1
+        opened = bytes(down)
+        yield bytes(cells)
+
+
+# 名前 -> アルゴリズム(新しいアルゴリズムはここに足す)
+ALGORITHMS: dict[str, MazeAlgorithm] = {
+    "knock": knock_rows,
+    "kruskal": kruskal_rows,
+    "eller": eller_rows,
+}
+
+
+def validate_algorithm(algorithm: str, loop_density: float) -> None:
+    """アルゴリズムの名前とループの確率の有効値チェック.
+
+    Raises:
+        ValueError: 登録されていない名前、またはloop_densityが0~1の外の場合.
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown maze algorithm: '{algorithm}'")
+    if not 0.0 <= loop_density <= 1.0:
+        raise ValueError("LOOP_DENSITY must be between 0 and 1")
+
+
+def iter_algorithm_rows(
+    algorithm: str,
+    width: int,
+    height: int,
+    perfect: bool,
+    pattern: bool,
+    rng: random.Random,
+    engine: str = "auto",
+    loop_density: float = DEFAULT_LOOP_DENSITY
+) -> Iterator[bytes]:
+    """名前で選んだアルゴリズムで迷路を作り、上の行から順に壁を返す.
+
+    Args:
+        algorithm (str): ALGORITHMSに登録した名前.
+        width (int): 迷路の幅.
+        height (int): 迷路の高さ.
+        perfect (bool): 完全迷路にするかどうか.
+        pattern (bool): 42ロゴを埋め込むかどうか.
+        rng (random.Random): 乱数生成器(シード値は呼び出し側で設定する).
+        engine (str): 棒倒しのエンジン("auto", "scalar", "batch").
+        loop_density (float): 不完全迷路でループを作る確率(0~1).
+
+    Returns:
+        Iterator[bytes]: 各セルの壁(0~15)を1セル1バイトで並べた行.
+
+    Raises:
+        ValueError: algorithmかloop_densityが無効な場合.
+    """
+    validate_algorithm(algorithm, loop_density)
+    return ALGORITHMS[algorithm](
+        width, height, perfect, pattern, rng, engine, loop_density
+    )
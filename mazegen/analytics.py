@@ -0,0 +1,240 @@
+"""迷路の難しさの指標を求めるモジュール.
+
+壁は1セル1バイト(N=1, E=2, S=4, W=8)をすき間なく行順に並べたもの
+(セル(x, y)は walls[y * width + x])で受け取る. 4方向とも壁のセル
+(42スタンプ)は迷路に含めない.
+
+セルの進める向きの数(次数)で分類する.
+    行き止まり: 1, 通路: 2, 分岐: 3以上.
+行き止まりと分岐を「節」とし、節から次の節まで次数2のセルをたどった道を
+通路(corridor)として長さ(歩数)を数える. 次数2のセルは1回しか
+たどらないので、全体で O(セル数) になる.
+
+ループの数は、セルを頂点・壁のない所を辺としたグラフの
+    辺の数 - セルの数 + 連結成分の数
+(完全迷路なら0). 連結成分は通路で繋がった節をUnion-Findでまとめて数える.
+
+次数ごとの数と辺の数は、"scalar"ではセルを1つずつ数え、
+"vectorized"では変換表(bytes.translate)とbytes.countでまとめて数える.
+"auto"は大きい迷路だけ"vectorized"にする(結果はどれも同じ).
+"""
+from dataclasses import dataclass, field
+from itertools import compress
+
+from .algorithms import DisjointSet
+from .constants import WALL_E, WALL_S
+from .solver import open_moves
+
+ANALYTICS_METHODS = ("auto", "scalar", "vectorized")
+# "auto"でこのセル数以上なら"vectorized"にする
+VECTORIZED_CELLS = 4096
+
+# セルの値 -> 進める向きの数
+_DEGREE = bytes(4 - bin(value & 0xF).count("1") for value in range(256))
+
+
+def _degree_table(*degrees: int) -> bytes:
+    """セルの値 -> 次数がdegreesのどれかなら1 の変換表を作る."""
+    return bytes(1 if _DEGREE[value] in degrees else 0 for value in range(256))
+
+
+_IS_DEAD_END = _degree_table(1)
+_IS_JUNCTION = _degree_table(3, 4)
+_IS_NODE = _degree_table(1, 3, 4)
+_IS_CORRIDOR = _degree_table(2)
+_OPEN_E = bytes(0 if value & WALL_E else 1 for value in range(256))
+_OPEN_S = bytes(0 if value & WALL_S else 1 for value in range(256))
+
+
+@dataclass
+class MazeAnalytics:
+    """迷路の難しさの指標.
+
+    Attributes:
+        cells (int): 迷路のセル数(42スタンプを除く).
+        dead_ends (int): 行き止まり(1方向にしか進めないセル)の数.
+        junctions (int): 分岐(3方向以上に進めるセル)の数.
+        corridors (dict[int, int]): 通路の長さ(歩数) -> 本数.
+        longest_dead_end (int): 行き止まりで終わる通路のうち最も長いものの長さ.
+        loops (int): ループの数(完全迷路なら0).
+        solution_length (int): 入口から出口までの最短経路の歩数.
+    """
+
+    cells: int
+    dead_ends: int
+    junctions: int
+    corridors: dict[int, int] = field(default_factory=dict)
+    longest_dead_end: int = 0
+    loops: int = 0
+    solution_length: int = 0
+
+    def as_dict(self) -> dict[str, object]:
+        """JSONにできる辞書で返す(通路の長さはキーを文字列にする)."""
+        return {
+            "cells": self.cells,
+            "dead_ends": self.dead_ends,
+            "junctions": self.junctions,
+            "corridors": {
+                str(length): count
+                for length, count in sorted(self.corridors.items())
+            },
+            "longest_dead_end": self.longest_dead_end,
+            "loops": self.loops,
+            "solution_length": self.solution_length,
+        }
+
+
+def _count_scalar(walls: bytes) -> tuple[int, int, int, int, list[int]]:
+    """セルを1つずつ見て数える.
+
+    Returns:
+        tuple[int, int, int, int, list[int]]: セル数、行き止まり、分岐、
+            辺の数、節の添字.
+    """
+    cells = dead_ends = junctions = edges = 0
+    nodes = []
+    for index, value in enumerate(walls):
+        degree = _DEGREE[value]
+        if not degree:
+            continue
+        cells += 1
+        edges += (not value & WALL_E) + (not value & WALL_S)
+        if degree == 1:
+            dead_ends += 1
+            nodes.append(index)
+        elif degree >= 3:
+            junctions += 1
+            nodes.append(index)
+    return cells, dead_ends, junctions, edges, nodes
+
+
+def _count_vectorized(
+    walls: bytes
+) -> tuple[int, int, int, int, list[int]]:
+    """変換表でまとめて数える(_count_scalarと同じ値を返す)."""
+    cells = len(walls) - walls.count(0xF)
+    dead_ends = walls.translate(_IS_DEAD_END).count(1)
+    junctions = walls.translate(_IS_JUNCTION).count(1)
+    edges = (
+        walls.translate(_OPEN_E).count(1) + walls.translate(_OPEN_S).count(1)
+    )
+    return cells, dead_ends, junctions, edges, _positions(
+        walls.translate(_IS_NODE)
+    )
+
+
+def _positions(mask: bytes) -> list[int]:
+    """maskの値が1の添字を返す(値は0か1)."""
+    return list(compress(range(len(mask)), mask))
+
+
+def _walk_corridors(
+    walls: bytes, width: int, nodes: list[int]
+) -> tuple[dict[int, int], int, int]:
+    """節から次の節まで通路をたどる.
+
+    Returns:
+        tuple[dict[int, int], int, int]: 通路の長さ -> 本数、
+            行き止まりで終わる通路の最長、連結成分の数.
+    """
+    opens = open_moves(width)
+    # 次数2のセルの値 -> 2つの向きの添字の増分
+    pairs = [tuple(delta for _, delta in moves) for moves in opens]
+    visited = bytearray(len(walls))
+    sets = DisjointSet(len(walls))
+    corridors: dict[int, int] = {}
+    longest = 0
+    for node in nodes:
+        for _, delta in opens[walls[node]]:
+            prev = node
+            current = node + delta
+            length = 1
+            if _DEGREE[walls[current]] == 2:
+                # 反対側の節から既にたどった通路
+                if visited[current]:
+                    continue
+                while _DEGREE[walls[current]] == 2:
+                    visited[current] = 1
+                    first, second = pairs[walls[current]]
+                    nxt = current + first
+                    if nxt == prev:
+                        nxt = current + second
+                    prev, current = current, nxt
+                    length += 1
+            elif current < node:
+                # 隣り合う節の間の通路は片方からだけ数える
+                continue
+            corridors[length] = corridors.get(length, 0) + 1
+            if _DEGREE[walls[node]] == 1 or _DEGREE[walls[current]] == 1:
+                longest = max(longest, length)
+            sets.union(node, current)
+    components = len({sets.find(node) for node in nodes})
+
+    # 節を含まない輪(次数2のセルだけのループ)
+    rest = (
+        int.from_bytes(walls.translate(_IS_CORRIDOR), "big")
+        & ~int.from_bytes(visited, "big")
+    ).to_bytes(len(walls), "big")
+    for start in _positions(rest):
+        if visited[start]:
+            continue
+        prev = start
+        current = start + pairs[walls[start]][0]
+        length = 1
+        visited[start] = 1
+        while current != start:
+            visited[current] = 1
+            first, second = pairs[walls[current]]
+            nxt = current + first
+            if nxt == prev:
+                nxt = current + second
+            prev, current = current, nxt
+            length += 1
+        corridors[length] = corridors.get(length, 0) + 1
+        components += 1
+    return corridors, longest, components
+
+
+def analyze_walls(
+    walls: bytes,
+    width: int,
+    height: int,
+    solution_length: int = 0,
+    method: str = "auto"
+) -> MazeAnalytics:
+    """セルの壁から迷路の指標を求める.
+
+    Args:
+        walls (bytes): 1セル1バイトの壁を行順にすき間なく並べたもの.
+        width (int): 迷路の幅.
+        height (int): 迷路の高さ.
+        solution_length (int): 最短経路の歩数(呼び出し側で求めたもの).
+        method (str): 数え方("auto", "scalar", "vectorized").
+
+    Returns:
+        MazeAnalytics: 迷路の指標.
+
+    Raises:
+        ValueError: methodが不明な値、またはwallsの長さが合わない場合.
+    """
+    if method not in ANALYTICS_METHODS:
+        raise ValueError(f"Unknown analytics method: '{method}'")
+    if len(walls) != width * height:
+        raise ValueError("The walls do not match the maze size")
+    if method == "vectorized" or (
+        method == "auto" and len(walls) >= VECTORIZED_CELLS
+    ):
+        counted = _count_vectorized(walls)
+    else:
+        counted = _count_scalar(walls)
+    cells, dead_ends, junctions, edges, nodes = counted
+    corridors, longest, components = _walk_corridors(walls, width, nodes)
+    return MazeAnalytics(
+        cells=cells,
+        dead_ends=dead_ends,
+        junctions=junctions,
+        corridors=corridors,
+        longest_dead_end=longest,
+        loops=edges - cells + components,
+        solution_length=solution_length,
+    )
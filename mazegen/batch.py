@@ -0,0 +1,362 @@
+"""シード値の範囲で迷路をまとめて生成するモジュール.
+
+シード値を一定数ずつの塊に分けてProcessPoolExecutorに渡し、
+各プロセスでPackedMaze(MazeGeneratorと同じ結果)を生成する.
+出力は迷路ごとに出力ファイル(maze.txt)と同じ形式で、
+ディレクトリなら maze_<seed>.txt を各プロセスが直接書き込み、
+アーカイブ(.zip, .tar, .tar.gz, .tgz)なら親プロセスが1つのファイルにまとめる.
+analytics=Trueなら迷路ごとの指標(mazegen.analytics)も各プロセスで求め、
+親プロセスがシード値の順に1行1つのJSONで analytics.jsonl に書き込む
+(ディレクトリならその中、アーカイブならその1ファイルとして).
+
+スレッドで生成する関数(generate_threaded, generate_async)もある.
+迷路ごとに別の乱数生成器を使うので、同時に生成しても
+同じシード値なら常に同じ迷路になる.
+"""
+import asyncio
+import io
+import json
+import os
+import tarfile
+import zipfile
+from collections.abc import Iterable, Iterator
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from dataclasses import dataclass
+from functools import partial
+from time import perf_counter
+
+from .algorithms import validate_algorithm
+from .export import atomic_open
+from .generator import MazeGenerator, validate_points
+from .packed import PackedMaze
+
+# 迷路の設定(幅, 高さ, 入口, 出口, 完全迷路, 42ロゴ, アルゴリズム, ループの確率)
+MazeParams = tuple[
+    int, int, tuple[int, int], tuple[int, int], bool, bool, str, float
+]
+
+# 迷路ごとの指標を書き込むファイル名
+ANALYTICS_FILE_NAME = "analytics.jsonl"
+
+# 出力先の拡張子 -> アーカイブの種類
+_ARCHIVE_SUFFIXES = {
+    ".zip": "zip", ".tar": "tar", ".tar.gz": "tgz", ".tgz": "tgz"
+}
+
+
+@dataclass
+class BatchResult:
+    """まとめて生成した結果.
+
+    Attributes:
+        count (int): 生成した迷路の数.
+        seconds (float): 生成から書き込みまでにかかった時間(秒).
+        bytes_written (int): 書き込んだ迷路のバイト数(圧縮前).
+    """
+
+    count: int
+    seconds: float
+    bytes_written: int
+
+    @property
+    def rate(self) -> float:
+        """1秒あたりに生成した迷路の数."""
+        return self.count / self.seconds if self.seconds > 0 else 0.0
+
+
+def maze_file_name(seed: int) -> str:
+    """シード値に対応する迷路のファイル名を返す."""
+    return f"maze_{seed}.txt"
+
+
+def _solved_maze(params: MazeParams, seed: int) -> tuple[PackedMaze, str]:
+    """迷路を1つ生成して、最短経路と一緒に返す."""
+    (
+        width, height, entry_point, exit_point, perfect, pattern, algorithm,
+        loop_density
+    ) = params
+    maze = PackedMaze(
+        width, height, entry_point, exit_point, perfect, seed, pattern,
+        algorithm=algorithm, loop_density=loop_density
+    )
+    maze.generate()
+    return maze, maze.solve_maze()
+
+
+def _format_text(maze: PackedMaze, params: MazeParams, path_str: str) -> bytes:
+    """生成済みの迷路を出力ファイルと同じ形式のバイト列にする."""
+    entry_point, exit_point = params[2], params[3]
+    lines = maze.get_hex_grid()
+    lines.append("")
+    lines.append(f"{entry_point[0]},{entry_point[1]}")
+    lines.append(f"{exit_point[0]},{exit_point[1]}")
+    lines.append(path_str)
+    return "\n".join(lines).encode("ascii")
+
+
+def maze_text(params: MazeParams, seed: int) -> bytes:
+    """迷路を1つ生成して、出力ファイルと同じ形式のバイト列にする.
+
+    Args:
+        params (MazeParams): 迷路の設定.
+        seed (int): シード値.
+
+    Returns:
+        bytes: 16進数の行、空行、入口、出口、最短経路.
+    """
+    maze, path_str = _solved_maze(params, seed)
+    return _format_text(maze, params, path_str)
+
+
+def maze_analytics(params: MazeParams, seed: int) -> tuple[bytes, bytes]:
+    """迷路を1つ生成して、出力ファイルの形式と指標のJSONの1行を返す.
+
+    Args:
+        params (MazeParams): 迷路の設定.
+        seed (int): シード値.
+
+    Returns:
+        tuple[bytes, bytes]: maze_text()と同じバイト列と、
+            {"seed": シード値, 指標...}のJSON(改行なし).
+    """
+    maze, path_str = _solved_maze(params, seed)
+    metrics = maze.analyze(path_str=path_str).as_dict()
+    line = json.dumps({"seed": seed, **metrics}, separators=(",", ":"))
+    return _format_text(maze, params, path_str), line.encode("ascii")
+
+
+def _generate_chunk(
+    params: MazeParams,
+    seeds: range,
+    directory: str | None,
+    analytics: bool = False
+) -> tuple[list[tuple[int, bytes]], int, list[tuple[int, bytes]]]:
+    """子プロセスで塊1つ分の迷路を生成する.
+
+    directoryがあればそこに直接書き込み、なければ親プロセスに返す.
+    指標はどちらでも親プロセスに返す.
+
+    Returns:
+        tuple[list[tuple[int, bytes]], int, list[tuple[int, bytes]]]:
+            返す(シード値, 迷路)のリスト、生成した迷路のバイト数、
+            (シード値, 指標のJSON)のリスト(analyticsがFalseなら空).
+    """
+    mazes = []
+    metrics = []
+    total = 0
+    for seed in seeds:
+        if analytics:
+            text, line = maze_analytics(params, seed)
+            metrics.append((seed, line))
+        else:
+            text = maze_text(params, seed)
+        total += len(text)
+        if directory is None:
+            mazes.append((seed, text))
+        else:
+            path = os.path.join(directory, maze_file_name(seed))
+            with open(path, "wb") as f:
+                f.write(text)
+    return mazes, total, metrics
+
+
+def _chunks(seeds: range, chunk_size: int) -> Iterator[range]:
+    """シード値の範囲をchunk_size個ずつに分ける."""
+    for start in range(0, len(seeds), chunk_size):
+        yield seeds[start:start + chunk_size]
+
+
+def _archive_mode(output: str) -> str | None:
+    """出力先の拡張子からアーカイブの種類を返す. ディレクトリならNone."""
+    lower = output.lower()
+    for suffix, mode in _ARCHIVE_SUFFIXES.items():
+        if lower.endswith(suffix):
+            return mode
+    return None
+
+
+def generate_batch(
+    params: MazeParams,
+    seeds: range,
+    output: str,
+    workers: int | None = None,
+    chunk_size: int = 32,
+    analytics: bool = False,
+) -> BatchResult:
+    """シード値の範囲の迷路を複数のプロセスで生成して書き込む.
+
+    同時に投入する塊はプロセス数の2倍までにして、
+    アーカイブに書き込む前の迷路がメモリに溜まりすぎないようにする.
+
+    Args:
+        params (MazeParams): 迷路の設定(幅, 高さ, 入口, 出口, 完全迷路, 42ロゴ,
+            アルゴリズム, ループの確率).
+        seeds (range): シード値の範囲(1以上. 0はランダムになり再現できない).
+        output (str): 出力先. .zip, .tar, .tar.gz, .tgzならアーカイブ、
+            それ以外はディレクトリ(なければ作る).
+        workers (int | None): プロセス数. Noneならos.cpu_count().
+        chunk_size (int): 1回にプロセスへ渡すシード値の数.
+        analytics (bool): 迷路ごとの指標をanalytics.jsonlに書き込むかどうか.
+
+    Returns:
+        BatchResult: 生成した数、時間、バイト数.
+
+    Raises:
+        OSError: 書き込めなかった場合.
+        ValueError: 設定やシード値、chunk_sizeが無効な場合.
+    """
+    width, height, entry_point, exit_point, _, _, algorithm, density = params
+    validate_points(width, height, entry_point, exit_point)
+    validate_algorithm(algorithm, density)
+    if len(seeds) and min(seeds[0], seeds[-1]) < 1:
+        raise ValueError("Seed values must be 1 or more")
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be 1 or more")
+
+    mode = _archive_mode(output)
+    directory = None
+    if mode is None:
+        os.makedirs(output, exist_ok=True)
+        directory = output
+    archive: zipfile.ZipFile | tarfile.TarFile | None = None
+    if mode == "zip":
+        archive = zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED)
+    elif mode == "tgz":
+        archive = tarfile.open(output, "w:gz")
+    elif mode == "tar":
+        archive = tarfile.open(output, "w")
+
+    start = perf_counter()
+    total = 0
+    # 塊は終わった順に返るので、最後にシード値の順に並べて書き込む
+    metrics: list[tuple[int, bytes]] = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            limit = (workers or os.cpu_count() or 1) * 2
+            pending: set[Future[
+                tuple[list[tuple[int, bytes]], int, list[tuple[int, bytes]]]
+            ]] = set()
+            chunks = _chunks(seeds, chunk_size)
+            while True:
+                # 投入数の上限まで塊を足す
+                for chunk in chunks:
+                    pending.add(executor.submit(
+                        _generate_chunk, params, chunk, directory, analytics
+                    ))
+                    if len(pending) >= limit:
+                        break
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    mazes, written, lines = future.result()
+                    total += written
+                    metrics.extend(lines)
+                    if archive is not None:
+                        _write_archive(archive, mazes)
+        if analytics:
+            metrics.sort()
+            data = b"".join(line + b"\n" for _, line in metrics)
+            if archive is not None:
+                _add_member(archive, ANALYTICS_FILE_NAME, data)
+            else:
+                with atomic_open(
+                    os.path.join(output, ANALYTICS_FILE_NAME)
+                ) as f:
+                    f.write(data)
+    finally:
+        if archive is not None:
+            archive.close()
+    return BatchResult(len(seeds), perf_counter() - start, total)
+
+
+def _write_archive(
+    archive: zipfile.ZipFile | tarfile.TarFile,
+    mazes: list[tuple[int, bytes]]
+) -> None:
+    """迷路をアーカイブに追加する."""
+    for seed, text in mazes:
+        _add_member(archive, maze_file_name(seed), text)
+
+
+def _add_member(
+    archive: zipfile.ZipFile | tarfile.TarFile, name: str, data: bytes
+) -> None:
+    """dataをnameのファイルとしてアーカイブに追加する."""
+    if isinstance(archive, zipfile.ZipFile):
+        archive.writestr(name, data)
+    else:
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        archive.addfile(info, io.BytesIO(data))
+
+
+def build_maze(params: MazeParams, seed: int) -> MazeGenerator:
+    """MazeGeneratorを作って迷路を生成する.
+
+    Args:
+        params (MazeParams): 迷路の設定.
+        seed (int): シード値(0なら再現しない新しい乱数).
+
+    Returns:
+        MazeGenerator: 生成済みの迷路.
+    """
+    (
+        width, height, entry_point, exit_point, perfect, pattern, algorithm,
+        loop_density
+    ) = params
+    generator = MazeGenerator(
+        width, height, entry_point, exit_point, perfect, seed, pattern,
+        algorithm=algorithm, loop_density=loop_density
+    )
+    generator.generate()
+    return generator
+
+
+def generate_threaded(
+    params: MazeParams,
+    seeds: Iterable[int],
+    workers: int | None = None,
+) -> list[MazeGenerator]:
+    """シード値ごとの迷路をスレッドプールで生成する.
+
+    生成はGILのため並列には速くならないが、呼び出し元のスレッドを
+    塞がずに済み、結果はシード値の順に並ぶ.
+
+    Args:
+        params (MazeParams): 迷路の設定.
+        seeds (Iterable[int]): シード値.
+        workers (int | None): スレッド数. NoneならThreadPoolExecutorの既定.
+
+    Returns:
+        list[MazeGenerator]: seedsと同じ順の生成済みの迷路.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(partial(build_maze, params), seeds))
+
+
+async def generate_async(
+    params: MazeParams,
+    seed: int,
+    executor: Executor | None = None,
+) -> MazeGenerator:
+    """イベントループを止めずに迷路を1つ生成する(非同期サーバー用).
+
+    Args:
+        params (MazeParams): 迷路の設定.
+        seed (int): シード値.
+        executor (Executor | None): 生成に使うExecutor.
+            Noneならイベントループの既定のスレッドプール.
+
+    Returns:
+        MazeGenerator: 生成済みの迷路.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, build_maze, params, seed)
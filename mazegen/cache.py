@@ -0,0 +1,246 @@
+"""生成した迷路を設定ごとに保存するキャッシュのモジュール.
+
+迷路は(幅, 高さ, 入口, 出口, 完全迷路, シード値, 42ロゴ, アルゴリズム,
+ループの確率)が同じなら常に同じになるので、この組をキーにして生成したグリッド、
+最短経路、16進数の行を保存する.
+
+メモリ上はバイト数の上限を決めたLRUで、古く使われていないものから捨てる.
+ディレクトリを渡すとディスクにも保存し(グリッドはzlibで圧縮)、
+メモリから捨てた後やプロセスを起動し直した後もそこから読み込む.
+シード値が0(毎回新しい乱数)の迷路は再現しないのでキャッシュしない.
+"""
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import suppress
+from dataclasses import dataclass
+
+# (幅, 高さ, 入口, 出口, 完全迷路, シード値, 42ロゴ, アルゴリズム, ループの確率)
+CacheKey = tuple[
+    int, int, tuple[int, int], tuple[int, int], bool, int, bool, str, float
+]
+
+# ディスクのファイル: マジック, 圧縮したグリッドのバイト数, 経路の長さ(-1はなし)
+_DISK_HEADER = struct.Struct("<4sQq")
+_DISK_MAGIC = b"AMZC"
+_DISK_SUFFIX = ".mzc"
+
+
+@dataclass
+class CachedMaze:
+    """キャッシュした迷路.
+
+    Attributes:
+        grid (bytes): generate()した後(経路をROUTEにする前)のグリッド.
+        path (str | None): "bfs"で求めた最短経路. まだ求めていなければNone.
+        hex_grid (list[str] | None): 16進数の行. まだ作っていなければNone.
+    """
+
+    grid: bytes
+    path: str | None = None
+    hex_grid: list[str] | None = None
+
+    @property
+    def nbytes(self) -> int:
+        """メモリ上のおおよそのバイト数(グリッド、経路、16進数の文字数)."""
+        size = len(self.grid)
+        if self.path is not None:
+            size += len(self.path)
+        if self.hex_grid is not None:
+            size += sum(len(row) for row in self.hex_grid)
+        return size
+
+
+class MazeCache:
+    """生成した迷路のLRUキャッシュ.
+
+    複数のスレッドから使えるように、メモリ上の表は1つのロックで守る.
+
+    Attributes:
+        max_bytes (int): メモリ上に置く迷路の合計バイト数の上限.
+        hits (int): 見つかった回数(ディスクから読んだ分を含む).
+        misses (int): 見つからなかった回数.
+        _directory (str | None): ディスクに保存するディレクトリ.
+        _entries (OrderedDict[CacheKey, CachedMaze]): 古く使った順の迷路.
+        _size (int): メモリ上の迷路の合計バイト数.
+        _lock (threading.Lock): _entriesと_sizeを守るロック.
+    """
+
+    def __init__(
+        self, max_bytes: int = 64 * 2**20, directory: str | None = None
+    ) -> None:
+        """MazeCacheを初期化する.
+
+        Args:
+            max_bytes (int): メモリ上に置く迷路の合計バイト数の上限.
+                これより大きい迷路はメモリには置かない(ディスクには保存する).
+            directory (str | None): ディスクに保存するディレクトリ
+                (なければ作る). Noneならメモリだけ.
+
+        Raises:
+            ValueError: max_bytesが負の場合.
+        """
+        if max_bytes < 0:
+            raise ValueError("max_bytes must be 0 or more")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._directory = directory
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self._entries: OrderedDict[CacheKey, CachedMaze] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """メモリ上の迷路の数."""
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        """メモリ上の迷路の合計バイト数."""
+        return self._size
+
+    @staticmethod
+    def cacheable(key: CacheKey) -> bool:
+        """キャッシュできるキーか(シード値が1以上か)を返す."""
+        return key[5] > 0
+
+    def get(
+        self, key: CacheKey, grid_size: int | None = None
+    ) -> CachedMaze | None:
+        """迷路を探す. メモリになければディスクから読んでメモリに置く.
+
+        Args:
+            key (CacheKey): 迷路の設定.
+            grid_size (int | None): グリッドのバイト数(w_grid * h_grid).
+                指定すると、ディスクのグリッドの長さが違う時は見つからない扱いにする.
+
+        Returns:
+            CachedMaze | None: 見つかった迷路. なければNone.
+        """
+        if not self.cacheable(key):
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        entry = self._read_disk(key, grid_size)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, entry)
+        return entry
+
+    def put(self, key: CacheKey, entry: CachedMaze) -> None:
+        """迷路を保存する(同じキーがあれば置き換える).
+
+        ディスクにはグリッドか経路が変わった時だけ書き込む
+        (16進数の行はグリッドから作れるのでディスクには保存しない).
+
+        Args:
+            key (CacheKey): 迷路の設定.
+            entry (CachedMaze): 保存する迷路.
+        """
+        if not self.cacheable(key):
+            return
+        with self._lock:
+            old = self._entries.get(key)
+            self._store(key, entry)
+        if self._directory is not None and (
+            old is None or old.grid != entry.grid or old.path != entry.path
+        ):
+            self._write_disk(key, entry)
+
+    def clear(self) -> None:
+        """メモリ上の迷路を捨てる(ディスクのファイルは残す)."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _store(self, key: CacheKey, entry: CachedMaze) -> None:
+        """メモリに置き、上限を超えた分を古い方から捨てる(ロック中に呼ぶ)."""
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= old.nbytes
+        if entry.nbytes > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._size += entry.nbytes
+        while self._size > self.max_bytes:
+            _, dropped = self._entries.popitem(last=False)
+            self._size -= dropped.nbytes
+
+    @staticmethod
+    def _disk_path(directory: str, key: CacheKey) -> str:
+        """キーに対応するディスクのファイルパスを返す."""
+        # ディスクを使う時だけ読み込む
+        import hashlib
+
+        name = hashlib.sha256(repr(key).encode("ascii")).hexdigest()[:32]
+        return os.path.join(directory, name + _DISK_SUFFIX)
+
+    def _write_disk(self, key: CacheKey, entry: CachedMaze) -> None:
+        """ディスクに書き込む.
+
+        一時ファイルに書いてから置き換えるので、同時に読まれても
+        書きかけのファイルは見えない. 書き込めなくてもエラーにしない.
+        """
+        import tempfile
+
+        if self._directory is None:
+            return
+        grid = zlib.compress(entry.grid)
+        path = b"" if entry.path is None else entry.path.encode("ascii")
+        header = _DISK_HEADER.pack(
+            _DISK_MAGIC, len(grid), -1 if entry.path is None else len(path)
+        )
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self._directory)
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header)
+                f.write(grid)
+                f.write(path)
+            os.replace(temp_path, self._disk_path(self._directory, key))
+        except OSError:
+            with suppress(OSError):
+                os.remove(temp_path)
+
+    def _read_disk(
+        self, key: CacheKey, grid_size: int | None = None
+    ) -> CachedMaze | None:
+        """ディスクから読む. なければ、または壊れていればNone.
+
+        grid_sizeを指定した時は、グリッドの長さが違うファイルもNoneにする.
+        """
+        if self._directory is None:
+            return None
+        try:
+            with open(self._disk_path(self._directory, key), "rb") as f:
+                data = f.read()
+            magic, compressed_size, path_size = _DISK_HEADER.unpack_from(
+                data
+            )
+            if magic != _DISK_MAGIC:
+                return None
+            start = _DISK_HEADER.size
+            grid = zlib.decompress(data[start:start + compressed_size])
+            path = None
+            if path_size >= 0:
+                start += compressed_size
+                path = data[start:start + path_size].decode("ascii")
+        except (OSError, struct.error, zlib.error, UnicodeDecodeError):
+            return None
+        # 古い、または別の迷路のファイルをそのままグリッドに写さない
+        if grid_size is not None and len(grid) != grid_size:
+            return None
+        return CachedMaze(grid, path)
@@ -0,0 +1,115 @@
+"""設定ファイル(config.txt)を読み込むモジュール.
+
+a_maze_ing.pyと、描画しないで出力ファイルを書くだけのpython3 -m mazegen
+(mazegen.headless)の両方で使う.
+"""
+from dataclasses import dataclass
+
+from .algorithms import DEFAULT_ALGORITHM, DEFAULT_LOOP_DENSITY
+
+# OUTPUT_FILEがこの拡張子ならバイナリ形式(mazegen.mazefile)で保存する
+BINARY_SUFFIX = ".mzb"
+
+
+@dataclass
+class MazeConfig:
+    """迷路を生成するための設定.
+
+    Attributes:
+        width (int): 迷路の幅.
+        height (int): 迷路の高さ.
+        entry_point (tuple[int, int]): 迷路のスタート座標.
+        exit_point (tuple[int, int]): 迷路のゴール座標.
+        output_file (str): 生成された迷路を保存するファイルパス.
+        perfect (bool): 完全迷路にするかどうかの設定.
+        seed (int): seedを元にランダムに再現性を持たせる.
+        pattern (bool): 42ロゴを表示させるかの設定.
+        algorithm (str): 迷路生成のアルゴリズム("knock", "kruskal", "eller").
+        loop_density (float): 不完全迷路でループを作る確率(knock以外).
+    """
+
+    width: int
+    height: int
+    entry_point: tuple[int, int]
+    exit_point: tuple[int, int]
+    output_file: str
+    perfect: bool
+    seed: int
+    pattern: bool
+    algorithm: str = DEFAULT_ALGORITHM
+    loop_density: float = DEFAULT_LOOP_DENSITY
+
+
+def parse_config(file_path: str) -> MazeConfig:
+    """設定ファイルを解析してMazeconfigオブジェクトを返す.
+
+    Args:
+        file_path (str): 設定ファイルへのパス.
+
+    Returns:
+        MazeConfig: 解析した設定ファイルのオブジェクト.
+
+    Raises:
+        FileNotFoundError: 設定ファイルがない場合.
+        ValueError: 設定ファイルの値が無効な場合.
+        KeyError: 設定ファイルのkeyが無効な場合.
+        except: 上記以外のエラーが発生した場合.
+    """
+    config_data = {}
+    with open(file_path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            key, value = line.split("=", 1)
+            key = key.strip().upper()
+            if key in config_data:
+                raise ValueError(f"Config key: '{key}' duplicated")
+            config_data[key] = value.strip()
+
+    def strtobool(val: str | None) -> bool:
+        if val == "True":
+            return True
+        if val == "False":
+            return False
+        if not val:
+            raise ValueError("missing config key or value")
+        raise ValueError("invalid value 'True or False'")
+
+    entry_row = config_data["ENTRY"].split(",")
+    exit_row = config_data["EXIT"].split(",")
+
+    return MazeConfig(
+        width=int(config_data["WIDTH"]),
+        height=int(config_data["HEIGHT"]),
+        entry_point=(int(entry_row[0]), int(entry_row[1])),
+        exit_point=(int(exit_row[0]), int(exit_row[1])),
+        output_file=config_data["OUTPUT_FILE"],
+        perfect=strtobool(config_data.get("PERFECT")),
+        seed=int(config_data.get("SEED", 0)),
+        pattern=strtobool(config_data.get("PATTERN", "True")),
+        algorithm=config_data.get("ALGORITHM", DEFAULT_ALGORITHM).lower(),
+        loop_density=float(
+            config_data.get("LOOP_DENSITY", DEFAULT_LOOP_DENSITY)
+        )
+    )
+
+
+def config_error(error: Exception) -> str:
+    """parse_config()のエラーを表示するメッセージにする.
+
+    Args:
+        error (Exception): parse_config()が送出したエラー.
+
+    Returns:
+        str: "Error: "から始まるメッセージ.
+    """
+    if isinstance(error, KeyError):
+        return f"Error: missing config key: {error.args[0].upper()}"
+    if isinstance(error, FileNotFoundError):
+        return "Error: No such file or dir"
+    if isinstance(error, IsADirectoryError):
+        return "Error: Is a directory"
+    if isinstance(error, ValueError):
+        return f"Error: {error}"
+    return f"Error:{error}"
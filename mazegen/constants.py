@@ -0,0 +1,105 @@
+"""迷路の各モジュールで共有する定数."""
+from enum import Enum
+
+
+# "ESC[色コードm"の順番で色付け開始、ESC[0m で色付け終了
+# ESC は16進数で0x1b 8進数で033 10進数で27 の文字コード
+# 1:Bold, 2:Dim, 3:Italic, 4:Underline, 5, 6: 点滅, 7:Invert
+# 文字(START, GOAL)はフロント30~か90~, 空白(ROAD, WALL, FOURTY_TWO)はバック40~か100~
+COLOR_SCHEMES = {
+    0: {
+        "r_color": "\33[100m",
+        "w_color": "\33[107m",  # 白
+        "s_color": "\33[1;6;91;102m",  # 赤文字、緑背景
+        "y_color": "\33[103m",  # 黄
+        "g_color": "\33[1;6;91;102m",  # 赤文字、緑背景
+        "ft_color": "\33[105m",  # マゼンダ
+        "reset": "\33[0m"
+    },
+    1: {
+        "r_color": "\33[107m",  # 白
+        "w_color": "\33[100m",  # 黒
+        "s_color": "\33[1;6;91;102m",  # 赤文字、緑背景
+        "y_color": "\33[103m",  # 黄
+        "g_color": "\33[1;6;91;102m",  # 赤文字、緑背景
+        "ft_color": "\33[105m",  # マゼンダ
+        "reset": "\33[0m"
+    },
+    2: {
+        "r_color": "\33[105m",
+        "w_color": "\33[106m",
+        "s_color": "\33[1;6;91;100m",
+        "y_color": "\33[102m",
+        "g_color": "\33[1;6;91;100m",
+        "ft_color": "\33[103m",
+        "reset": "\33[0m"
+    }
+}
+
+
+class Cell(Enum):
+    """迷路のセルの種類を設定.
+
+    配列に格納された数値を管理するためのクラス.
+
+    Attributes:
+        ROAD (int):迷路の通路.
+        WALL (int):迷路の壁.
+        ENTRY (int):迷路のスタート位置.
+        EXIT (int):迷路のゴール位置.
+        FOURTY_TWO (int):42ロゴの位置.
+    """
+
+    ROAD = 0
+    WALL = 1
+    ENTRY = 2
+    EXIT = 3
+    FOURTY_TWO = 4
+    ROUTE = 5
+
+
+# 16進数の出力でのセルの壁のビット
+WALL_N = 0b0001
+WALL_E = 0b0010
+WALL_S = 0b0100
+WALL_W = 0b1000
+
+# 0~15 -> 16進数の文字 に変換するbytes.translate用の表
+HEX_DIGITS = b"0123456789ABCDEF" + bytes(240)
+
+# 42スタンプパターン(横7 * 縦5セル)
+FT_PATTERN = (
+    (1, 0, 0, 0, 1, 1, 1),
+    (1, 0, 0, 0, 0, 0, 1),
+    (1, 1, 1, 0, 1, 1, 1),
+    (0, 0, 1, 0, 1, 0, 0),
+    (0, 0, 1, 0, 1, 1, 1),
+)
+
+# 追加で棒倒しをする箇所の、42スタンプの左上からの相対座標
+FT_TARGET_PILLARS = frozenset({
+    (4, 0), (6, 0), (4, 2), (6, 2),  # 42の4の上の部分
+    (0, 8), (2, 8), (0, 10), (2, 10),  # 42の4の右下の部分
+    (6, 10),  # 42の4の右下
+    (14, 10),  # 42の2の右下
+})
+
+# ロゴの上下左右に+ 1マス分必要な迷路の最小サイズ
+FT_MIN_WIDTH = 9
+FT_MIN_HEIGHT = 7
+
+
+def ft_start(width: int, height: int) -> tuple[int, int] | None:
+    """42スタンプの開始セルを返す.
+
+    Args:
+        width (int): 迷路の幅.
+        height (int): 迷路の高さ.
+
+    Returns:
+        tuple[int, int] | None: 開始セル(切り捨て、左・上寄り).
+            迷路が小さくて埋め込めない時はNone.
+    """
+    if width < FT_MIN_WIDTH or height < FT_MIN_HEIGHT:
+        return None
+    return (width - 7) // 2, (height - 5) // 2
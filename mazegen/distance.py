@@ -0,0 +1,285 @@
+"""1つのセルから全セルへの最短距離の場(距離場)を求めるモジュール.
+
+出発点から幅優先探索を1回だけ行い、各セルの距離と親から来た向きを
+添字をそのまま使う平らな配列に持つ.
+    came: セルに来た向き(MOVESの添字 + 1、0は未到達)のbytearray.
+    dist: 出発点からの距離のarray("i")(-1は未到達).
+
+作った後は、どのセルへの経路も来た向きを逆にたどるだけなので、
+目的地がいくつあっても1つあたり経路の長さに比例する時間で求まる.
+探索はmazegen.solverの"bfs"と同じ W, E, N, S の順に広げるので、
+出口への経路はMazeGenerator.solve_maze()と同じになる.
+完全迷路でなくても使える(ループがあっても最短経路を返す).
+
+距離場は配列のまま(to_array, save_raw)か、
+ターミナル用の色分けした文字列(heatmap_lines)で書き出せる.
+"""
+import sys
+from array import array
+from collections.abc import Iterable
+
+from .constants import COLOR_SCHEMES, WALL_E, WALL_S
+from .export import atomic_open
+from .solver import MOVES, open_moves, to_path
+
+# 出発点の印(どの向きの番号とも重ならない値)
+_ORIGIN = len(MOVES) + 1
+
+# 近い -> 遠い の順の背景色(256色: 青 -> 水色 -> 緑 -> 黄 -> 赤)
+HEATMAP_COLORS = (
+    21, 27, 33, 39, 45, 51, 50, 49, 48, 47, 46,
+    82, 118, 154, 190, 226, 220, 214, 208, 202, 196,
+)
+
+
+class DistanceField:
+    """1つのセルから全セルへの最短距離と経路の索引.
+
+    壁情報はmazegen.solverと同じ1セル1バイト(N=1, E=2, S=4, W=8)で受け取る.
+    出発点と繋がっていないセル(42スタンプなど)への距離は-1、経路は空になる.
+
+    Attributes:
+        _width (int):迷路の幅.
+        _height (int):迷路の高さ.
+        _stride (int):壁情報の1行分のバイト数.
+        _walls (bytes):壁情報(ヒートマップの描画用).
+        _source (int):出発点の添字.
+        _came (bytearray):セルに来た向きの番号(0は未到達).
+        _dist (array):出発点からの距離(-1は未到達).
+        _farthest (int):最も遠いセルの添字(同じ距離なら先に届いた方).
+        _deltas (list[int]):向きの番号 -> 添字の増分.
+    """
+
+    def __init__(
+        self,
+        walls: bytes | bytearray,
+        stride: int,
+        width: int,
+        height: int,
+        source: tuple[int, int],
+    ) -> None:
+        """DistanceFieldを初期化し、出発点から全セルへ探索する.
+
+        Args:
+            walls (bytes | bytearray): 1セル1バイトの壁(N=1, E=2, S=4, W=8).
+            stride (int): 1行分のバイト数(迷路の幅以上).
+            width (int): 迷路の幅.
+            height (int): 迷路の高さ.
+            source (tuple[int, int]): 出発するセル座標.
+
+        Raises:
+            ValueError: sourceが迷路の外の場合.
+        """
+        self._width = width
+        self._height = height
+        self._stride = stride
+        self._walls = bytes(walls)
+        start = self._index(source)
+        opens = open_moves(stride)
+        size = len(walls)
+
+        came = bytearray(size)
+        dist = array("i", [-1]) * size
+        came[start] = _ORIGIN
+        dist[start] = 0
+        frontier = [start]
+        farthest = start
+        step = 0
+        while frontier:
+            farthest = frontier[0]
+            step += 1
+            reached = []
+            for current in frontier:
+                for code, delta in opens[walls[current]]:
+                    nxt = current + delta
+                    if not came[nxt]:
+                        came[nxt] = code
+                        dist[nxt] = step
+                        reached.append(nxt)
+            frontier = reached
+
+        self._source = start
+        self._came = came
+        self._dist = dist
+        self._farthest = farthest
+        self._deltas = [0] + [dy * stride + dx for _, _, dx, dy in MOVES]
+
+    def _index(self, cell: tuple[int, int]) -> int:
+        """セル座標を壁情報の添字にする.
+
+        Raises:
+            ValueError: セルが迷路の外の場合.
+        """
+        x, y = cell
+        if not (0 <= x < self._width and 0 <= y < self._height):
+            raise ValueError(f"Cell {cell} is out of the maze")
+        return y * self._stride + x
+
+    def _cell(self, index: int) -> tuple[int, int]:
+        """添字をセル座標にする."""
+        y, x = divmod(index, self._stride)
+        return x, y
+
+    @property
+    def source(self) -> tuple[int, int]:
+        """出発点のセル座標."""
+        return self._cell(self._source)
+
+    @property
+    def max_distance(self) -> int:
+        """出発点から最も遠いセルまでの距離."""
+        return self._dist[self._farthest]
+
+    def farthest(self) -> tuple[int, int]:
+        """出発点から最も遠いセルの座標を返す."""
+        return self._cell(self._farthest)
+
+    def distance(self, cell: tuple[int, int]) -> int:
+        """出発点からcellまでの距離(進むセル数)をO(1)で返す.
+
+        Args:
+            cell (tuple[int, int]): セル座標.
+
+        Returns:
+            int: 距離. 繋がっていなければ-1.
+        """
+        return self._dist[self._index(cell)]
+
+    def path(self, target: tuple[int, int]) -> str:
+        """出発点からtargetまでの経路を経路の長さに比例する時間で返す.
+
+        Args:
+            target (tuple[int, int]): 目的のセル座標.
+
+        Returns:
+            str: 道筋を'N', 'E', 'S', 'W'で表す. 繋がっていなければ空.
+        """
+        node = self._index(target)
+        if not self._came[node]:
+            return ""
+        came = self._came
+        deltas = self._deltas
+        start = self._source
+        codes = []
+        while node != start:
+            code = came[node]
+            codes.append(code)
+            node -= deltas[code]
+        codes.reverse()
+        return to_path(codes)
+
+    def paths(self, targets: Iterable[tuple[int, int]]) -> list[str]:
+        """複数の目的地への経路をまとめて返す(探索はし直さない).
+
+        Args:
+            targets (Iterable[tuple[int, int]]): 目的のセル座標.
+
+        Returns:
+            list[str]: targetsと同じ順の経路(繋がっていなければ空).
+        """
+        return [self.path(target) for target in targets]
+
+    def nearest(
+        self, targets: Iterable[tuple[int, int]]
+    ) -> tuple[int, int] | None:
+        """目的地のうち出発点から最も近いものを返す.
+
+        Args:
+            targets (Iterable[tuple[int, int]]): 目的のセル座標.
+
+        Returns:
+            tuple[int, int] | None: 最も近いセル座標(同じ距離なら先のもの).
+                どれとも繋がっていなければNone.
+        """
+        best = None
+        best_dist = -1
+        for target in targets:
+            dist = self.distance(target)
+            if dist >= 0 and (best is None or dist < best_dist):
+                best = target
+                best_dist = dist
+        return best
+
+    def to_array(self) -> "array[int]":
+        """距離を行順にすき間なく並べた配列を返す.
+
+        Returns:
+            array[int]: width * height個の距離(-1は未到達).
+        """
+        dist = self._dist
+        if self._stride == self._width:
+            return array("i", dist)
+        result: array[int] = array("i")
+        for start in range(0, self._height * self._stride, self._stride):
+            result.extend(dist[start:start + self._width])
+        return result
+
+    def save_raw(self, file_path: str) -> int:
+        """距離を4バイト符号付き整数(リトルエンディアン)で行順に書き込む.
+
+        ヘッダはないので、読む側は幅と高さを別に知っている必要がある
+        (numpy.fromfile(path, "<i4").reshape(height, width) などで読める).
+
+        Args:
+            file_path (str): 保存するファイルパス.
+
+        Returns:
+            int: 書き込んだバイト数.
+
+        Raises:
+            OSError: 書き込めなかった場合(出力先は変わらない).
+        """
+        values = self.to_array()
+        if sys.byteorder != "little":
+            values.byteswap()
+        data = values.tobytes()
+        with atomic_open(file_path) as f:
+            f.write(data)
+        return len(data)
+
+    def heatmap_lines(self, color_id: int = 0) -> list[str]:
+        """距離で色分けした迷路を、ターミナル用の文字列の行で返す.
+
+        2倍の座標のグリッドと同じ配置で、セルと壁のない所は距離に応じた
+        HEATMAP_COLORSの色(近いほど青、遠いほど赤)、壁と未到達のセルは
+        COLOR_SCHEMESの壁の色で1マス(全角)ずつ描く.
+
+        Args:
+            color_id (int): 壁の色を選ぶカラープリセットの値.
+
+        Returns:
+            list[str]: 上の行から順の描画文字列((2 * 高さ + 1)行).
+        """
+        colors = COLOR_SCHEMES.get(color_id, COLOR_SCHEMES[0])
+        wall = f"{colors['w_color']}  "
+        reset = colors["reset"]
+        levels = len(HEATMAP_COLORS) - 1
+        top = max(self.max_distance, 1)
+        shades = [f"\33[48;5;{color}m  " for color in HEATMAP_COLORS]
+        walls = self._walls
+        dist = self._dist
+
+        def shade(value: int) -> str:
+            return wall if value < 0 else shades[value * levels // top]
+
+        border = wall * (self._width * 2 + 1) + reset
+        lines = [border]
+        for row in range(0, self._height * self._stride, self._stride):
+            cells = [wall]
+            below = [wall]
+            for index in range(row, row + self._width):
+                value = dist[index]
+                cells.append(shade(value))
+                # 東と南は壁がなければ近い方のセルの距離で塗る
+                if walls[index] & WALL_E or value < 0:
+                    cells.append(wall)
+                else:
+                    cells.append(shade(min(value, dist[index + 1])))
+                if walls[index] & WALL_S or value < 0:
+                    below.append(wall)
+                else:
+                    below.append(shade(min(value, dist[index + self._stride])))
+                below.append(wall)
+            lines.append("".join(cells) + reset)
+            lines.append("".join(below) + reset)
+        return lines
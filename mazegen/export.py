@@ -0,0 +1,178 @@
+"""迷路を出力ファイル(maze.txt)の形式で書き出すモジュール.
+
+行は書き込む直前に1行ずつ16進数にし、一定の大きさ(buffer_size)まで
+貯めてからまとめて書き込む. 迷路全体の16進数の文字列は作らないので、
+メモリは書き込み用のバッファ1つ分で済む.
+
+出力先の拡張子で圧縮を選ぶ(標準ライブラリにあるものだけ).
+    .gz: gzip, .xz: xz(lzma), .lzma: lzma(旧形式), それ以外: 圧縮しない.
+
+書き込みは同じディレクトリの一時ファイルに行い、最後まで書けた時だけ
+出力先に置き換える. 途中で失敗しても書きかけのファイルは残らず、
+前のファイルがあればそのまま残る.
+"""
+import os
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass
+from io import BufferedIOBase
+from typing import BinaryIO, cast
+
+# 書き込む塊の大きさ(バイト)
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+# 拡張子 -> 圧縮の種類
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".xz": "xz", ".lzma": "lzma"}
+
+
+@dataclass
+class ExportResult:
+    """書き出した結果.
+
+    Attributes:
+        bytes_written (int): ファイルに書き込んだバイト数(圧縮後).
+        raw_bytes (int): 圧縮前の出力ファイルの形式のバイト数.
+        rows (int): 書き込んだ迷路の行数.
+    """
+
+    bytes_written: int
+    raw_bytes: int
+    rows: int
+
+
+def compression_for(file_path: str) -> str | None:
+    """出力先の拡張子から圧縮の種類を返す. 圧縮しなければNone."""
+    lower = file_path.lower()
+    for suffix, kind in COMPRESSION_SUFFIXES.items():
+        if lower.endswith(suffix):
+            return kind
+    return None
+
+
+@contextmanager
+def atomic_open(file_path: str) -> Iterator[BinaryIO]:
+    """一時ファイルを開き、withを抜けた時にfile_pathに置き換える.
+
+    例外でwithを抜けた時は一時ファイルを消し、file_pathには触らない.
+    一時ファイルは同じディレクトリに作るので置き換えは一度に行われる.
+
+    Args:
+        file_path (str): 書き込むファイルパス.
+
+    Yields:
+        BinaryIO: 一時ファイル.
+
+    Raises:
+        OSError: 一時ファイルを作れない、または置き換えられない場合.
+    """
+    directory, name = os.path.split(os.path.abspath(file_path))
+    # secretsはhashlibを読み込んで起動が遅くなるので、os.urandomで名前を作る
+    temp_path = os.path.join(
+        directory, f".{name}.{os.urandom(4).hex()}.tmp"
+    )
+    # 通常のopen()と同じくumaskに従った権限で作る
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+        os.replace(temp_path, file_path)
+    except BaseException:
+        with suppress(OSError):
+            os.remove(temp_path)
+        raise
+
+
+def _compressor(
+    raw: BinaryIO, kind: str | None
+) -> BufferedIOBase | BinaryIO:
+    """圧縮の種類に応じてrawに書き込むファイルを返す."""
+    # 圧縮のモジュールは圧縮する時だけ読み込む
+    if kind == "gzip":
+        import gzip
+
+        return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6)
+    if kind is None:
+        return raw
+    import lzma
+
+    if kind == "xz":
+        return lzma.LZMAFile(raw, "wb", format=lzma.FORMAT_XZ)
+    return lzma.LZMAFile(raw, "wb", format=lzma.FORMAT_ALONE)
+
+
+def write_maze_text(
+    file_path: str,
+    hex_rows: Iterable[bytes],
+    entry_point: tuple[int, int],
+    exit_point: tuple[int, int],
+    path_str: str = "",
+    buffer_size: int = DEFAULT_BUFFER_SIZE
+) -> ExportResult:
+    """迷路を出力ファイルの形式で書き込む.
+
+    Args:
+        file_path (str): 保存するファイルパス(拡張子で圧縮を選ぶ).
+        hex_rows (Iterable[bytes]): 上の行から順に、16進数(ASCII)の行
+            (改行なし). 生成しながら渡せば迷路全体を保持せずに済む.
+        entry_point (tuple[int, int]): 入口の座標.
+        exit_point (tuple[int, int]): 出口の座標.
+        path_str (str): 最短経路.
+        buffer_size (int): まとめて書き込むバイト数.
+
+    Returns:
+        ExportResult: 書き込んだバイト数と行数.
+
+    Raises:
+        OSError: 書き込めなかった場合(出力先は変わらない).
+        ValueError: buffer_sizeが1未満の場合.
+    """
+    if buffer_size < 1:
+        raise ValueError("buffer_size must be 1 or more")
+    kind = compression_for(file_path)
+    raw_bytes = 0
+    rows = 0
+    with atomic_open(file_path) as raw:
+        out = _compressor(raw, kind)
+        buffer = bytearray()
+        for row in hex_rows:
+            buffer += row
+            buffer += b"\n"
+            rows += 1
+            if len(buffer) >= buffer_size:
+                raw_bytes += out.write(buffer)
+                buffer.clear()
+        buffer += (
+            f"\n{entry_point[0]},{entry_point[1]}\n"
+            f"{exit_point[0]},{exit_point[1]}\n{path_str}"
+        ).encode("ascii")
+        raw_bytes += out.write(buffer)
+        if out is not raw:
+            out.close()
+        bytes_written = raw.tell()
+    return ExportResult(bytes_written, raw_bytes, rows)
+
+
+def open_maze_file(file_path: str) -> BinaryIO:
+    """書き出したファイルを拡張子に応じて展開しながら読むように開く.
+
+    圧縮したファイルも全体を展開せずに、1行ずつ(readline)読める.
+
+    Raises:
+        OSError: 開けなかった場合.
+    """
+    kind = compression_for(file_path)
+    if kind == "gzip":
+        import gzip
+
+        return cast(BinaryIO, gzip.open(file_path, "rb"))
+    if kind is not None:
+        import lzma
+
+        return cast(BinaryIO, lzma.open(file_path, "rb"))
+    return open(file_path, "rb")
+
+
+def read_maze_bytes(file_path: str) -> bytes:
+    """書き出したファイルを拡張子に応じて展開して読む."""
+    with open_maze_file(file_path) as f:
+        return f.read()
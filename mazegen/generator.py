@@ -1,63 +1,116 @@
 """迷路生成するモジュール."""
 import random
-from collections import deque
-from enum import Enum
-from time import sleep
-
-# "ESC[色コードm"の順番で色付け開始、ESC[0m で色付け終了
-# ESC は16進数で0x1b 8進数で033 10進数で27 の文字コード
-# 1:Bold, 2:Dim, 3:Italic, 4:Underline, 5, 6: 点滅, 7:Invert
-# 文字(START, GOAL)はフロント30~か90~, 空白(ROAD, WALL, FOURTY_TWO)はバック40~か100~
-COLOR_SCHEMES = {
-    0: {
-        "r_color": "\33[100m",
-        "w_color": "\33[107m",  # 白
-        "s_color": "\33[1;6;91;102m",  # 赤文字、緑背景
-        "y_color": "\33[103m",  # 黄
-        "g_color": "\33[1;6;91;102m",  # 赤文字、緑背景
-        "ft_color": "\33[105m",  # マゼンダ
-        "reset": "\33[0m"
-    },
-    1: {
-        "r_color": "\33[107m",  # 白
-        "w_color": "\33[100m",  # 黒
-        "s_color": "\33[1;6;91;102m",  # 赤文字、緑背景
-        "y_color": "\33[103m",  # 黄
-        "g_color": "\33[1;6;91;102m",  # 赤文字、緑背景
-        "ft_color": "\33[105m",  # マゼンダ
-        "reset": "\33[0m"
-    },
-    2: {
-        "r_color": "\33[105m",
-        "w_color": "\33[106m",
-        "s_color": "\33[1;6;91;100m",
-        "y_color": "\33[102m",
-        "g_color": "\33[1;6;91;100m",
-        "ft_color": "\33[103m",
-        "reset": "\33[0m"
-    }
-}
-
-
-class Cell(Enum):
-    """迷路のセルの種類を設定.
-
-    配列に格納された数値を管理するためのクラス.
+import threading
+from collections.abc import Iterable, Iterator
+from dataclasses import replace
+from time import perf_counter, sleep
+from typing import TYPE_CHECKING
 
-    Attributes:
-        ROAD (int):迷路の通路.
-        WALL (int):迷路の壁.
-        ENTRY (int):迷路のスタート位置.
-        EXIT (int):迷路のゴール位置.
-        FOURTY_TWO (int):42ロゴの位置.
+from .algorithms import (
+    DEFAULT_ALGORITHM,
+    DEFAULT_LOOP_DENSITY,
+    iter_algorithm_rows,
+    validate_algorithm,
+)
+from .cache import CachedMaze, CacheKey, MazeCache
+# COLOR_SCHEMESは以前このモジュールで定義していたので、ここからも読み込める
+from .constants import COLOR_SCHEMES as COLOR_SCHEMES  # noqa: F401
+from .constants import (
+    FT_PATTERN,
+    FT_TARGET_PILLARS,
+    HEX_DIGITS,
+    WALL_N,
+    WALL_W,
+    Cell,
+    ft_start,
+)
+from .export import DEFAULT_BUFFER_SIZE, ExportResult, write_maze_text
+from .knock import KNOCK_ENGINES, knock_pillars
+from .mazefile import MazeFile, MazeHeader, write_maze_file
+from .rows import pack_row
+from .solver import solve_walls
+from .stats import MazeStats
+
+# 描画と解析のモジュールは使う時に読み込む(描画しない時の起動を速くする)
+if TYPE_CHECKING:
+    from .analytics import MazeAnalytics
+    from .distance import DistanceField
+    from .recorder import GenerationRecorder
+    from .render import DiffRenderer, FramePacer
+    from .tree import MazeTree
+
+# セルの値 -> 壁なら1、それ以外は0 に変換するbytes.translate用の表
+_WALL_BITS = bytes(
+    1 if value in (Cell.WALL.value, Cell.FOURTY_TWO.value) else 0
+    for value in range(256)
+)
+# セルの値(N=1, E=2, S=4, W=8) -> 北/西の壁があればWALL、なければROAD
+_NORTH_CELLS = bytes(
+    Cell.WALL.value if value & WALL_N else Cell.ROAD.value
+    for value in range(256)
+)
+_WEST_CELLS = bytes(
+    Cell.WALL.value if value & WALL_W else Cell.ROAD.value
+    for value in range(256)
+)
+_PILLAR = bytes([Cell.WALL.value])
+
+
+class GenerationCancelled(Exception):
+    """generate()やfollow_path()が途中で止められたことを表す例外."""
+
+
+def validate_points(
+    width: int,
+    height: int,
+    entry_point: tuple[int, int],
+    exit_point: tuple[int, int]
+) -> None:
+    """ENTRY_POINT, EXIT_POINTの有効値チェック.
+
+    Args:
+        width (int):迷路の幅.
+        height (int):迷路の高さ.
+        entry_point (tuple[int, int]):迷路のスタート座標.
+        exit_point (tuple[int, int]):迷路のゴール座標.
+
+    Raises:
+        ValueError: 座標が重なっている、または迷路の範囲外の場合.
     """
+    # ex, ey: ENTRYの座標
+    ex, ey = entry_point
+    # gx, gy: EXIT(ゴール)の座標(範囲外アクセスの可能性)
+    gx, gy = exit_point
+    # ENTRY_POINT, EXIT_POINTの有効値チェック
+    if ex == gx and ey == gy:
+        raise ValueError(
+            "ENTRY_POINT and EXIT_POINT are at the same coordinates"
+        )
+    if ex < 0 or ey < 0:
+        raise ValueError("ENTRY_POINT is not minus value")
+    if gx < 0 or gy < 0:
+        raise ValueError("EXIT_POINT is not minus value")
+    # 1次元配列では範囲外の座標が隣の行に回り込むため明示的に弾く
+    if ex >= width or ey >= height:
+        raise ValueError("ENTRY_POINT is out of the maze")
+    if gx >= width or gy >= height:
+        raise ValueError("EXIT_POINT is out of the maze")
+
+
+def new_rng(seed: int) -> random.Random:
+    """迷路1つ分の乱数生成器を作る.
 
-    ROAD = 0
-    WALL = 1
-    ENTRY = 2
-    EXIT = 3
-    FOURTY_TWO = 4
-    ROUTE = 5
+    モジュール全体のrandomを使わないので、複数の迷路をスレッドで同時に
+    生成しても互いの乱数の並びが混ざらない.
+
+    Args:
+        seed (int): シード値. 0以下なら前回の状態を引き継がず、
+            毎回新しい(再現しない)乱数にする.
+
+    Returns:
+        random.Random: 乱数生成器.
+    """
+    return random.Random(seed if seed > 0 else None)
 
 
 class MazeGenerator:
@@ -69,8 +122,20 @@ class MazeGenerator:
         _entry_point (tuple[int, int]):迷路のスタート座標.
         _exit_point (tuple[int, int]):迷路のゴール座標.
         _seed (int | None):迷路をランダムに生成するための値.
-        _grid (list[list[int]]):迷路のグリッド.
+        _grid (bytearray):迷路のグリッド.
+            横(_w_grid) * 縦(_h_grid)を1次元に並べたバイト列で、
+            (x, y)の値は _grid[y * _w_grid + x] に格納される.
         _perfect (bool):完全迷路か不完全迷路を切り替えるための値.
+        _engine (str):棒倒しのエンジン("auto", "scalar", "batch").
+        _algorithm (str):迷路生成のアルゴリズム(mazegen.algorithms).
+        _loop_density (float):不完全迷路でループを作る確率
+            (棒倒し法以外のアルゴリズムで使う).
+        _rng (random.Random):迷路ごとの乱数生成器.
+        _stats (MazeStats | None):処理ごとの時間とカウンタの記録先.
+        _cache (MazeCache | None):生成した迷路のキャッシュ.
+        _cached (CachedMaze | None):今の迷路のキャッシュの内容.
+        _from_cache (bool):直前のgenerate()がキャッシュから読んだかどうか.
+        _cancel (threading.Event | None):実行中の処理を止める合図.
     """
 
     def __init__(
@@ -82,6 +147,11 @@ class MazeGenerator:
         perfect: bool,
         seed: int,
         pattern: bool,
+        engine: str = "auto",
+        stats: MazeStats | None = None,
+        cache: MazeCache | None = None,
+        algorithm: str = DEFAULT_ALGORITHM,
+        loop_density: float = DEFAULT_LOOP_DENSITY,
     ) -> None:
         """MazeGeneratorを初期化する.
 
@@ -93,7 +163,26 @@ class MazeGenerator:
             perfect (bool):完全迷路か不完全迷路を切り替えるための値.
             seed (int):迷路をランダムに生成するための値.
             pattern (bool): 42ロゴの生成を切り替えるための値.
+            engine (str): 棒倒しのエンジン.
+                "scalar"は柱を1本ずつ処理する従来の実装.
+                "batch"は行ごとに乱数をまとめて引く一括抽選エンジン
+                (不完全迷路の乱数の対応はmazegen.knockを参照).
+                "auto"は結果が同一になる場合だけ"batch"を使う.
+            stats (MazeStats | None): 渡すと処理ごとの時間とカウンタを記録する.
+                Noneなら記録しない.
+            cache (MazeCache | None): 渡すと同じ設定・シード値の迷路を
+                生成し直さずにキャッシュから読み込む(シード値が0なら使わない).
+            algorithm (str): 迷路生成のアルゴリズム("knock", "kruskal",
+                "eller"). "knock"は従来の棒倒し法で、engineはこの時だけ使う.
+            loop_density (float): 不完全迷路で、既に繋がっているセル同士の壁を
+                開ける確率(0~1. "knock"以外で使う).
+
+        Raises:
+            ValueError: engine, algorithm, loop_densityが不明・無効な値の場合.
         """
+        if engine not in KNOCK_ENGINES:
+            raise ValueError(f"Unknown knock engine: '{engine}'")
+        validate_algorithm(algorithm, loop_density)
         self._width = width
         self._height = height
         self._entry_point = entry_point
@@ -101,6 +190,16 @@ class MazeGenerator:
         self._perfect = perfect
         self._seed = seed
         self._pattern = pattern
+        self._engine = engine
+        self._algorithm = algorithm
+        self._loop_density = loop_density
+        self._stats = stats
+        self._cache = cache
+        self._cached: CachedMaze | None = None
+        self._from_cache = False
+        self._cancel: threading.Event | None = None
+        # 生成の過程の記録先(generate()の間だけ設定する)
+        self._recorder: "GenerationRecorder | None" = None
 
         # 横と縦の配列の長さ
         self._w_grid = width * 2 + 1
@@ -114,72 +213,239 @@ class MazeGenerator:
         self._ft_min_y = -1
         self._ft_max_y = -1
 
-        # 横の配列 * 縦の配列のリスト(一旦ROADで埋める)
-        self._grid: list[list[int]] = [
-            [Cell.ROAD.value] * self._w_grid
-            for _ in range(self._h_grid)
-        ]
+        # ターミナル描画用(print_maze()かアニメーションで作る)
+        self._renderer: "DiffRenderer | None" = None
+        # 表示範囲の大きさ(セル数)、Noneなら迷路全体を描画する
+        self._viewport: tuple[int, int] | None = None
+
+        # 乱数生成器(generate()のたびにシード値から作り直す)
+        self._rng = new_rng(seed)
+
+        # 迷路のバイト列はgenerate()で確保する
+        # (iter_hex_rows()だけ使う時に巨大な配列を作らないため)
+        self._grid = bytearray()
 
     def generate(
         self,
         sleep_anime: bool = False,
-        print_flag: bool = False
+        print_flag: bool = False,
+        fps: float = 30.0,
+        step_time: float = 0.05,
+        cancel: threading.Event | None = None,
+        recorder: "GenerationRecorder | None" = None
     ) -> None:
         """迷路を生成する.
 
         Args:
-            sleep_anime (bool):アニメーション実行フラグ.
+            sleep_anime (bool):アニメーション実行フラグ(キャッシュにある迷路は
+                アニメーションせずに表示する).
             print_flag (bool):ターミナル描画フラグ.
+            fps (float):アニメーションの1秒あたりの最大描画回数.
+            step_time (float):アニメーションで棒を1本倒す時間(秒).
+            cancel (threading.Event | None): 別のスレッドからsetすると、
+                アニメーションの待ち時間か柱の1行ごとに生成を止める.
+            recorder (GenerationRecorder | None): 渡すと生成の過程を記録する
+                (mazegen.recorderを参照). 記録する時はキャッシュを使わない.
+                迷路はアニメーションした時と同じになる.
+
+        Raises:
+            GenerationCancelled: cancelで止められた場合.
         """
-        # 横の配列 * 縦の配列のリスト(一旦ROADで埋める)
-        self._grid: list[list[int]] = [
-            [Cell.ROAD.value] * self._w_grid
-            for _ in range(self._h_grid)
-        ]
-        # シード値(再現性の確保)
-        if self._seed > 0:
-            random.seed(self._seed)
+        self._cancel = cancel
+        self._recorder = recorder
+        try:
+            self._generate(sleep_anime, print_flag, fps, step_time)
+        finally:
+            self._cancel = None
+            self._recorder = None
+
+    def _generate(
+        self,
+        sleep_anime: bool,
+        print_flag: bool,
+        fps: float,
+        step_time: float
+    ) -> None:
+        """generate()の本体."""
+        # 横の配列 * 縦の配列のバイト列(一旦ROADで埋める)
+        self._grid = bytearray(self._w_grid * self._h_grid)
+        # シード値(再現性の確保)、迷路ごとに別の乱数生成器を使う
+        self._rng = new_rng(self._seed)
         # ターミナル描画モード時、50×50以上はエラーにする
-        if print_flag and (self._width > 49 or self._height > 49):
+        # (表示範囲を設定していれば、その範囲だけ描画するので制限しない)
+        if print_flag and self._viewport is None and (
+            self._width > 49 or self._height > 49
+        ):
             raise ValueError("The maze is too large. It cannnot be drawn.")
-        # ex, ey: ENTRYの座標
+        validate_points(
+            self._width, self._height, self._entry_point, self._exit_point
+        )
+        stats = self._stats
+        recorder = self._recorder
+        if recorder is not None:
+            recorder.start(self._w_grid, self._h_grid)
+        # キャッシュにあれば生成し直さない(記録する時は生成する).
+        # アニメーションする設定でも、キャッシュにあれば完成した迷路を表示する
+        cache = self._cache
+        key = self._cache_key()
+        self._cached = None
+        self._from_cache = False
+        if cache is not None and key is not None and recorder is None:
+            start = perf_counter() if stats is not None else 0.0
+            cached = cache.get(key, self._w_grid * self._h_grid)
+            if cached is not None:
+                self._grid = bytearray(cached.grid)
+                self._cached = cached
+                self._from_cache = True
+                if stats is not None:
+                    stats.record("cache", perf_counter() - start, hits=1)
+                if print_flag:
+                    self.print_maze()
+                return None
         ex, ey = self._entry_point
-        # gx, gy: EXIT(ゴール)の座標(範囲外アクセスの可能性)
         gx, gy = self._exit_point
-        # ENTRY_POINT, EXIT_POINTの有効値チェック
-        if ex == gx and ey == gy:
-            raise ValueError(
-                "ENTRY_POINT and EXIT_POINT are at the same coordinates"
-            )
-        if ex < 0 or ey < 0:
-            raise ValueError("ENTRY_POINT is not minus value")
-        if gx < 0 or gy < 0:
-            raise ValueError("EXIT_POINT is not minus value")
 
         # ENTRY, EXIT埋め込み
-        self._grid[ey * 2 + 1][ex * 2 + 1] = Cell.ENTRY.value
-        self._grid[gy * 2 + 1][gx * 2 + 1] = Cell.EXIT.value
+        w_grid = self._w_grid
+        self._grid[(ey * 2 + 1) * w_grid + ex * 2 + 1] = Cell.ENTRY.value
+        self._grid[(gy * 2 + 1) * w_grid + gx * 2 + 1] = Cell.EXIT.value
 
         # 周りのWALL埋め込み
+        # 計測する時だけ各処理の前後で時間を取る
+        start = perf_counter() if stats is not None else 0.0
         self._build_outer_walls(
             sleep_anime=sleep_anime,
             print_flag=print_flag
         )
+        if stats is not None:
+            stats.record("_build_outer_walls", perf_counter() - start)
+        if recorder is not None:
+            recorder.capture(self._grid)
+            recorder.step()
         # ロゴの上下左右に+ 1マス分あれば中心に42スタンプを埋め込み
         if self._width >= 9 and self._height >= 7 and self._pattern:
+            start = perf_counter() if stats is not None else 0.0
             self._build_fourty_two(
                 sleep_anime=sleep_anime,
                 print_flag=print_flag
             )
-        # 柱の埋め込み→棒倒し！
-        self._pillars_and_knock(
-            sleep_anime=sleep_anime,
-            print_flag=print_flag
-        )
+            if stats is not None:
+                stats.record("_build_fourty_two", perf_counter() - start)
+            if recorder is not None:
+                recorder.capture(self._grid)
+                recorder.step()
+        if self._algorithm != "knock":
+            # 棒倒し法以外はアルゴリズムが返す壁の行を埋める
+            start = perf_counter() if stats is not None else 0.0
+            self._carve_rows(sleep_anime, print_flag, fps, step_time)
+            if stats is not None:
+                stats.record(
+                    "_carve_rows", perf_counter() - start, rows=self._height
+                )
+        else:
+            # 柱の埋め込み→棒倒し！
+            self._knock(sleep_anime, print_flag, fps, step_time)
+        if cache is not None and key is not None:
+            self._cached = CachedMaze(bytes(self._grid))
+            cache.put(key, self._cached)
         if print_flag:
             self.print_maze()
         return None
 
+    def _knock(
+        self,
+        sleep_anime: bool,
+        print_flag: bool,
+        fps: float,
+        step_time: float
+    ) -> None:
+        """棒倒し法で迷路を作り、時間とカウンタを記録する."""
+        stats = self._stats
+        start = perf_counter() if stats is not None else 0.0
+        knocks = self._pillars_and_knock(
+            sleep_anime=sleep_anime,
+            print_flag=print_flag,
+            fps=fps,
+            step_time=step_time
+        )
+        if stats is not None:
+            pillars = self._pillar_count()
+            stats.record(
+                "_pillars_and_knock", perf_counter() - start,
+                pillars_visited=pillars, knocks=knocks,
+                skipped=pillars - knocks
+            )
+
+    def _carve_rows(
+        self,
+        sleep_anime: bool,
+        print_flag: bool,
+        fps: float,
+        step_time: float
+    ) -> None:
+        """棒倒し法以外のアルゴリズムの壁の行を、上の行から順にグリッドに埋める.
+
+        外壁と42スタンプは先に埋めてあり、行の壁はそれと同じ値になる.
+        アニメーション時は1行埋めるたびに1ステップ進める.
+        """
+        animate = print_flag and sleep_anime
+        renderer = self._get_renderer() if animate else None
+        pacer = self._get_pacer(fps, step_time) if animate else None
+        recorder = self._recorder
+        rows = iter_algorithm_rows(
+            self._algorithm, self._width, self._height, self._perfect,
+            self._pattern, self._rng, self._engine, self._loop_density
+        )
+        w_grid = self._w_grid
+        for y, row in enumerate(rows):
+            self._check_cancel()
+            self._fill_wall_row(y, row)
+            if recorder is not None:
+                # 埋めた行は2倍の座標の2行分
+                recorder.capture(
+                    self._grid, y * 2 * w_grid, (y * 2 + 2) * w_grid
+                )
+                recorder.step()
+            if renderer is not None and pacer is not None and pacer.step():
+                renderer.draw_diff(self._grid)
+        if renderer is not None:
+            renderer.draw_diff(self._grid)
+
+    def _fill_wall_row(self, y: int, row: bytes) -> None:
+        """y行目のセルの北と西の壁と、その上の柱を埋める.
+
+        東と南の壁は隣のセルか外壁なので、全ての行を埋めると迷路全体になる.
+        """
+        grid = self._grid
+        w_grid = self._w_grid
+        top = (y * 2) * w_grid
+        mid = top + w_grid
+        grid[top + 1:mid:2] = row.translate(_NORTH_CELLS)
+        grid[mid:mid + w_grid - 1:2] = row.translate(_WEST_CELLS)
+        if y > 0:
+            grid[top + 2:mid - 2:2] = _PILLAR * (self._width - 1)
+
+    def _cache_key(self) -> CacheKey | None:
+        """キャッシュのキーを返す. キャッシュできない迷路ならNone.
+
+        シード値が0の迷路は毎回変わり、棒倒し法の"batch"エンジンの
+        不完全迷路は他のエンジンと結果が異なるのでキャッシュしない.
+        """
+        if self._seed <= 0 or (
+            self._algorithm == "knock" and self._engine == "batch"
+            and not self._perfect
+        ):
+            return None
+        # ループの確率は棒倒し法以外の不完全迷路だけ結果に影響する
+        loop_density = 0.0
+        if self._algorithm != "knock" and not self._perfect:
+            loop_density = self._loop_density
+        return (
+            self._width, self._height, self._entry_point, self._exit_point,
+            self._perfect, self._seed, self._pattern, self._algorithm,
+            loop_density
+        )
+
     def _build_outer_walls(
         self,
         sleep_anime: bool = False,
@@ -188,17 +454,18 @@ class MazeGenerator:
         """迷路の外壁を生成する.
 
         Args:
-            sleep_anime (bool):アニメーション実行フラグ.
+            sleep_anime (bool):アニメーション実行フラグ(キャッシュにある迷路は
+                アニメーションせずに表示する).
             print_flag (bool):ターミナル描画フラグ.
         """
-        # 縦配列(y) * 横配列(x) 分ループ、上下左右の辺にWALL埋め込み
-        for y in range(0, self._h_grid):
-            for x in range(0, self._w_grid):
-                if (
-                    y == 0 or y == self._h_grid - 1
-                    or x == 0 or x == self._w_grid - 1
-                ):
-                    self._grid[y][x] = Cell.WALL.value
+        # 上下の辺は行ごと、左右の辺は1行おきのスライスでWALL埋め込み
+        w_grid = self._w_grid
+        h_grid = self._h_grid
+        wall = Cell.WALL.value
+        self._grid[0:w_grid] = bytes([wall]) * w_grid
+        self._grid[(h_grid - 1) * w_grid:] = bytes([wall]) * w_grid
+        self._grid[0::w_grid] = bytes([wall]) * h_grid
+        self._grid[w_grid - 1::w_grid] = bytes([wall]) * h_grid
 
         if print_flag and sleep_anime:
             self.print_maze(1.0)
@@ -212,18 +479,10 @@ class MazeGenerator:
         """迷路の中に42ロゴを生成する.
 
         Args:
-            sleep_anime (bool):アニメーション実行フラグ.
+            sleep_anime (bool):アニメーション実行フラグ(キャッシュにある迷路は
+                アニメーションせずに表示する).
             print_flag (bool):ターミナル描画フラグ.
         """
-        # 42スタンプパターン
-        ft_pattern = [
-            [1, 0, 0, 0, 1, 1, 1],
-            [1, 0, 0, 0, 0, 0, 1],
-            [1, 1, 1, 0, 1, 1, 1],
-            [0, 0, 1, 0, 1, 0, 0],
-            [0, 0, 1, 0, 1, 1, 1],
-        ]
-
         # 42スタンプ開始セル(切り捨て、左・上寄り)
         start_x = (self._width - 7) // 2
         start_y = (self._height - 5) // 2
@@ -245,17 +504,19 @@ class MazeGenerator:
         # 7 * 5 マスの内必要な場所だけスタンプ
         for row in range(5):
             for col in range(7):
-                if ft_pattern[row][col] == 0:
+                if FT_PATTERN[row][col] == 0:
                     continue
                 sx = (start_x + col) * 2 + 1
                 sy = (start_y + row) * 2 + 1
 
                 # 42スタンプ埋め
-                self._grid[sy][sx] = Cell.FOURTY_TWO.value
+                self._grid[sy * self._w_grid + sx] = Cell.FOURTY_TWO.value
 
                 # 42スタンプのセル周囲7マスを壁埋め
                 for dy, dx in surrounding_offsets:
-                    self._grid[sy + dy][sx + dx] = Cell.WALL.value
+                    self._grid[
+                        (sy + dy) * self._w_grid + sx + dx
+                    ] = Cell.WALL.value
 
         # アニメーション処理
         if print_flag and sleep_anime:
@@ -265,23 +526,68 @@ class MazeGenerator:
     def _pillars_and_knock(
         self,
         sleep_anime: bool = False,
-        print_flag: bool = False
-    ) -> None:
+        print_flag: bool = False,
+        fps: float = 30.0,
+        step_time: float = 0.05
+    ) -> int:
         """棒倒し方のアルゴリズム.
 
+        アニメーション時は棒を倒すたびに1ステップ進め、
+        fpsに収まるタイミングでだけ変わったセルを描画する.
+
         Args:
-            sleep_anime (bool):アニメーション実行フラグ.
+            sleep_anime (bool):アニメーション実行フラグ(キャッシュにある迷路は
+                アニメーションせずに表示する).
             print_flag (bool):ターミナル描画フラグ.
+            fps (float):アニメーションの1秒あたりの最大描画回数.
+            step_time (float):アニメーションで棒を1本倒す時間(秒).
+
+        Returns:
+            int: 倒した棒の数.
         """
-        # 追加で棒倒しをする箇所の、42スタンプの左上からの相対座標
-        target_pillars = [
-            (4, 0), (6, 0), (4, 2), (6, 2),  # 42の4の上の部分
-            (0, 8), (2, 8), (0, 10), (2, 10),  # 42の4の右下の部分
-            (6, 10),  # 42の4の右下
-            (14, 10),  # 42の2の右下
-        ]
+        # 一括抽選エンジンが使える時はそちらで処理する
+        # (autoは結果が逐次版と同一になる完全迷路かつ
+        # 非アニメーション・非記録時のみ)
+        animate = print_flag and sleep_anime
+        recorder = self._recorder
+        if self._engine == "batch" or (
+            self._engine == "auto" and self._perfect and not animate
+            and recorder is None
+        ):
+            ft_box = None
+            if self._has_ft:
+                ft_box = (
+                    self._ft_min_x, self._ft_max_x,
+                    self._ft_min_y, self._ft_max_y
+                )
+            knocks = knock_pillars(
+                self._grid, self._width, self._height,
+                self._perfect, ft_box, self._rng
+            )
+            if recorder is not None:
+                # 一括で倒した棒は柱の行ごとに1ステップとして記録する
+                w_grid = self._w_grid
+                for y in range(2, self._h_grid - 1, 2):
+                    recorder.capture(
+                        self._grid, (y - 1) * w_grid, (y + 2) * w_grid
+                    )
+                    recorder.step()
+            return knocks
 
+        renderer = None
+        pacer = None
+        if animate:
+            renderer = self._get_renderer()
+            pacer = self._get_pacer(fps, step_time)
+
+        grid = self._grid
+        w_grid = self._w_grid
+        rng = self._rng
+        # 不完全迷路で倒さなかった柱の数
+        skipped = 0
         for y in range(2, self._h_grid - 1, 2):
+            self._check_cancel()
+            row = y * w_grid
             for x in range(2, self._w_grid - 1, 2):
                 # 42スタンプ周りの処理
                 if self._has_ft:
@@ -292,18 +598,23 @@ class MazeGenerator:
                     ):
                         rel_x = x - self._ft_min_x
                         rel_y = y - self._ft_min_y
-                        if (rel_x, rel_y) not in target_pillars:
+                        if (rel_x, rel_y) not in FT_TARGET_PILLARS:
                             continue
 
                 # 基本処理
                 # 柱の埋め込み
-                self._grid[y][x] = Cell.WALL.value
+                grid[row + x] = Cell.WALL.value
+                if recorder is not None:
+                    recorder.set(row + x, Cell.WALL.value)
 
                 # perfectじゃないかつ柱の左と上に棒が倒れている時
                 # 4割の確率で棒を倒さない
-                if (not self._perfect and random.random() > 0.6
-                   and (self._grid[y - 1][x] is Cell.WALL.value
-                   or self._grid[y][x - 1] is Cell.WALL.value)):
+                if (not self._perfect and rng.random() > 0.6
+                   and (grid[row - w_grid + x] == Cell.WALL.value
+                   or grid[row + x - 1] == Cell.WALL.value)):
+                    skipped += 1
+                    if recorder is not None:
+                        recorder.step()
                     continue
 
                 # 基本は右と下に倒す(SとE)
@@ -316,11 +627,25 @@ class MazeGenerator:
                     directions.append((0, -1))
 
                 # 棒倒し!
-                dx, dy = random.choice(directions)
-                self._grid[y + dy][x + dx] = Cell.WALL.value
-                if print_flag and sleep_anime:
-                    self.print_maze(0.05)
-        return None
+                dx, dy = rng.choice(directions)
+                grid[row + dy * w_grid + x + dx] = Cell.WALL.value
+                if recorder is not None:
+                    recorder.set(row + dy * w_grid + x + dx, Cell.WALL.value)
+                    recorder.step()
+                if renderer is not None and pacer is not None and pacer.step():
+                    renderer.draw_diff(grid)
+        # 間引かれた最後のステップも反映する
+        if renderer is not None:
+            renderer.draw_diff(grid)
+        return self._pillar_count() - skipped
+
+    def _pillar_count(self) -> int:
+        """棒を倒そうとする柱の数(42スタンプの中は追加で倒す柱だけ)."""
+        count = (self._width - 1) * (self._height - 1)
+        if self._has_ft:
+            # スタンプの範囲は横8本 * 縦6本の柱
+            count -= 8 * 6 - len(FT_TARGET_PILLARS)
+        return count
 
     print_init = False
 
@@ -332,129 +657,616 @@ class MazeGenerator:
         """コンソールに迷路を出力する.
 
         Args:
-            sleep_time (flat): プロセスの実行を遅らせるための値.
+            sleep_time (float): プロセスの実行を遅らせるための値.
             show_path (bool): ゴールまでの経路表示の切り替えをする値.
             color_id (int): 迷路のカラープリセットを選ぶ値.
-            maze_grid (list[list[int]]): 出力するための迷路.
         """
-        colors = COLOR_SCHEMES.get(color_id, COLOR_SCHEMES[0])
-        r_color = colors["r_color"]
-        w_color = colors["w_color"]
-        s_color = colors["s_color"]
-        y_color = colors["y_color"]
-        g_color = colors["g_color"]
-        ft_color = colors["ft_color"]
-        reset = colors["reset"]
+        renderer = self._get_renderer()
+        renderer.set_style(color_id, show_path)
 
         if not self.print_init:
             print("\x1b[2J\x1b[H\x1b[s", end="")
             self.print_init = True
-        output = "\x1b[H\x1b[0J"
-        for row in self._grid:
-            for cell in row:
-                if (
-                    cell is Cell.ROAD.value or
-                    (cell is Cell.ROUTE.value and not show_path)
-                ):
-                    output += f"{r_color}  {reset}"
-                elif cell is Cell.WALL.value:
-                    output += f"{w_color}  {reset}"
-                elif cell is Cell.ENTRY.value:
-                    output += f"{s_color}S {reset}"
-                elif cell is Cell.EXIT.value:
-                    output += f"{g_color}G {reset}"
-                elif cell is Cell.FOURTY_TWO.value:
-                    output += f"{ft_color}  {reset}"
-                elif cell is Cell.ROUTE.value:
-                    output += f"{y_color}  {reset}"
-            output += "\n"
-
-        print(output)
-        sleep(sleep_time)
+        renderer.draw_full(self._grid)
+        self._pause(sleep_time)
+
+        return None
+
+    def _check_cancel(self) -> None:
+        """止める合図があればGenerationCancelledを投げる."""
+        if self._cancel is not None and self._cancel.is_set():
+            raise GenerationCancelled("The maze generation was cancelled")
+
+    def _pause(self, seconds: float) -> None:
+        """アニメーションで待つ. 止める合図があればすぐに抜けて例外を投げる.
+
+        Raises:
+            GenerationCancelled: 待っている間に止める合図があった場合.
+        """
+        if self._cancel is None:
+            sleep(seconds)
+        elif self._cancel.wait(seconds):
+            raise GenerationCancelled("The maze animation was cancelled")
+
+    def _get_pacer(self, fps: float, step_time: float) -> "FramePacer":
+        """アニメーションの描画の間引きと待ち時間を管理するクラスを返す."""
+        from .render import FramePacer
+
+        return FramePacer(fps, step_time, self._pause)
+
+    def _get_renderer(self) -> "DiffRenderer":
+        """描画クラスを返す. 初回は表示範囲を反映して作る."""
+        if self._renderer is None:
+            from .render import DiffRenderer
+
+            self._renderer = DiffRenderer(self._w_grid, self._h_grid)
+            if self._viewport is not None:
+                cols, rows = self._viewport
+                self._renderer.set_view(0, 0, cols * 2 + 1, rows * 2 + 1)
+        return self._renderer
+
+    def set_viewport(self, size: tuple[int, int] | None) -> None:
+        """ターミナルに描画する範囲の大きさを設定する.
+
+        表示範囲を設定すると、print_maze()やアニメーションは迷路のうち
+        その範囲だけを描画するので、49 * 49より大きい迷路も描画できる.
+
+        Args:
+            size (tuple[int, int] | None): 表示範囲の横と縦のセル数.
+                Noneなら迷路全体を描画する.
+
+        Raises:
+            ValueError: セル数が1未満の場合.
+        """
+        if size is not None and (size[0] < 1 or size[1] < 1):
+            raise ValueError("Viewport size must be 1 or more")
+        self._viewport = size
+        # 次の描画で作り直す
+        self._renderer = None
+
+    def is_from_cache(self) -> bool:
+        """直前のgenerate()が生成せずにキャッシュから読んだならTrue."""
+        return self._from_cache
+
+    def get_viewport(self) -> tuple[int, int, int, int]:
+        """表示範囲を返す.
+
+        Returns:
+            tuple[int, int, int, int]: 表示範囲の左上のセル座標(x, y)と
+                横と縦のセル数. 迷路全体を描画する時は迷路全体の範囲.
+        """
+        x0, y0, cols, rows = self._get_renderer().view
+        # 配列の座標 -> セル座標(端の壁の分を除く)
+        return x0 // 2, y0 // 2, max(1, cols // 2), max(1, rows // 2)
+
+    def pan_viewport(self, dx: int, dy: int) -> None:
+        """表示範囲をセル単位でずらす. 迷路の外にははみ出さない.
+
+        Args:
+            dx (int): 横にずらすセル数(右が正).
+            dy (int): 縦にずらすセル数(下が正).
+        """
+        self._get_renderer().pan(dx * 2, dy * 2)
+
+    def follow_path(
+        self,
+        path_str: str,
+        step_time: float = 0.05,
+        color_id: int = 0,
+        cancel: threading.Event | None = None
+    ) -> None:
+        """経路に沿って表示範囲を動かしながら迷路を描画する.
+
+        1セル進むごとに現在地が表示範囲の中心に来るようにずらす.
+        表示範囲が動かない時は変わったセルだけを描き直す.
+
+        Args:
+            path_str (str): solve_maze()が返した経路.
+            step_time (float): 1セル進む時間(秒).
+            color_id (int): 迷路のカラープリセットを選ぶ値.
+            cancel (threading.Event | None): 別のスレッドからsetすると、
+                次の1セルを待つところで止める.
+
+        Raises:
+            GenerationCancelled: cancelで止められた場合.
+        """
+        self._cancel = cancel
+        try:
+            self._follow_path(path_str, step_time, color_id)
+        finally:
+            self._cancel = None
 
+    def _follow_path(
+        self, path_str: str, step_time: float, color_id: int
+    ) -> None:
+        """follow_path()の本体."""
+        renderer = self._get_renderer()
+        renderer.set_style(color_id, True)
+        moves = {"N": (0, -2), "E": (2, 0), "S": (0, 2), "W": (-2, 0)}
+        x = self._entry_point[0] * 2 + 1
+        y = self._entry_point[1] * 2 + 1
+        renderer.center(x, y)
+        renderer.draw_full(self._grid)
+        for direction in path_str:
+            dx, dy = moves[direction]
+            x += dx
+            y += dy
+            renderer.center(x, y)
+            renderer.draw_diff(self._grid)
+            self._pause(step_time)
         return None
 
-    def solve_maze(self) -> str:
-        """幅優先探索でゴールまでの最短経路を求める.
+    def solve_maze(self, method: str = "bfs") -> str:
+        """ゴールまでの最短経路を求め、経路のマスをROUTEにする.
+
+        2倍の座標のグリッドではなくセル単位の壁情報で探索する
+        (探索の方式はmazegen.solverを参照).
+
+        Args:
+            method (str): 探索の方式("bfs", "bidirectional", "astar").
+                "bfs"は最短経路が複数ある時も従来と同じ経路を返す.
 
         Returns:
             str: ゴールまでの道筋を'N', 'E', 'S', 'W'で表す.
+
+        Raises:
+            ValueError: methodが不明な値の場合.
         """
-        start = (self._entry_point[0] * 2 + 1, self._entry_point[1] * 2 + 1)
-        end = (self._exit_point[0] * 2 + 1, self._exit_point[1] * 2 + 1)
-#        route = {start: None}
-        route: dict[tuple[int, int], tuple[int, int]] = {}
-        q = deque([start])
-        while q:
-            current = q.popleft()
-
-            if current == end:
-                path_coords = [end]
-                curr = end
-                while curr != start:
-                    curr = route[curr]
-                    path_coords.append(curr)
-
-                path_coords.reverse()
-
-                path_str = ""
-
-                for i in range(0, len(path_coords) - 1, 2):
-                    cx, cy = path_coords[i]
-                    nx, ny = path_coords[i + 2]
-
-                    if nx > cx:
-                        path_str += "E"
-                    elif nx < cx:
-                        path_str += "W"
-                    elif ny > cy:
-                        path_str += "S"
-                    elif ny < cy:
-                        path_str += "N"
-
-                x, y = route[end]
-                while (x, y) != start:
-                    self._grid[y][x] = Cell.ROUTE.value
-                    x, y = route[(x, y)]
-                return path_str
-
-            cx, cy = current
-            for nx, ny in (
-                (cx - 1, cy),
-                (cx + 1, cy),
-                (cx, cy - 1),
-                (cx, cy + 1)
-            ):
-                if (self._grid[ny][nx] in {Cell.ROAD.value, Cell.EXIT.value}
-                   and (nx, ny) not in route):
-                    q.append((nx, ny))
-                    route[(nx, ny)] = current
-        return ""
+        stats = self._stats
+        start = perf_counter() if stats is not None else 0.0
+        counters: dict[str, int] | None = {} if stats is not None else None
+        # キャッシュには"bfs"の経路だけを保存する
+        cached = self._cached if method == "bfs" else None
+        if cached is not None and cached.path is not None:
+            path_str = cached.path
+            if counters is not None:
+                counters["nodes_expanded"] = 0
+        else:
+            path_str = solve_walls(
+                self._cell_walls(), self._width,
+                self._entry_point, self._exit_point, method, counters
+            )
+            if cached is not None:
+                self._update_cache(replace(cached, path=path_str))
+
+        # 入口と出口の間のマス(通った壁の隙間を含む)をROUTEにする
+        grid = self._grid
+        w_grid = self._w_grid
+        step_to_delta = {"E": 1, "W": -1, "S": w_grid, "N": -w_grid}
+        current = (self._entry_point[1] * 2 + 1) * w_grid \
+            + self._entry_point[0] * 2 + 1
+        for direction in path_str[:-1]:
+            delta = step_to_delta[direction]
+            grid[current + delta] = Cell.ROUTE.value
+            current += delta * 2
+            grid[current] = Cell.ROUTE.value
+        if path_str:
+            grid[current + step_to_delta[path_str[-1]]] = Cell.ROUTE.value
+        if stats is not None and counters is not None:
+            stats.record(
+                "solve_maze", perf_counter() - start,
+                path_length=len(path_str), **counters
+            )
+        return path_str
 
     def get_grid(self) -> list[list[int]]:
-        """迷路の配列を返す."""
-        # 迷路の配列を返す
-        return self._grid
+        """迷路の配列を返す.
+
+        内部のバイト列から行ごとのリストを作り直した互換用のコピーで、
+        書き換えても迷路には反映されない.
+        """
+        w_grid = self._w_grid
+        # generate()前は全てROAD
+        grid = self._grid or bytes(w_grid * self._h_grid)
+        return [
+            list(grid[y * w_grid:(y + 1) * w_grid])
+            for y in range(self._h_grid)
+        ]
+
+    def get_buffer(self) -> memoryview:
+        """迷路のバイト列をコピーせずに返す.
+
+        縦(_h_grid) * 横(_w_grid)の2次元memoryviewで、view[y, x]で参照できる.
+        NumPyがあれば numpy.asarray(view) でuint8配列として共有できる.
+        generate()を呼ぶと新しいバイト列になるので、その後に取り直す.
+        """
+        if not self._grid:
+            self._grid = bytearray(self._w_grid * self._h_grid)
+        return memoryview(self._grid).cast(
+            "B", (self._h_grid, self._w_grid)
+        )
+
+    def build_tree(self, root: tuple[int, int] | None = None) -> "MazeTree":
+        """完全迷路の木の索引を作る.
+
+        索引を使うと任意の2セル間の距離をO(1)、経路を経路の長さに比例する
+        時間で求められる(mazegen.treeを参照).
+
+        Args:
+            root (tuple[int, int] | None): 木の根にするセル座標.
+                Noneなら入口.
+
+        Returns:
+            MazeTree: 迷路の木の索引.
+
+        Raises:
+            ValueError: 迷路にループがある(完全迷路でない)場合.
+        """
+        from .tree import MazeTree
+
+        return MazeTree(
+            self._cell_walls(), self._width, self._width, self._height,
+            self._entry_point if root is None else root
+        )
+
+    def distance_field(
+        self, source: tuple[int, int] | None = None
+    ) -> "DistanceField":
+        """1つのセルから全セルへの距離場を作る.
+
+        探索は1回だけで、その後は複数の目的地への経路をそれぞれ
+        経路の長さに比例する時間で求められる(mazegen.distanceを参照).
+        solve_maze()と違ってグリッドにROUTEを書き込まない.
+
+        Args:
+            source (tuple[int, int] | None): 出発するセル座標.
+                Noneなら入口.
+
+        Returns:
+            DistanceField: 距離場.
+
+        Raises:
+            ValueError: sourceが迷路の外の場合.
+        """
+        from .distance import DistanceField
+
+        return DistanceField(
+            self._cell_walls(), self._width, self._width, self._height,
+            self._entry_point if source is None else source
+        )
+
+    def analyze(self, method: str = "auto") -> "MazeAnalytics":
+        """迷路の難しさの指標を求める(mazegen.analyticsを参照).
+
+        行き止まり、分岐、通路の長さ、ループの数をセル数に比例する時間で数え、
+        最短経路の歩数も入れる(solve_maze()の結果があればそれを使う).
+
+        Args:
+            method (str): 数え方("auto", "scalar", "vectorized").
+
+        Returns:
+            MazeAnalytics: 迷路の指標.
+
+        Raises:
+            ValueError: methodが不明な値の場合.
+        """
+        from .analytics import analyze_walls
+
+        stats = self._stats
+        start = perf_counter() if stats is not None else 0.0
+        walls = self._cell_walls()
+        cached = self._cached
+        if cached is not None and cached.path is not None:
+            path_str = cached.path
+        else:
+            path_str = solve_walls(
+                walls, self._width, self._entry_point, self._exit_point
+            )
+        result = analyze_walls(
+            walls, self._width, self._height, len(path_str), method
+        )
+        if stats is not None:
+            stats.record(
+                "analyze", perf_counter() - start,
+                dead_ends=result.dead_ends, junctions=result.junctions,
+                loops=result.loops
+            )
+        return result
+
+    def _row_walls(self, y: int) -> bytes:
+        """y行目のセルの壁(N=1, E=2, S=4, W=8)を1セル1バイトで返す."""
+        grid = self._grid
+        w_grid = self._w_grid
+
+        # 1行分の壁(0/1)のバイト列を巨大な整数として扱い、
+        # N | E << 1 | S << 2 | W << 3 を行単位でまとめて計算する
+        # (各バイトは高々15なので桁あふれしない)
+        top = (y * 2) * w_grid
+        mid = top + w_grid
+        bottom = mid + w_grid
+        north = grid[top + 1:mid:2].translate(_WALL_BITS)
+        east = grid[mid + 2:bottom:2].translate(_WALL_BITS)
+        south = grid[bottom + 1:bottom + w_grid:2].translate(_WALL_BITS)
+        west = grid[mid:bottom - 1:2].translate(_WALL_BITS)
+        cell_values = (
+            int.from_bytes(north, "big")
+            | int.from_bytes(east, "big") << 1
+            | int.from_bytes(south, "big") << 2
+            | int.from_bytes(west, "big") << 3
+        )
+        return cell_values.to_bytes(self._width, "big")
+
+    def _cell_walls(self) -> bytes:
+        """全セルの壁を1セル1バイトで行順に並べて返す."""
+        return b"".join([self._row_walls(y) for y in range(self._height)])
 
     def get_hex_grid(self) -> list[str]:
         """迷路を16進数に変換する."""
-        hex_grid = []
-
-        for y in range(self._height):
-            str_line = ""
-            for x in range(self._width):
-                grid_x = x * 2 + 1
-                grid_y = y * 2 + 1
-                cell_value = 0
-                for val, cell in (
-                    (0b0001, self._grid[grid_y - 1][grid_x]),
-                    (0b0010, self._grid[grid_y][grid_x + 1]),
-                    (0b0100, self._grid[grid_y + 1][grid_x]),
-                    (0b1000, self._grid[grid_y][grid_x - 1])
-                ):
-                    if cell in {Cell.WALL.value, Cell.FOURTY_TWO.value}:
-                        cell_value |= val
-
-                str_line += f"{cell_value:X}"
-            hex_grid.append(str_line)
+        stats = self._stats
+        start = perf_counter() if stats is not None else 0.0
+        cached = self._cached
+        if cached is not None and cached.hex_grid is not None:
+            hex_grid = list(cached.hex_grid)
+        else:
+            hex_grid = [
+                self._row_walls(y).translate(HEX_DIGITS).decode("ascii")
+                for y in range(self._height)
+            ]
+            if cached is not None:
+                self._update_cache(replace(cached, hex_grid=list(hex_grid)))
+        if stats is not None:
+            stats.record(
+                "get_hex_grid", perf_counter() - start, rows=len(hex_grid)
+            )
         return hex_grid
+
+    def _iter_cell_rows(self) -> Iterator[bytes]:
+        """迷路を1行ずつ生成し、確定した行から1セル1バイトの壁を返す.
+
+        Raises:
+            ValueError: ENTRY_POINT, EXIT_POINTが無効な場合.
+        """
+        validate_points(
+            self._width, self._height, self._entry_point, self._exit_point
+        )
+        # シード値(再現性の確保)
+        return iter_algorithm_rows(
+            self._algorithm, self._width, self._height, self._perfect,
+            self._pattern, new_rng(self._seed), self._engine,
+            self._loop_density
+        )
+
+    def _update_cache(self, cached: CachedMaze) -> None:
+        """今の迷路のキャッシュの内容を置き換える."""
+        key = self._cache_key()
+        self._cached = cached
+        if self._cache is not None and key is not None:
+            self._cache.put(key, cached)
+
+    def iter_hex_rows(self) -> Iterator[str]:
+        """迷路を1行ずつ生成し、確定した行から16進数にして返す.
+
+        迷路のグリッドを確保せず、直前の1行分だけを保持して生成するので、
+        メモリは迷路の幅にのみ比例する. 同じ設定・シード値なら
+        generate()してget_hex_grid()した結果と同じ行が返る.
+        ENTRY_POINT, EXIT_POINTのチェックは呼び出した時点で行う.
+
+        Returns:
+            Iterator[str]: 上の行から順に16進数の行を返すイテレータ.
+
+        Raises:
+            ValueError: ENTRY_POINT, EXIT_POINTが無効な場合.
+        """
+        rows = self._iter_cell_rows()
+        return (row.translate(HEX_DIGITS).decode("ascii") for row in rows)
+
+    def save_binary(
+        self, file_path: str, path_str: str = "", stream: bool = False
+    ) -> int:
+        """迷路をバイナリ形式(mazegen.mazefile)で保存する.
+
+        Args:
+            file_path (str): 保存するファイルパス.
+            path_str (str): 一緒に保存する経路. 空なら経路なし.
+            stream (bool): Trueならgenerate()した迷路ではなく、
+                iter_hex_rows()と同じく1行ずつ生成しながら書き込む
+                (メモリは迷路の幅にのみ比例する).
+
+        Returns:
+            int: 書き込んだバイト数.
+
+        Raises:
+            ValueError: ENTRY_POINT, EXIT_POINTが無効な場合、
+                または経路に不正な文字がある場合.
+        """
+        if stream:
+            cell_rows = self._iter_cell_rows()
+        else:
+            cell_rows = (self._row_walls(y) for y in range(self._height))
+        header = MazeHeader(
+            self._width, self._height, self._entry_point, self._exit_point,
+            self._seed, self._perfect, self._pattern
+        )
+        return write_maze_file(
+            file_path, header, (pack_row(row) for row in cell_rows), path_str
+        )
+
+    def export_text(
+        self,
+        file_path: str,
+        path_str: str = "",
+        stream: bool = False,
+        buffer_size: int = DEFAULT_BUFFER_SIZE
+    ) -> ExportResult:
+        """迷路を出力ファイルの形式で書き出す(mazegen.exportを参照).
+
+        行は書き込む直前に16進数にするので、get_hex_grid()のように
+        全ての行の文字列を作らない. 拡張子が.gz, .xz, .lzmaなら圧縮し、
+        書き終わってから出力先に置き換える.
+
+        Args:
+            file_path (str): 保存するファイルパス.
+            path_str (str): 一緒に保存する最短経路.
+            stream (bool): Trueならgenerate()した迷路ではなく、
+                iter_hex_rows()と同じく1行ずつ生成しながら書き込む.
+            buffer_size (int): まとめて書き込むバイト数.
+
+        Returns:
+            ExportResult: 書き込んだバイト数と行数.
+
+        Raises:
+            OSError: 書き込めなかった場合(出力先は変わらない).
+            ValueError: ENTRY_POINT, EXIT_POINTが無効な場合.
+        """
+        stats = self._stats
+        start = perf_counter() if stats is not None else 0.0
+        if stream:
+            cell_rows = self._iter_cell_rows()
+        else:
+            cell_rows = (self._row_walls(y) for y in range(self._height))
+        result = write_maze_text(
+            file_path,
+            (row.translate(HEX_DIGITS) for row in cell_rows),
+            self._entry_point, self._exit_point, path_str, buffer_size
+        )
+        if stats is not None:
+            stats.record(
+                "export_text", perf_counter() - start, rows=result.rows,
+                bytes_written=result.bytes_written
+            )
+        return result
+
+    def export_image(
+        self,
+        file_path: str,
+        show_path: bool = False,
+        color_id: int = 0,
+        scale: int = 4,
+        level: int = 6
+    ) -> int:
+        """迷路をprint_maze()と同じ配色の画像で書き出す(mazegen.imageを参照).
+
+        拡張子が.pngならPNG、.ppmならPPMにする. 画像は1行ずつ作って
+        書き込むので、49 * 49の制限はなく、グリッドの他に使うメモリは
+        画像の1行分だけになる.
+
+        Args:
+            file_path (str): 保存するファイルパス(.png, .ppm).
+            show_path (bool): solve_maze()で求めた経路を重ねて描くか.
+            color_id (int): 迷路のカラープリセットを選ぶ値.
+            scale (int): グリッドの1マス(セル、壁、柱)の縦横のピクセル数.
+            level (int): PNGの圧縮レベル(0~9. 大きな迷路は1にすると速い).
+
+        Returns:
+            int: 書き込んだバイト数.
+
+        Raises:
+            ValueError: 拡張子が画像でない、scaleが範囲外の場合.
+            OSError: 書き込めなかった場合(出力先は変わらない).
+        """
+        from .image import write_image
+
+        stats = self._stats
+        start = perf_counter() if stats is not None else 0.0
+        grid = self._grid
+        w_grid = self._w_grid
+        rows = (
+            grid[top:top + w_grid]
+            for top in range(0, self._h_grid * w_grid, w_grid)
+        )
+        written = write_image(
+            file_path, rows, w_grid, self._h_grid, color_id, show_path,
+            scale, level
+        )
+        if stats is not None:
+            stats.record(
+                "export_image", perf_counter() - start, rows=self._h_grid,
+                bytes_written=written
+            )
+        return written
+
+    @classmethod
+    def load_binary(cls, file_path: str) -> "MazeGenerator":
+        """バイナリ形式の迷路を読み込み、生成済みのMazeGeneratorにする.
+
+        描画や探索ができるように2倍の座標のグリッドを作るので、
+        メモリは迷路全体の分が必要になる. 一部の行やセルだけを読むなら
+        mazegen.mazefile.MazeFileを直接使う.
+
+        Args:
+            file_path (str): 読み込むファイルパス.
+
+        Returns:
+            MazeGenerator: 読み込んだ迷路.
+
+        Raises:
+            ValueError: 迷路のファイルでない、または座標が無効な場合.
+        """
+        with MazeFile(file_path) as maze_file:
+            header = maze_file.header
+            return cls.from_wall_rows(
+                header.width, header.height,
+                header.entry_point, header.exit_point,
+                maze_file.iter_rows(),
+                perfect=header.perfect, seed=header.seed,
+                pattern=header.pattern
+            )
+
+    @classmethod
+    def from_wall_rows(
+        cls,
+        width: int,
+        height: int,
+        entry_point: tuple[int, int],
+        exit_point: tuple[int, int],
+        rows: Iterable[bytes],
+        perfect: bool = True,
+        seed: int = 0,
+        pattern: bool = True,
+    ) -> "MazeGenerator":
+        """セルの壁の行から、generate()した後と同じグリッドを組み立てる.
+
+        柱と42スタンプは生成時と同じ規則で置くので、壁の行が
+        同じ設定で生成した迷路のものならgenerate()したグリッドと一致する.
+
+        Args:
+            width (int):迷路の幅.
+            height (int):迷路の高さ.
+            entry_point (tuple[int, int]):迷路のスタート座標.
+            exit_point (tuple[int, int]):迷路のゴール座標.
+            rows (Iterable[bytes]): 上の行から順に、1セル1バイトの壁の行.
+            perfect (bool):完全迷路か不完全迷路を切り替えるための値.
+            seed (int):迷路をランダムに生成するための値.
+            pattern (bool): 42ロゴの生成を切り替えるための値.
+
+        Returns:
+            MazeGenerator: 組み立てた迷路.
+
+        Raises:
+            ValueError: 座標が無効な場合、または行の長さや数が合わない場合.
+        """
+        maze = cls(width, height, entry_point, exit_point, perfect, seed,
+                   pattern)
+        validate_points(width, height, entry_point, exit_point)
+        w_grid = maze._w_grid
+        grid = bytearray(w_grid * maze._h_grid)
+        maze._grid = grid
+        ex, ey = entry_point
+        gx, gy = exit_point
+        grid[(ey * 2 + 1) * w_grid + ex * 2 + 1] = Cell.ENTRY.value
+        grid[(gy * 2 + 1) * w_grid + gx * 2 + 1] = Cell.EXIT.value
+
+        # セルの北と西の壁と柱を行ごとに埋める
+        count = 0
+        for y, row in enumerate(rows):
+            if y >= height or len(row) != width:
+                raise ValueError("The wall rows do not match the maze size")
+            maze._fill_wall_row(y, row)
+            count += 1
+        if count != height:
+            raise ValueError("The wall rows do not match the maze size")
+
+        start = ft_start(width, height) if pattern else None
+        if start is not None:
+            # 42スタンプの範囲は棒倒しをする柱だけ置く
+            # (スタンプの周りの柱は_build_fourty_two()が壁にする)
+            min_x = start[0] * 2
+            min_y = start[1] * 2
+            for y in range(min_y, min_y + 11, 2):
+                for x in range(min_x, min_x + 15, 2):
+                    if (x - min_x, y - min_y) not in FT_TARGET_PILLARS:
+                        grid[y * w_grid + x] = Cell.ROAD.value
+        maze._build_outer_walls()
+        if start is not None:
+            maze._build_fourty_two()
+        return maze
@@ -0,0 +1,200 @@
+"""描画せずに迷路を生成して出力ファイルに書き込むモジュール.
+
+設定ファイルを読み、迷路を生成して最短経路を求め、OUTPUT_FILEに書き込んだら
+終了する. 描画もアニメーションの待ち時間もなく、描画の大きさの制限
+(49×49まで)もない. 描画のモジュール(mazegen.render)も
+メニューの非同期処理(asyncio)も読み込まないので、起動が速い.
+
+    python3 -m mazegen config.txt
+    python3 -m mazegen --stats config.txt
+    python3 -m mazegen --record maze.cast --speed 4 config.txt
+    python3 -m mazegen --image maze.png --scale 2 config.txt
+
+--recordを付けると生成の過程を記録し(mazegen.recorder)、asciicastで書き出す.
+--imageを付けると最短経路を重ねた画像(.png, .ppm. mazegen.image)も書き出す.
+"""
+import sys
+from argparse import ArgumentParser, Namespace
+from collections.abc import Sequence
+from typing import TYPE_CHECKING
+
+from .config import BINARY_SUFFIX, MazeConfig, config_error, parse_config
+from .generator import MazeGenerator
+from .stats import MazeStats
+
+# 記録は描画のモジュールを使うので、--recordの時だけ読み込む
+if TYPE_CHECKING:
+    from .recorder import GenerationRecorder
+
+
+def solve_config(
+    config: MazeConfig,
+    stats: MazeStats | None = None,
+    recorder: "GenerationRecorder | None" = None
+) -> tuple[MazeGenerator, str]:
+    """描画せずに迷路を生成して最短経路を求める.
+
+    Args:
+        config (MazeConfig): 迷路の設定.
+        stats (MazeStats | None): 処理ごとの時間とカウンタを記録する先.
+        recorder (GenerationRecorder | None): 生成の過程を記録する先.
+
+    Returns:
+        tuple[MazeGenerator, str]: 生成した迷路と最短経路.
+
+    Raises:
+        ValueError: 設定が無効な場合.
+    """
+    generator = MazeGenerator(
+        width=config.width,
+        height=config.height,
+        entry_point=config.entry_point,
+        exit_point=config.exit_point,
+        perfect=config.perfect,
+        seed=config.seed,
+        pattern=config.pattern,
+        algorithm=config.algorithm,
+        loop_density=config.loop_density,
+        stats=stats
+    )
+    generator.generate(recorder=recorder)
+    return generator, generator.solve_maze()
+
+
+def write_maze(
+    config: MazeConfig,
+    stats: MazeStats | None = None,
+    recorder: "GenerationRecorder | None" = None
+) -> int:
+    """迷路を生成して最短経路を求め、出力ファイルに書き込む.
+
+    出力はa_maze_ing.pyで生成して保存したものと同じになる
+    (OUTPUT_FILEの拡張子が.mzbならバイナリ形式、.gz, .xz, .lzmaなら圧縮する).
+
+    Args:
+        config (MazeConfig): 迷路の設定.
+        stats (MazeStats | None): 処理ごとの時間とカウンタを記録する先.
+        recorder (GenerationRecorder | None): 生成の過程を記録する先.
+
+    Returns:
+        int: 書き込んだバイト数.
+
+    Raises:
+        OSError: 書き込めなかった場合.
+        ValueError: 設定が無効な場合.
+    """
+    generator, path_str = solve_config(config, stats, recorder)
+    return save_maze(generator, config, path_str)
+
+
+def save_maze(
+    generator: MazeGenerator, config: MazeConfig, path_str: str
+) -> int:
+    """生成した迷路をOUTPUT_FILEに書き込む(拡張子で形式を決める).
+
+    Returns:
+        int: 書き込んだバイト数.
+
+    Raises:
+        OSError: 書き込めなかった場合.
+    """
+    if config.output_file.endswith(BINARY_SUFFIX):
+        return generator.save_binary(config.output_file, path_str)
+    return generator.export_text(config.output_file, path_str).bytes_written
+
+
+def parse_args(argv: Sequence[str] | None = None) -> Namespace:
+    """コマンドライン引数を解析する.
+
+    Args:
+        argv (Sequence[str] | None): 引数. Noneならsys.argv[1:].
+
+    Returns:
+        Namespace: 解析したコマンドライン引数.
+    """
+    parser = ArgumentParser(
+        prog="python3 -m mazegen",
+        usage="python3 -m mazegen [--stats] [--record FILE [--speed N]] "
+        "[--image FILE [--scale N] [--no-path]] <config_file>.txt"
+    )
+    parser.add_argument("config_file", help="迷路の設定ファイル")
+    parser.add_argument(
+        "--stats", action="store_true",
+        help="処理ごとの時間とカウンタを表示する"
+    )
+    parser.add_argument(
+        "--record", metavar="FILE", default=None,
+        help="生成の過程をasciicast(v2)形式でFILEに書き込む"
+    )
+    parser.add_argument(
+        "--speed", type=float, default=1.0,
+        help="--recordの再生の速さ(1.0で棒1本0.05秒)"
+    )
+    parser.add_argument(
+        "--image", metavar="FILE", default=None,
+        help="迷路をFILEに画像で書き込む(拡張子が.pngならPNG、.ppmならPPM)"
+    )
+    parser.add_argument(
+        "--scale", type=int, default=4,
+        help="--imageのグリッド1マスの縦横のピクセル数"
+    )
+    parser.add_argument(
+        "--no-path", action="store_true",
+        help="--imageに最短経路を描かない"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    """設定ファイルの迷路を生成して書き込み、バイト数を表示する.
+
+    エラーは標準エラー出力に表示し、終了コード1で終了する.
+
+    Args:
+        argv (Sequence[str] | None): 引数. Noneならsys.argv[1:].
+    """
+    args = parse_args(argv)
+    if args.speed <= 0:
+        print("Error: --speed must be a positive value", file=sys.stderr)
+        sys.exit(1)
+    if args.image:
+        from .image import image_format
+
+        # 生成してから書き出せないと分からないので、拡張子は先に確かめる
+        try:
+            image_format(args.image)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+    try:
+        config = parse_config(args.config_file)
+    except Exception as e:
+        print(config_error(e), file=sys.stderr)
+        sys.exit(1)
+
+    stats = MazeStats() if args.stats else None
+    recorder = None
+    if args.record:
+        from .recorder import GenerationRecorder
+
+        recorder = GenerationRecorder()
+    try:
+        generator, path_str = solve_config(config, stats, recorder)
+        written = save_maze(generator, config, path_str)
+        print(f"Wrote {written} bytes to '{config.output_file}'")
+        if args.image:
+            image_bytes = generator.export_image(
+                args.image, show_path=not args.no_path, scale=args.scale
+            )
+            print(f"Wrote {image_bytes} bytes to '{args.image}'")
+        if recorder is not None:
+            cast_bytes = recorder.to_asciicast(args.record, args.speed)
+            print(
+                f"Wrote {recorder.steps} steps ({cast_bytes} bytes) "
+                f"to '{args.record}'"
+            )
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if stats is not None:
+        print(f"\n=== Stats ===\n{stats.report()}")
@@ -0,0 +1,212 @@
+"""迷路のグリッドを画像(PNG, PPM)に書き出すモジュール.
+
+ターミナルの描画(mazegen.render)と同じCOLOR_SCHEMESの配色で、
+2倍の座標のグリッドの1マスをscale×scaleピクセルの正方形にして描く.
+画像は上の行から1行(スキャンライン)ずつ作って書き込むので、
+画像全体を持たず、メモリは1行分(と圧縮の作業領域)だけで済む.
+
+    .png: パレット形式(1ピクセル4ビット)のPNG. IDATはzlibで
+        少しずつ圧縮し、一定の大きさごとに書き出す. 縦に繰り返す行は
+        上の行との差(フィルタUp)にするので、すべて0になり速く圧縮できる.
+    .ppm: バイナリのPPM(P6, 1ピクセル3バイトのRGB). 圧縮しない.
+
+外部ライブラリは使わない(zlibのみ).
+"""
+import struct
+import zlib
+from collections.abc import Iterable, Iterator
+
+from .constants import COLOR_SCHEMES, Cell
+from .export import atomic_open
+from .rows import pack_row
+
+# 書き出せる画像の拡張子 -> 形式
+IMAGE_SUFFIXES = {".png": "png", ".ppm": "ppm"}
+# 圧縮したIDATをこのバイト数ごとに1つのチャンクにする
+IDAT_SIZE = 1 << 16
+# 1マスのピクセル数の上限(大きすぎる画像を作らないため)
+MAX_SCALE = 64
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# ANSIの背景色コード -> RGB(xtermの既定の色)
+ANSI_RGB = {
+    40: (0, 0, 0), 41: (205, 0, 0), 42: (0, 205, 0), 43: (205, 205, 0),
+    44: (0, 0, 238), 45: (205, 0, 205), 46: (0, 205, 205),
+    47: (229, 229, 229),
+    100: (127, 127, 127), 101: (255, 0, 0), 102: (0, 255, 0),
+    103: (255, 255, 0), 104: (92, 92, 255), 105: (255, 0, 255),
+    106: (0, 255, 255), 107: (255, 255, 255),
+}
+
+
+def image_format(file_path: str) -> str:
+    """ファイルパスの拡張子から画像の形式を返す.
+
+    Raises:
+        ValueError: 画像の拡張子(.png, .ppm)でない場合.
+    """
+    for suffix, kind in IMAGE_SUFFIXES.items():
+        if file_path.lower().endswith(suffix):
+            return kind
+    raise ValueError(
+        f"Unknown image format: '{file_path}' (use .png or .ppm)"
+    )
+
+
+def _background(sgr: str) -> tuple[int, int, int]:
+    """ANSIの色指定(ESC[...m)の背景色をRGBにする."""
+    codes = sgr.removeprefix("\33[").removesuffix("m").split(";")
+    color = (0, 0, 0)
+    for code in codes:
+        if code.isdigit() and int(code) in ANSI_RGB:
+            color = ANSI_RGB[int(code)]
+    return color
+
+
+def cell_colors(
+    color_id: int = 0, show_path: bool = False
+) -> list[tuple[int, int, int]]:
+    """セルの値 -> RGBの対応表を作る(mazegen.render.cell_stringsと同じ配色).
+
+    Args:
+        color_id (int): 迷路のカラープリセットを選ぶ値.
+        show_path (bool): ゴールまでの経路を表示するか.
+
+    Returns:
+        list[tuple[int, int, int]]: セルの値を添字とするRGBのリスト.
+    """
+    colors = COLOR_SCHEMES.get(color_id, COLOR_SCHEMES[0])
+    rgb = [(0, 0, 0)] * len(Cell)
+    rgb[Cell.ROAD.value] = _background(colors["r_color"])
+    rgb[Cell.WALL.value] = _background(colors["w_color"])
+    rgb[Cell.ENTRY.value] = _background(colors["s_color"])
+    rgb[Cell.EXIT.value] = _background(colors["g_color"])
+    rgb[Cell.FOURTY_TWO.value] = _background(colors["ft_color"])
+    # ROUTEは経路表示時のみ黄色、それ以外はROADと同じ
+    rgb[Cell.ROUTE.value] = (
+        _background(colors["y_color"]) if show_path
+        else rgb[Cell.ROAD.value]
+    )
+    return rgb
+
+
+def _scale_row(row: bytes | bytearray, scale: int) -> bytes:
+    """行の各バイトを横にscale回ずつ並べる."""
+    if scale == 1:
+        return bytes(row)
+    scaled = bytearray(len(row) * scale)
+    for offset in range(scale):
+        scaled[offset::scale] = row
+    return bytes(scaled)
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    """PNGのチャンク(長さ, 種類, データ, CRC)を作る."""
+    return (
+        struct.pack(">I", len(data)) + kind + data
+        + struct.pack(">I", zlib.crc32(kind + data))
+    )
+
+
+def _iter_png(
+    rows: Iterable[bytes | bytearray],
+    columns: int,
+    row_count: int,
+    colors: list[tuple[int, int, int]],
+    scale: int,
+    level: int
+) -> Iterator[bytes | bytearray]:
+    """PNGのバイト列を先頭から少しずつ返す."""
+    yield _PNG_SIGNATURE
+    # 幅, 高さ, ビット深度4, パレット形式(3), 圧縮0, フィルタ0, インターレースなし
+    yield _chunk(b"IHDR", struct.pack(
+        ">IIBBBBB", columns * scale, row_count * scale, 4, 3, 0, 0, 0
+    ))
+    yield _chunk(b"PLTE", b"".join(bytes(color) for color in colors))
+    compressor = zlib.compressobj(level)
+    # 各スキャンラインの先頭はフィルタの種類(0: なし, 2: 上の行との差)
+    repeat = b"\x02" + bytes((columns * scale + 1) // 2)
+    pending = bytearray()
+    for row in rows:
+        # セルの値(0~5)は4ビットに収まるので、1バイトに2ピクセル詰める
+        pending += compressor.compress(
+            b"\x00" + pack_row(_scale_row(row, scale))
+        )
+        for _ in range(scale - 1):
+            pending += compressor.compress(repeat)
+        if len(pending) >= IDAT_SIZE:
+            yield _chunk(b"IDAT", bytes(pending))
+            pending.clear()
+    pending += compressor.flush()
+    yield _chunk(b"IDAT", bytes(pending))
+    yield _chunk(b"IEND", b"")
+
+
+def _iter_ppm(
+    rows: Iterable[bytes | bytearray],
+    columns: int,
+    row_count: int,
+    colors: list[tuple[int, int, int]],
+    scale: int
+) -> Iterator[bytes | bytearray]:
+    """PPM(P6)のバイト列を1行ずつ返す."""
+    yield f"P6\n{columns * scale} {row_count * scale}\n255\n".encode("ascii")
+    # セルの値 -> R, G, B に変換するbytes.translate用の表
+    tables = [
+        bytes(colors[value][channel] if value < len(colors) else 0
+              for value in range(256))
+        for channel in range(3)
+    ]
+    for row in rows:
+        scaled = _scale_row(row, scale)
+        line = bytearray(len(scaled) * 3)
+        for channel, table in enumerate(tables):
+            line[channel::3] = scaled.translate(table)
+        for _ in range(scale):
+            yield line
+
+
+def write_image(
+    file_path: str,
+    rows: Iterable[bytes | bytearray],
+    columns: int,
+    row_count: int,
+    color_id: int = 0,
+    show_path: bool = False,
+    scale: int = 4,
+    level: int = 6
+) -> int:
+    """グリッドの行を画像に書き出す(形式は拡張子で決める).
+
+    書き終わってから出力先に置き換える(mazegen.export.atomic_open).
+
+    Args:
+        file_path (str): 保存するファイルパス(.png, .ppm).
+        rows (Iterable[bytes | bytearray]): 上の行から順に、セルの値(Cell)の行.
+        columns (int): 1行のマスの数.
+        row_count (int): 行の数.
+        color_id (int): 迷路のカラープリセットを選ぶ値.
+        show_path (bool): ROUTEのマスを経路の色で描くか.
+        scale (int): 1マスの縦横のピクセル数.
+        level (int): PNGの圧縮レベル(0~9).
+
+    Returns:
+        int: 書き込んだバイト数.
+
+    Raises:
+        ValueError: 拡張子が画像でない、scaleが範囲外の場合.
+        OSError: 書き込めなかった場合(出力先は変わらない).
+    """
+    kind = image_format(file_path)
+    if not 1 <= scale <= MAX_SCALE:
+        raise ValueError(f"scale must be between 1 and {MAX_SCALE}")
+    colors = cell_colors(color_id, show_path)
+    if kind == "png":
+        parts = _iter_png(rows, columns, row_count, colors, scale, level)
+    else:
+        parts = _iter_ppm(rows, columns, row_count, colors, scale)
+    written = 0
+    with atomic_open(file_path) as f:
+        for part in parts:
+            written += f.write(part)
+    return written
@@ -0,0 +1,396 @@
+"""棒倒し法の一括抽選エンジン.
+
+柱を1本ずつ処理する代わりに、1行分の柱の倒す向きをまとめて抽選し、
+スライス代入で壁を書き込む.
+
+完全迷路では random.choice と同じ乱数の消費を再現するため、
+同じシード値なら逐次版(MazeGenerator._pillars_and_knock)と同一の迷路になる.
+random.choice(候補n個)は getrandbits(k) (k = n.bit_length()) を
+n未満になるまで引き直すので、32bitの乱数の上位kビットを同じ規則で採否判定する.
+
+不完全迷路では柱1本につき32bitの乱数wを1つだけ消費する次の対応で決める.
+    - w の下位16ビットが 0x6666 未満(約4割)の時、倒さない候補にする
+      (逐次版の random.random() > 0.6 に相当).
+      候補の柱は上か左に既に棒が倒れている時だけ倒さない(逐次版と同じ条件).
+    - 倒す時は候補の向きn個のうち (w の上位16ビット * n) >> 16 番目に倒す.
+逐次版とは乱数の消費が異なるため、不完全迷路の結果は逐次版と一致しないが、
+同じシード値なら常に同じ迷路になる.
+"""
+import sys
+from array import array
+from collections.abc import Sequence
+from typing import Any, Protocol
+
+from .constants import FT_TARGET_PILLARS, Cell
+
+# MazeGeneratorで選択できる棒倒しのエンジン
+KNOCK_ENGINES = ("auto", "scalar", "batch")
+
+# 棒を倒す向き(逐次版でrandom.choiceに渡す候補リストと同じ並び)
+KNOCK_S = 0
+KNOCK_E = 1
+KNOCK_W = 2
+KNOCK_N = 3
+# 向き -> 柱からの(dx, dy)
+KNOCK_OFFSETS = ((0, 1), (1, 0), (-1, 0), (0, -1))
+
+# 倒さない柱の印
+_SKIP = 0xFF
+# 不完全迷路で倒さない候補にする下位16ビットの閾値(0x6666 / 0x10000 ≒ 0.4)
+_SKIP_THRESHOLD = 0x6666
+# 32bitの乱数を格納するarrayの型コード
+_WORD_CODE = "I" if array("I").itemsize == 4 else "L"
+
+
+def _accept_table(n: int) -> bytes:
+    """乱数の最上位バイト -> 採用された添字(不採用は_SKIP)の変換表を作る."""
+    shift = 8 - n.bit_length()
+    return bytes(
+        b >> shift if b >> shift < n else _SKIP for b in range(256)
+    )
+
+
+def _slot_table(kind: int) -> bytes:
+    """向き -> その向きならWALL、それ以外はROAD の変換表を作る."""
+    return bytes(
+        Cell.WALL.value if b == kind else Cell.ROAD.value for b in range(256)
+    )
+
+
+# 候補数n -> 採否判定表
+_ACCEPT_TABLES = {n: _accept_table(n) for n in (2, 3, 4)}
+_IS_S = _slot_table(KNOCK_S)
+_IS_E = _slot_table(KNOCK_E)
+_IS_N = _slot_table(KNOCK_N)
+
+
+class RandomSource(Protocol):
+    """一括抽選に使う乱数生成器(randomモジュールかrandom.Random)."""
+
+    def getrandbits(self, k: int, /) -> int:
+        """kビットの乱数を返す."""
+        ...
+
+    def getstate(self) -> tuple[Any, ...]:
+        """内部状態を返す."""
+        ...
+
+    def setstate(self, state: tuple[Any, ...], /) -> None:
+        """内部状態を戻す."""
+        ...
+
+
+class ScalarRandomSource(Protocol):
+    """逐次版の抽選に使う乱数生成器(randomモジュールかrandom.Random)."""
+
+    def random(self) -> float:
+        """[0.0, 1.0)の乱数を返す."""
+        ...
+
+    def choice(self, seq: Sequence[int], /) -> int:
+        """seqから1つ選んで返す."""
+        ...
+
+
+class KnockStream:
+    """32bitの乱数をブロック単位でまとめて引き、順に消費するクラス.
+
+    getrandbits(32 * n)は getrandbits(32) をn回呼んだ結果を下位から
+    並べたものと等しいので、ブロックで引いても1つずつ引いた時と同じ列になる.
+    close()で実際に消費した個数分だけ乱数生成器を進めた状態に戻す.
+
+    Attributes:
+        _rng (RandomSource): 乱数生成器.
+        _state (tuple): 現在のブロックを引く前の乱数生成器の状態.
+        _raw (bytes): 現在のブロック(リトルエンディアンの32bit列).
+        _top (bytes): 現在のブロックの各乱数の最上位バイト.
+        _pos (int): 現在のブロックで消費済みの乱数の個数.
+        _block (int): 次に引くブロックの乱数の個数.
+    """
+
+    _MAX_BLOCK = 1 << 16
+
+    def __init__(self, rng: RandomSource) -> None:
+        """KnockStreamを初期化する.
+
+        Args:
+            rng (RandomSource): 乱数生成器.
+        """
+        self._rng = rng
+        self._state = rng.getstate()
+        self._raw = b""
+        self._top = b""
+        self._pos = 0
+        self._block = 256
+
+    def _refill(self) -> None:
+        """使い切ったブロックを捨てて次のブロックを引く."""
+        self._state = self._rng.getstate()
+        n = self._block
+        self._raw = self._rng.getrandbits(32 * n).to_bytes(4 * n, "little")
+        self._top = self._raw[3::4]
+        self._pos = 0
+        # 大きい迷路ほどブロックを大きくして呼び出し回数を減らす
+        self._block = min(self._block * 2, self._MAX_BLOCK)
+
+    def choices(self, kinds: tuple[int, ...], count: int) -> bytes:
+        """random.choice(kinds)をcount回呼んだのと同じ結果をまとめて返す.
+
+        Args:
+            kinds (tuple[int, ...]): 倒す向きの候補(2~4個).
+            count (int): 抽選する回数.
+
+        Returns:
+            bytes: 選ばれた向きの列.
+        """
+        table = _ACCEPT_TABLES[len(kinds)]
+        parts = []
+        need = count
+        while need:
+            if self._pos == len(self._top):
+                self._refill()
+            pos = self._pos
+            # 棄却率は高々1/2なので、必要数の2倍強を1度に判定する
+            stop = min(len(self._top), pos + need * 2 + 64)
+            mapped = self._top[pos:stop].translate(table)
+            got = len(mapped) - mapped.count(_SKIP)
+            # 足りない時は末尾の不採用分も含めて丸ごと消費する
+            if got < need:
+                parts.append(mapped.replace(b"\xff", b""))
+                need -= got
+                self._pos = stop
+                continue
+            # need個目の採用が現れる位置を二分探索
+            lo, hi = need, len(mapped)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if mid - mapped.count(_SKIP, 0, mid) >= need:
+                    hi = mid
+                else:
+                    lo = mid + 1
+            parts.append(mapped[:lo].replace(b"\xff", b""))
+            self._pos = pos + lo
+            need = 0
+        kind_table = bytes(kinds) + bytes(256 - len(kinds))
+        return b"".join(parts).translate(kind_table)
+
+    def words(self, count: int) -> "array[int]":
+        """32bitの乱数をcount個返す.
+
+        Args:
+            count (int): 乱数の個数.
+
+        Returns:
+            array[int]: 乱数の列.
+        """
+        out: array[int] = array(_WORD_CODE)
+        while count:
+            if self._pos == len(self._top):
+                self._refill()
+            take = min(count, len(self._top) - self._pos)
+            out.frombytes(self._raw[self._pos * 4:(self._pos + take) * 4])
+            self._pos += take
+            count -= take
+        if sys.byteorder == "big":
+            out.byteswap()
+        return out
+
+    def close(self) -> None:
+        """乱数生成器を実際に消費した分だけ進めた状態にする."""
+        self._rng.setstate(self._state)
+        if self._pos:
+            self._rng.getrandbits(32 * self._pos)
+
+
+def row_groups(
+    width: int,
+    y: int,
+    ft_box: tuple[int, int, int, int] | None
+) -> list[tuple[int, int, tuple[int, ...], bool]]:
+    """1行分の柱を、同じ候補で連続して処理できるまとまりに分ける.
+
+    Args:
+        width (int): 迷路の幅.
+        y (int): 柱の行(2倍の座標で2以上の偶数).
+        ft_box (tuple[int, int, int, int] | None): 42スタンプの範囲.
+
+    Returns:
+        list[tuple[int, int, tuple[int, ...], bool]]:
+            (先頭の柱のx, 柱の本数, 倒す向きの候補, 42スタンプの範囲内か)の列.
+    """
+    last = width * 2 - 2
+    # 柱の区間(開始x, 終了x, 42スタンプの範囲内か)
+    spans: list[tuple[int, int, bool]] = []
+    if ft_box is None or not ft_box[2] <= y <= ft_box[3]:
+        spans.append((2, last, False))
+    else:
+        # 42スタンプの範囲内は追加で棒倒しをする柱だけ、壁を壊さないよう1本ずつ
+        min_x, max_x, min_y, _ = ft_box
+        spans.append((2, min(min_x - 2, last), False))
+        for x in range(min_x, min(max_x, last) + 1, 2):
+            if (x - min_x, y - min_y) in FT_TARGET_PILLARS:
+                spans.append((x, x, True))
+        spans.append((max_x + 2, last, False))
+
+    # 一番上なら上にも倒す(N)、一番左なら左にも倒す(W)
+    top = (KNOCK_N,) if y == 2 else ()
+    first = (KNOCK_S, KNOCK_E, KNOCK_W) + top
+    inner = (KNOCK_S, KNOCK_E) + top
+
+    groups: list[tuple[int, int, tuple[int, ...], bool]] = []
+    for x_from, x_to, scalar in spans:
+        if x_from == 2 and x_to >= 2:
+            groups.append((2, 1, first, scalar))
+            x_from = 4
+        if x_from <= x_to:
+            groups.append(
+                (x_from, (x_to - x_from) // 2 + 1, inner, scalar)
+            )
+    return groups
+
+
+def draw_row(
+    stream: KnockStream,
+    groups: list[tuple[int, int, tuple[int, ...], bool]],
+    width: int,
+    perfect: bool,
+    above: bytes,
+    left: bytes
+) -> bytes:
+    """一括抽選で1行分の柱の倒す向きを決める.
+
+    Args:
+        stream (KnockStream): 乱数の列.
+        groups (list[tuple[int, int, tuple[int, ...], bool]]):
+            row_groups()で分けた柱のまとまり.
+        width (int): 迷路の幅.
+        perfect (bool): 完全迷路にするかどうか.
+        above (bytes): 各柱の上に棒が倒れているか(1/0、不完全迷路でのみ使用).
+        left (bytes): 各柱の左が42スタンプの壁か(1/0、不完全迷路でのみ使用).
+
+    Returns:
+        bytes: 左からwidth - 1本の柱の倒す向き(倒さない・柱がない時は0xFF).
+    """
+    knocks = bytearray([_SKIP]) * (width - 1)
+    for x0, count, kinds, _ in groups:
+        i0 = x0 // 2 - 1
+        if perfect:
+            knocks[i0:i0 + count] = stream.choices(kinds, count)
+            continue
+        # 左の棒は直前の柱の結果で決まるので、判定だけ柱ごとに行う
+        n = len(kinds)
+        for i, word in enumerate(stream.words(count), i0):
+            if (word & 0xFFFF) < _SKIP_THRESHOLD and (
+                above[i] or left[i] or (i and knocks[i - 1] == KNOCK_E)
+            ):
+                continue
+            knocks[i] = kinds[((word >> 16) * n) >> 16]
+    return bytes(knocks)
+
+
+def draw_row_scalar(
+    rng: ScalarRandomSource,
+    groups: list[tuple[int, int, tuple[int, ...], bool]],
+    width: int,
+    perfect: bool,
+    above: bytes,
+    left: bytes
+) -> bytes:
+    """逐次版と同じ順番で乱数を引いて1行分の柱の倒す向きを決める.
+
+    Args:
+        rng (ScalarRandomSource): 乱数生成器.
+        groups (list[tuple[int, int, tuple[int, ...], bool]]):
+            row_groups()で分けた柱のまとまり.
+        width (int): 迷路の幅.
+        perfect (bool): 完全迷路にするかどうか.
+        above (bytes): 各柱の上に棒が倒れているか(1/0、不完全迷路でのみ使用).
+        left (bytes): 各柱の左が42スタンプの壁か(1/0、不完全迷路でのみ使用).
+
+    Returns:
+        bytes: 左からwidth - 1本の柱の倒す向き(倒さない・柱がない時は0xFF).
+    """
+    knocks = bytearray([_SKIP]) * (width - 1)
+    for x0, count, kinds, _ in groups:
+        i0 = x0 // 2 - 1
+        for i in range(i0, i0 + count):
+            # perfectじゃないかつ柱の左と上に棒が倒れている時
+            # 4割の確率で棒を倒さない
+            if (not perfect and rng.random() > 0.6 and (
+                above[i] or left[i] or (i and knocks[i - 1] == KNOCK_E)
+            )):
+                continue
+            knocks[i] = rng.choice(kinds)
+    return bytes(knocks)
+
+
+def knock_pillars(
+    grid: bytearray,
+    width: int,
+    height: int,
+    perfect: bool,
+    ft_box: tuple[int, int, int, int] | None,
+    rng: RandomSource
+) -> int:
+    """外壁と42スタンプを埋め込んだグリッドに柱を立てて棒を倒す.
+
+    Args:
+        grid (bytearray): 迷路のグリッド(MazeGenerator._gridと同じ形式).
+        width (int): 迷路の幅.
+        height (int): 迷路の高さ.
+        perfect (bool): 完全迷路にするかどうか.
+        ft_box (tuple[int, int, int, int] | None):
+            42スタンプの範囲(min_x, max_x, min_y, max_y). ない場合はNone.
+        rng (RandomSource): 乱数生成器.
+
+    Returns:
+        int: 倒した棒の数.
+    """
+    w_grid = width * 2 + 1
+    h_grid = height * 2 + 1
+    wall = bytes([Cell.WALL.value])
+    stream = KnockStream(rng)
+    above = left = b""
+    knocked = 0
+
+    for y in range(2, h_grid - 1, 2):
+        row = y * w_grid
+        groups = row_groups(width, y, ft_box)
+        if not perfect:
+            # 柱の上と左の壁(この行の棒倒し前の状態)
+            above = bytes(grid[row - w_grid + 2:row - 2:2])
+            left = bytes(grid[row + 1:row + w_grid - 3:2])
+        knocks = draw_row(stream, groups, width, perfect, above, left)
+        knocked += len(knocks) - knocks.count(_SKIP)
+
+        for x0, count, _, in_ft in groups:
+            i0 = x0 // 2 - 1
+            base = row + x0
+            stop = base + count * 2 - 1
+            row_knocks = knocks[i0:i0 + count]
+
+            if in_ft:
+                # 42スタンプの壁を壊さないよう倒した所だけ書き込む
+                for i, kind in enumerate(row_knocks):
+                    pos = base + i * 2
+                    grid[pos] = wall[0]
+                    if kind != _SKIP:
+                        dx, dy = KNOCK_OFFSETS[kind]
+                        grid[pos + dy * w_grid + dx] = wall[0]
+                continue
+
+            # 柱の埋め込みと、右(E)・下(S)・上(N)への棒倒しをスライスで書き込む
+            # 42スタンプの範囲外の倒す先は必ずROADなので上書きしてよい
+            grid[base:stop:2] = wall * count
+            grid[base + 1:stop + 1:2] = row_knocks.translate(_IS_E)
+            grid[base + w_grid:stop + w_grid:2] = row_knocks.translate(_IS_S)
+            if y == 2:
+                grid[base - w_grid:stop - w_grid:2] = (
+                    row_knocks.translate(_IS_N)
+                )
+            # 左(W)に倒せるのは一番左の柱だけ
+            if x0 == 2 and row_knocks[0] == KNOCK_W:
+                grid[base - 1] = wall[0]
+
+    stream.close()
+    return knocked
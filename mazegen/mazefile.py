@@ -0,0 +1,344 @@
+"""迷路をバイナリ形式で保存し、mmapで読み込むモジュール.
+
+ファイルの形式(数値はすべてリトルエンディアン):
+    ヘッダー(48バイト):
+        マジック(b"AMZ1"), 形式の版(u16), フラグ(u16),
+        幅, 高さ, 入口x, 入口y, 出口x, 出口y(各u32),
+        シード値(i64), 経路の歩数(u64).
+    セル: 1行(width + 1) // 2バイトで、1バイトに横2セル
+        (左のセルが上位4ビット、PackedMazeと同じ)を height行分.
+    経路(フラグにあれば): 1歩2ビット(N=0, E=1, S=2, W=3)で、
+        1バイトに4歩ずつ先の歩を上位ビットから詰める.
+
+読み込みはファイルをmmapするので、ヘッダーを読むだけで開き終わり、
+行やセルは触った所のページだけがディスクから読まれる.
+数GBの迷路でも開く時間とメモリはファイルの大きさに依存しない.
+"""
+import mmap
+import os
+import struct
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, replace
+from types import TracebackType
+
+from .constants import WALL_E, WALL_N, WALL_S, WALL_W
+from .export import atomic_open
+from .rows import unpack_cells
+from .solver import solve_walls
+
+MAGIC = b"AMZ1"
+FORMAT_VERSION = 1
+# マジック, 版, フラグ, 幅, 高さ, 入口, 出口, シード値, 経路の歩数
+_HEADER = struct.Struct("<4sHHIIIIIIqQ")
+
+FLAG_PERFECT = 1
+FLAG_PATTERN = 2
+FLAG_PATH = 4
+
+# 方角 -> 2ビットの番号(それ以外は0xFF)、番号 -> 方角
+_STEP_CODES = bytes(
+    b"NESW".find(value) & 0xFF for value in range(256)
+)
+_STEP_NAMES = b"NESW" + bytes(252)
+# 1バイト -> 上位から数えてi番目の2ビット
+_STEP_AT = [
+    bytes(value >> shift & 3 for value in range(256))
+    for shift in (6, 4, 2, 0)
+]
+
+
+@dataclass
+class MazeHeader:
+    """バイナリ形式のヘッダー.
+
+    Attributes:
+        width (int): 迷路の幅.
+        height (int): 迷路の高さ.
+        entry_point (tuple[int, int]): 迷路のスタート座標.
+        exit_point (tuple[int, int]): 迷路のゴール座標.
+        seed (int): 生成に使ったシード値.
+        perfect (bool): 完全迷路かどうか.
+        pattern (bool): 42ロゴを埋め込む設定かどうか.
+        path_length (int): 保存した経路の歩数(0なら経路なし).
+    """
+
+    width: int
+    height: int
+    entry_point: tuple[int, int]
+    exit_point: tuple[int, int]
+    seed: int
+    perfect: bool
+    pattern: bool
+    path_length: int = 0
+
+    @property
+    def row_bytes(self) -> int:
+        """セルの1行分のバイト数."""
+        return (self.width + 1) // 2
+
+    def pack(self) -> bytes:
+        """ヘッダーをバイト列にする."""
+        flags = (
+            (FLAG_PERFECT if self.perfect else 0)
+            | (FLAG_PATTERN if self.pattern else 0)
+            | (FLAG_PATH if self.path_length else 0)
+        )
+        return _HEADER.pack(
+            MAGIC, FORMAT_VERSION, flags, self.width, self.height,
+            *self.entry_point, *self.exit_point, self.seed, self.path_length
+        )
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "MazeHeader":
+        """バイト列からヘッダーを読む.
+
+        Raises:
+            ValueError: 迷路のファイルでない、版が異なる、
+                または入口と出口が迷路の範囲外の場合.
+        """
+        # generatorはこのモジュールを読み込むので、使う時に読み込む
+        from .generator import validate_points
+
+        if len(data) < _HEADER.size or data[:4] != MAGIC:
+            raise ValueError("Not a maze binary file")
+        (
+            _, version, flags, width, height, ex, ey, gx, gy, seed,
+            path_length
+        ) = _HEADER.unpack_from(data)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported maze file version: {version}")
+        # 壊れたヘッダーの座標でセルの外を読まないように先に確かめる
+        try:
+            validate_points(width, height, (ex, ey), (gx, gy))
+        except ValueError as e:
+            raise ValueError(f"Not a maze binary file: {e}") from e
+        return cls(
+            width, height, (ex, ey), (gx, gy), seed,
+            bool(flags & FLAG_PERFECT), bool(flags & FLAG_PATTERN),
+            path_length if flags & FLAG_PATH else 0
+        )
+
+
+def pack_path(path_str: str) -> bytes:
+    """経路を1歩2ビットに詰める.
+
+    Raises:
+        ValueError: 'N', 'E', 'S', 'W'以外の文字がある場合.
+    """
+    codes = path_str.encode("ascii", "replace").translate(_STEP_CODES)
+    if 0xFF in codes:
+        raise ValueError("The path must consist of 'N', 'E', 'S' and 'W'")
+    # 4歩ずつにそろえ、各歩を巨大な整数の桁としてまとめてずらす
+    codes += bytes(-len(codes) % 4)
+    value = 0
+    for i, shift in enumerate((6, 4, 2, 0)):
+        value |= int.from_bytes(codes[i::4], "big") << shift
+    return value.to_bytes(len(codes) // 4, "big")
+
+
+def unpack_path(data: bytes, length: int) -> str:
+    """1歩2ビットに詰めた経路をlength歩分の文字列に戻す."""
+    codes = bytearray(len(data) * 4)
+    for i, table in enumerate(_STEP_AT):
+        codes[i::4] = data.translate(table)
+    return codes[:length].translate(_STEP_NAMES).decode("ascii")
+
+
+def write_maze_file(
+    file_path: str,
+    header: MazeHeader,
+    rows: Iterable[bytes],
+    path_str: str = ""
+) -> int:
+    """迷路をバイナリ形式で書き込む.
+
+    行は1行ずつ書き込むので、生成しながら渡せば迷路全体を保持せずに済む.
+
+    Args:
+        file_path (str): 保存するファイルパス.
+        header (MazeHeader): ヘッダー(path_lengthはpath_strから決める).
+        rows (Iterable[bytes]): 上の行から順に、2セルを1バイトに詰めた行.
+        path_str (str): 保存する経路. 空なら経路なし.
+
+    Returns:
+        int: 書き込んだバイト数.
+
+    Raises:
+        ValueError: 行の長さや数がヘッダーと合わない、
+            または経路に不正な文字がある場合.
+    """
+    header = replace(header, path_length=len(path_str))
+    path_data = pack_path(path_str)
+    row_bytes = header.row_bytes
+    written = 0
+    # 書き終わってから置き換えるので、失敗しても前のファイルが残る
+    with atomic_open(file_path) as f:
+        written += f.write(header.pack())
+        count = 0
+        for row in rows:
+            if len(row) != row_bytes:
+                raise ValueError(
+                    f"Row {count} has {len(row)} bytes, expected {row_bytes}"
+                )
+            written += f.write(row)
+            count += 1
+        if count != header.height:
+            raise ValueError(
+                f"The maze has {count} rows, expected {header.height}"
+            )
+        written += f.write(path_data)
+    return written
+
+
+def _check_outer_walls(
+    walls: bytes | bytearray, stride: int, width: int, height: int
+) -> None:
+    """迷路の外周のセルに外側の壁があるか確かめる.
+
+    Args:
+        walls (bytes | bytearray): 1セル1バイトの壁(N=1, E=2, S=4, W=8).
+        stride (int): 1行分のバイト数(迷路の幅以上).
+        width (int): 迷路の幅.
+        height (int): 迷路の高さ.
+
+    Raises:
+        ValueError: 外壁が閉じていない場合.
+    """
+    last = (height - 1) * stride
+    closed = (
+        all(cell & WALL_N for cell in walls[:width])
+        and all(cell & WALL_S for cell in walls[last:last + width])
+        and all(cell & WALL_W for cell in walls[0:last + 1:stride])
+        and all(cell & WALL_E for cell in walls[width - 1:last + width:stride])
+    )
+    if not closed:
+        raise ValueError(
+            "Corrupted maze binary file: the outer walls are not closed"
+        )
+
+
+class MazeFile:
+    """バイナリ形式の迷路をmmapで読むクラス.
+
+    with文で使うと抜けた時にファイルを閉じる.
+
+    Attributes:
+        header (MazeHeader): ファイルのヘッダー.
+        _map (mmap.mmap): ファイル全体の読み取り専用のマップ.
+        _row_bytes (int): セルの1行分のバイト数.
+        _path_offset (int): 経路の先頭の位置.
+    """
+
+    def __init__(self, file_path: str) -> None:
+        """ファイルを開いてヘッダーを読む.
+
+        Args:
+            file_path (str): 読み込むファイルパス.
+
+        Raises:
+            ValueError: 迷路のファイルでない、または途中で切れている場合.
+        """
+        with open(file_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < _HEADER.size:
+                raise ValueError("Not a maze binary file")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.header = MazeHeader.unpack(self._map[:_HEADER.size])
+            self._row_bytes = self.header.row_bytes
+            self._path_offset = (
+                _HEADER.size + self._row_bytes * self.header.height
+            )
+            if size < self._path_offset + (self.header.path_length + 3) // 4:
+                raise ValueError("The maze binary file is truncated")
+        except ValueError:
+            self._map.close()
+            raise
+
+    def close(self) -> None:
+        """ファイルを閉じる."""
+        self._map.close()
+
+    def __enter__(self) -> "MazeFile":
+        """with文の開始."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None
+    ) -> None:
+        """with文の終了時にファイルを閉じる."""
+        self.close()
+
+    def _row_offset(self, y: int) -> int:
+        """y行目の先頭の位置を返す.
+
+        Raises:
+            IndexError: yが迷路の外の場合.
+        """
+        if not 0 <= y < self.header.height:
+            raise IndexError(f"Row {y} is out of the maze")
+        return _HEADER.size + y * self._row_bytes
+
+    def get_packed_row(self, y: int) -> bytes:
+        """y行目を2セルを1バイトに詰めたまま返す."""
+        start = self._row_offset(y)
+        return self._map[start:start + self._row_bytes]
+
+    def get_row(self, y: int) -> bytes:
+        """y行目のセルの壁(N=1, E=2, S=4, W=8)を1セル1バイトで返す."""
+        return bytes(unpack_cells(self.get_packed_row(y))[:self.header.width])
+
+    def get_cell(self, x: int, y: int) -> int:
+        """セル(x, y)の壁(N=1, E=2, S=4, W=8)を返す.
+
+        Raises:
+            IndexError: セルが迷路の外の場合.
+        """
+        if not 0 <= x < self.header.width:
+            raise IndexError(f"Cell ({x}, {y}) is out of the maze")
+        byte = self._map[self._row_offset(y) + (x >> 1)]
+        return byte & 0xF if x & 1 else byte >> 4
+
+    def get_hex_row(self, y: int) -> str:
+        """y行目を出力ファイルと同じ16進数の行にする."""
+        return self.get_packed_row(y).hex().upper()[:self.header.width]
+
+    def iter_rows(self) -> Iterator[bytes]:
+        """上の行から順に1セル1バイトの行を返す."""
+        return (self.get_row(y) for y in range(self.header.height))
+
+    def get_path(self) -> str:
+        """保存した経路を返す. 経路がなければ空."""
+        length = self.header.path_length
+        start = self._path_offset
+        return unpack_path(self._map[start:start + (length + 3) // 4], length)
+
+    def solve_maze(self, method: str = "bfs") -> str:
+        """ゴールまでの最短経路を求める(セル全体を読み込む).
+
+        Args:
+            method (str): 探索の方式("bfs", "bidirectional", "astar").
+
+        Returns:
+            str: ゴールまでの道筋を'N', 'E', 'S', 'W'で表す.
+
+        Raises:
+            ValueError: methodが不明な値の場合、または外壁が閉じていない
+                (ファイルが壊れている)場合.
+        """
+        walls = unpack_cells(self._map[_HEADER.size:self._path_offset])
+        # 探索はセルの外に出ない前提なので、外壁が閉じているか先に確かめる
+        _check_outer_walls(
+            walls, self._row_bytes * 2, self.header.width, self.header.height
+        )
+        return solve_walls(
+            walls, self._row_bytes * 2,
+            self.header.entry_point, self.header.exit_point, method
+        )
+
+    def get_hex_grid(self) -> list[str]:
+        """迷路全体を16進数の行にする."""
+        return [self.get_hex_row(y) for y in range(self.header.height)]
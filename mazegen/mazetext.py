@@ -0,0 +1,469 @@
+"""出力ファイル(maze.txt)を読み込むモジュール.
+
+save_to_file()の形式(16進数の行、空行、入口、出口、最短経路)を読む.
+16進数の行は1文字ずつではなく、変換表(bytes.translate)で
+1行(または全行)まとめて1セル1バイトの壁にする.
+
+read_maze_text()はファイルを1行ずつ読み、探索や描画に使える壁を返す.
+verify_maze_text()は経路を先に読んでから行を1行ずつ読み、
+迷路全体を保持せずに経路が壁を通り抜けていないかを確かめる.
+"""
+from collections import deque
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import BinaryIO
+
+from .constants import FT_PATTERN, WALL_E, WALL_N, WALL_S, WALL_W, ft_start
+from .export import compression_for, open_maze_file
+from .generator import MazeGenerator, validate_points
+from .solver import solve_walls
+
+# 16進数の文字(ASCII) -> セルの値(0~15)、それ以外は0xFF
+_HEX_VALUES = bytes(
+    int(chr(value), 16) if chr(value) in "0123456789ABCDEFabcdef" else 0xFF
+    for value in range(256)
+)
+# 経路の方角 -> 進む時に通る壁のビット、(x の増分, y の増分)
+_STEPS = {
+    "N": (WALL_N, 0, -1),
+    "E": (WALL_E, 1, 0),
+    "S": (WALL_S, 0, 1),
+    "W": (WALL_W, -1, 0),
+}
+# 読み込む塊の大きさ(ファイルの末尾を後ろから読む時)
+_CHUNK = 1 << 16
+
+
+def _bit_table(bit: int) -> bytes:
+    """セルの値 -> そのビットの壁があれば1 の変換表を作る."""
+    return bytes(1 if value & bit else 0 for value in range(256))
+
+
+_HAS_N = _bit_table(WALL_N)
+_HAS_E = _bit_table(WALL_E)
+_HAS_S = _bit_table(WALL_S)
+_HAS_W = _bit_table(WALL_W)
+
+
+@dataclass
+class MazeText:
+    """読み込んだ出力ファイル.
+
+    Attributes:
+        width (int): 迷路の幅.
+        height (int): 迷路の高さ.
+        entry_point (tuple[int, int]): 迷路のスタート座標.
+        exit_point (tuple[int, int]): 迷路のゴール座標.
+        path (str): 保存されていた経路.
+        walls (bytes): 全セルの壁(N=1, E=2, S=4, W=8)を1セル1バイトで
+            行順に並べたもの(セル(x, y)は walls[y * width + x]).
+    """
+
+    width: int
+    height: int
+    entry_point: tuple[int, int]
+    exit_point: tuple[int, int]
+    path: str
+    walls: bytes
+
+    def get_row(self, y: int) -> bytes:
+        """y行目のセルの壁を1セル1バイトで返す."""
+        return self.walls[y * self.width:(y + 1) * self.width]
+
+    def check_path(self) -> None:
+        """保存されていた経路が入口から出口まで壁を通らずに進むか確かめる.
+
+        Raises:
+            ValueError: 経路が壁を通る、迷路の外に出る、または出口で終わらない場合.
+        """
+        walls = self.walls
+        for index, bit, x, y in _walk_path(
+            self.path, self.entry_point, self.exit_point,
+            self.width, self.height
+        ):
+            if walls[index] & bit:
+                raise ValueError(f"The path crosses a wall at ({x}, {y})")
+
+    def solve_maze(self, method: str = "bfs") -> str:
+        """ゴールまでの最短経路を求め直す.
+
+        Args:
+            method (str): 探索の方式("bfs", "bidirectional", "astar").
+
+        Returns:
+            str: ゴールまでの道筋を'N', 'E', 'S', 'W'で表す.
+
+        Raises:
+            ValueError: methodが不明な値の場合.
+        """
+        return solve_walls(
+            self.walls, self.width, self.entry_point, self.exit_point, method
+        )
+
+    def has_pattern(self) -> bool:
+        """42スタンプのセルがすべて4方向とも壁ならTrue."""
+        start = ft_start(self.width, self.height)
+        if start is None:
+            return False
+        start_x, start_y = start
+        return all(
+            self.walls[(start_y + row) * self.width + start_x + col] == 0xF
+            for row in range(5)
+            for col in range(7)
+            if FT_PATTERN[row][col]
+        )
+
+    def is_perfect(self) -> bool:
+        """通れる所の数が木と同じ(セル数 - 1)ならTrue(ループがない).
+
+        4方向とも壁のセル(42スタンプ)はセル数に数えない.
+        """
+        walls = self.walls
+        cells = len(walls) - walls.count(0xF)
+        # 東と南の壁がない所をそれぞれ数える(西と北は隣のセルと同じ壁)
+        opens = (
+            len(walls) - walls.translate(_HAS_E).count(1)
+            + len(walls) - walls.translate(_HAS_S).count(1)
+        )
+        return opens == cells - 1
+
+    def to_generator(self) -> MazeGenerator:
+        """描画や探索ができる、生成済みのMazeGeneratorにする.
+
+        完全迷路かどうかと42ロゴの有無は壁から判定する.
+        シード値はファイルにないので0になる.
+
+        Returns:
+            MazeGenerator: generate()した後と同じグリッドを持つ迷路.
+
+        Raises:
+            ValueError: 入口や出口が無効な場合.
+        """
+        width = self.width
+        rows = (
+            self.walls[start:start + width]
+            for start in range(0, len(self.walls), width)
+        )
+        return MazeGenerator.from_wall_rows(
+            width, self.height, self.entry_point, self.exit_point, rows,
+            perfect=self.is_perfect(), seed=0, pattern=self.has_pattern()
+        )
+
+
+def _parse_point(line: bytes, name: str) -> tuple[int, int]:
+    """x,y の形式の行を座標にする.
+
+    Raises:
+        ValueError: 座標の形式でない場合.
+    """
+    try:
+        x, y = line.split(b",")
+        return int(x), int(y)
+    except ValueError:
+        raise ValueError(f"Invalid {name} line: {line!r}") from None
+
+
+def _parse_tail(
+    tail: list[bytes]
+) -> tuple[tuple[int, int], tuple[int, int], str]:
+    """空行、入口、出口、経路の4行を読む.
+
+    Raises:
+        ValueError: 形式が異なる場合.
+    """
+    blank, entry, exit_, path = tail
+    if blank:
+        raise ValueError("Missing the blank line after the maze rows")
+    if path.strip(b"NESW"):
+        raise ValueError("The path must consist of 'N', 'E', 'S' and 'W'")
+    return (
+        _parse_point(entry, "entry"), _parse_point(exit_, "exit"),
+        path.decode("ascii")
+    )
+
+
+def _decode_row(line: bytes, width: int, y: int) -> bytes:
+    """16進数の1行をまとめて1セル1バイトの壁にする.
+
+    Raises:
+        ValueError: 長さが違う、または16進数でない文字がある場合.
+    """
+    if len(line) != width:
+        raise ValueError(f"Row {y} has {len(line)} cells, expected {width}")
+    cells = line.translate(_HEX_VALUES)
+    if 0xFF in cells:
+        raise ValueError(f"Row {y} has a character that is not hexadecimal")
+    return cells
+
+
+def _check_row(cells: bytes, above: bytes | None, last: bool, y: int) -> None:
+    """行の壁が外壁で閉じていて、隣のセルと食い違っていないか確かめる.
+
+    Args:
+        cells (bytes): y行目の壁.
+        above (bytes | None): 1つ上の行の壁. 一番上の行ならNone.
+        last (bool): 一番下の行かどうか.
+        y (int): 行番号(エラーの表示用).
+
+    Raises:
+        ValueError: 壁が食い違っている、または外壁がない場合.
+    """
+    north = cells.translate(_HAS_N)
+    if above is None:
+        if 0 in north:
+            raise ValueError("The top of the maze is not closed")
+    elif above.translate(_HAS_S) != north:
+        raise ValueError(f"Rows {y - 1} and {y} do not agree on walls")
+    if last and 0 in cells.translate(_HAS_S):
+        raise ValueError("The bottom of the maze is not closed")
+    if not cells[0] & WALL_W or not cells[-1] & WALL_E:
+        raise ValueError(f"Row {y} is not closed on the sides")
+    if cells[:-1].translate(_HAS_E) != cells[1:].translate(_HAS_W):
+        raise ValueError(f"Row {y} does not agree on walls")
+
+
+def _walk_path(
+    path: str,
+    entry_point: tuple[int, int],
+    exit_point: tuple[int, int],
+    width: int,
+    height: int
+) -> Iterator[tuple[int, int, int, int]]:
+    """経路を入口からたどり、1歩ごとに(添字, 通る壁のビット, x, y)を返す.
+
+    経路が空(出口に到達できない迷路)なら何も返さない.
+
+    Raises:
+        ValueError: 経路が迷路の外に出る、または出口で終わらない場合.
+    """
+    if not path:
+        return
+    x, y = entry_point
+    for step in path:
+        bit, dx, dy = _STEPS[step]
+        yield y * width + x, bit, x, y
+        x += dx
+        y += dy
+        if not (0 <= x < width and 0 <= y < height):
+            raise ValueError(f"The path leaves the maze at ({x}, {y})")
+    if (x, y) != exit_point:
+        raise ValueError(f"The path ends at ({x}, {y}), not at the exit")
+
+
+def parse_maze_text(data: bytes) -> MazeText:
+    """出力ファイルの内容を読む.
+
+    全行をつなげて1回の変換で壁にし、外壁と隣り合うセルの壁の食い違いを
+    行ごとにまとめて確かめる.
+
+    Args:
+        data (bytes): 出力ファイルの内容.
+
+    Returns:
+        MazeText: 読み込んだ迷路.
+
+    Raises:
+        ValueError: 形式が異なる、または壁が食い違っている場合.
+    """
+    lines = data.split(b"\n")
+    if len(lines) < 5:
+        raise ValueError("The maze file is too short")
+    entry_point, exit_point, path = _parse_tail(lines[-4:])
+    rows = lines[:-4]
+    width = len(rows[0])
+    height = len(rows)
+    if width == 0:
+        raise ValueError("The maze has no cells")
+    validate_points(width, height, entry_point, exit_point)
+    walls = b"".join(rows).translate(_HEX_VALUES)
+    if len(walls) != width * height or 0xFF in walls:
+        # どの行が違うかを探してエラーにする
+        for y, line in enumerate(rows):
+            _decode_row(line, width, y)
+    _check_walls(walls, width, height)
+    return MazeText(width, height, entry_point, exit_point, path, walls)
+
+
+def _check_walls(walls: bytes, width: int, height: int) -> None:
+    """全ての行を_check_rowで確かめる.
+
+    Raises:
+        ValueError: 壁が食い違っている、または外壁がない場合.
+    """
+    above = None
+    for y in range(height):
+        cells = walls[y * width:(y + 1) * width]
+        _check_row(cells, above, y == height - 1, y)
+        above = cells
+
+
+def read_maze_text(file_path: str) -> MazeText:
+    """出力ファイルを1行ずつ読み込む(形式はparse_maze_textと同じ).
+
+    ファイル全体は持たずに行を1行ずつ壁に変換するので、メモリは
+    ほぼ壁(1セル1バイト)の分だけで済む. 拡張子が.gz, .xz, .lzmaなら
+    展開しながら読む(mazegen.export.open_maze_file).
+
+    Raises:
+        ValueError: 形式が異なる、または壁が食い違っている場合.
+    """
+    with open_maze_file(file_path) as f:
+        rows: list[bytes] = []
+        width = -1
+        line = f.readline()
+        # 空行までが迷路の行
+        while line.endswith(b"\n") and line != b"\n":
+            if width < 0:
+                width = len(line) - 1
+            rows.append(_decode_row(line[:-1], width, len(rows)))
+            line = f.readline()
+        if line != b"\n":
+            raise ValueError("The maze file is too short")
+        if not rows:
+            raise ValueError("The maze has no cells")
+        entry = f.readline()
+        exit_ = f.readline()
+        path = f.read()
+    if not entry.endswith(b"\n") or not exit_.endswith(b"\n"):
+        raise ValueError("The maze file is too short")
+    if b"\n" in path:
+        raise ValueError("Unexpected lines after the path")
+    entry_point, exit_point, path_str = _parse_tail(
+        [b"", entry[:-1], exit_[:-1], path]
+    )
+    height = len(rows)
+    validate_points(width, height, entry_point, exit_point)
+    walls = b"".join(rows)
+    # 行のリストは壁と同じ大きさなので、確かめる前に捨てる
+    del rows
+    _check_walls(walls, width, height)
+    return MazeText(width, height, entry_point, exit_point, path_str, walls)
+
+
+def _scan_tail(f: BinaryIO) -> tuple[list[bytes], int]:
+    """ファイルを先頭から1行ずつ読み、空行、入口、出口、経路の4行を返す.
+
+    後ろからのシークが遅い(先頭から展開し直す)圧縮したファイルに使う.
+    戻り値は_read_tailと同じ.
+
+    Raises:
+        ValueError: 4行が見つからない場合.
+    """
+    last: deque[bytes] = deque(maxlen=5)
+    end = 0
+    count = 0
+    for line in f:
+        last.append(line)
+        end += len(line)
+        count += 1
+    # 改行で終わるファイル(経路が空)は、最後に空の経路の行がある
+    if not last or last[-1].endswith(b"\n"):
+        last.append(b"")
+        count += 1
+    if count < 5:
+        raise ValueError("The maze file is too short")
+    tail = [line.removesuffix(b"\n") for line in list(last)[-4:]]
+    return tail, end - len(b"\n".join(tail))
+
+
+def _read_tail(f: BinaryIO) -> tuple[list[bytes], int]:
+    """ファイルの末尾から空行、入口、出口、経路の4行を読む.
+
+    Returns:
+        tuple[list[bytes], int]: 4行と、迷路の行の終わりの位置.
+
+    Raises:
+        ValueError: 4行が見つからない場合.
+    """
+    end = f.seek(0, 2)
+    position = end
+    data = b""
+    # 迷路の最後の行の改行を含めて改行が4つ見つかるまで後ろから読む
+    while data.count(b"\n") < 4 and position > 0:
+        size = min(_CHUNK, position)
+        position -= size
+        f.seek(position)
+        data = f.read(size) + data
+    lines = data.split(b"\n")
+    if len(lines) < 5:
+        raise ValueError("The maze file is too short")
+    tail = lines[-4:]
+    return tail, end - len(b"\n".join(tail))
+
+
+@dataclass
+class PathCheck:
+    """verify_maze_textで確かめた出力ファイル.
+
+    Attributes:
+        width (int): 迷路の幅.
+        height (int): 迷路の高さ.
+        entry_point (tuple[int, int]): 迷路のスタート座標.
+        exit_point (tuple[int, int]): 迷路のゴール座標.
+        path_length (int): 経路の歩数.
+    """
+
+    width: int
+    height: int
+    entry_point: tuple[int, int]
+    exit_point: tuple[int, int]
+    path_length: int
+
+
+def verify_maze_text(file_path: str) -> PathCheck:
+    """迷路全体を保持せずに、保存された経路が壁を通らないか確かめる.
+
+    先にファイルの末尾から経路を読み、経路が通る壁を(行, 列)の順に並べておく.
+    それから行を1行ずつ読んで変換し、その行で通る壁だけを確かめる.
+    メモリは迷路の幅と経路の長さに比例し、高さには依存しない.
+
+    圧縮したファイル(.gz, .xz, .lzma)も展開しながら同じように読む
+    (後ろから読めないので、経路は先頭から1行ずつ読んで探す).
+
+    Args:
+        file_path (str): 出力ファイルのパス.
+
+    Returns:
+        PathCheck: 迷路の大きさ、入口、出口、経路の歩数.
+
+    Raises:
+        ValueError: 形式が異なる、壁が食い違っている、
+            または経路が入口から出口まで壁を通らずに進まない場合.
+    """
+    compressed = compression_for(file_path) is not None
+    with open_maze_file(file_path) as f:
+        tail, rows_end = _scan_tail(f) if compressed else _read_tail(f)
+        entry_point, exit_point, path = _parse_tail(tail)
+        f.seek(0)
+        width = len(f.readline()) - 1
+        if width <= 0:
+            raise ValueError("The maze has no cells")
+        height, extra = divmod(rows_end, width + 1)
+        if extra:
+            raise ValueError("The maze rows are not all the same length")
+        validate_points(width, height, entry_point, exit_point)
+
+        # 経路が通る壁を 添字 * 16 + 壁のビット にして行順に並べる
+        checks = sorted(
+            index << 4 | bit
+            for index, bit, _, _ in _walk_path(
+                path, entry_point, exit_point, width, height
+            )
+        )
+
+        f.seek(0)
+        above = None
+        pending = iter(checks)
+        check = next(pending, -1)
+        for y in range(height):
+            line = f.readline()
+            cells = _decode_row(line[:-1], width, y)
+            _check_row(cells, above, y == height - 1, y)
+            row_end = (y + 1) * width << 4
+            while 0 <= check < row_end:
+                x = (check >> 4) - y * width
+                if cells[x] & check & 0xF:
+                    raise ValueError(f"The path crosses a wall at ({x}, {y})")
+                check = next(pending, -1)
+            above = cells
+    return PathCheck(width, height, entry_point, exit_point, len(path))
@@ -0,0 +1,264 @@
+"""4ビットの壁情報で迷路を保持するモジュール.
+
+1セルの壁を N=1, E=2, S=4, W=8 の4ビット(出力ファイルの16進数1桁と同じ)で表し、
+1バイトに横2セルずつ(左のセルが上位4ビット)詰めて格納する.
+2倍の座標のグリッド(MazeGenerator)と比べてメモリは約1/8になり、
+16進数の出力はバイト列をそのまま16進数にするだけで済む.
+"""
+from typing import TYPE_CHECKING
+
+from .algorithms import (
+    DEFAULT_ALGORITHM,
+    DEFAULT_LOOP_DENSITY,
+    iter_algorithm_rows,
+    validate_algorithm,
+)
+from .generator import new_rng, validate_points
+from .knock import KNOCK_ENGINES
+from .mazefile import MazeHeader, write_maze_file
+from .rows import pack_row, unpack_cells
+from .solver import solve_walls
+
+# 解析のモジュールは使う時に読み込む(MazeGeneratorと同じ)
+if TYPE_CHECKING:
+    from .analytics import MazeAnalytics
+    from .distance import DistanceField
+    from .tree import MazeTree
+
+
+class PackedMaze:
+    """4ビットの壁情報で迷路を生成・探索・出力するクラス.
+
+    MazeGeneratorと同じアルゴリズムで、2倍の座標のグリッドを作らずに
+    壁のビットを直接組み立てる. 同じ設定・シード値ならget_hex_grid()と
+    solve_maze()の結果はMazeGeneratorと同一になる.
+
+    Attributes:
+        _width (int):迷路の幅.
+        _height (int):迷路の高さ.
+        _entry_point (tuple[int, int]):迷路のスタート座標.
+        _exit_point (tuple[int, int]):迷路のゴール座標.
+        _perfect (bool):完全迷路か不完全迷路を切り替えるための値.
+        _seed (int):迷路をランダムに生成するための値.
+        _pattern (bool):42ロゴの生成を切り替えるための値.
+        _engine (str):棒倒しのエンジン("auto", "scalar", "batch").
+        _algorithm (str):迷路生成のアルゴリズム(mazegen.algorithms).
+        _loop_density (float):不完全迷路でループを作る確率.
+        _row_bytes (int):1行分のバイト数.
+        _cells (bytearray):2セルを1バイトに詰めた壁情報.
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        entry_point: tuple[int, int],
+        exit_point: tuple[int, int],
+        perfect: bool,
+        seed: int,
+        pattern: bool,
+        engine: str = "auto",
+        algorithm: str = DEFAULT_ALGORITHM,
+        loop_density: float = DEFAULT_LOOP_DENSITY,
+    ) -> None:
+        """PackedMazeを初期化する.
+
+        Args:
+            width (int):迷路の幅.
+            height (int):迷路の高さ.
+            entry_point (tuple[int, int]):迷路のスタート座標.
+            exit_point (tuple[int, int]):迷路のゴール座標.
+            perfect (bool):完全迷路か不完全迷路を切り替えるための値.
+            seed (int):迷路をランダムに生成するための値.
+            pattern (bool): 42ロゴの生成を切り替えるための値.
+            engine (str): 棒倒しのエンジン(MazeGeneratorと同じ).
+            algorithm (str): 迷路生成のアルゴリズム(MazeGeneratorと同じ).
+            loop_density (float): 不完全迷路でループを作る確率
+                (MazeGeneratorと同じ).
+
+        Raises:
+            ValueError: engine, algorithm, loop_densityが不明・無効な値の場合.
+        """
+        if engine not in KNOCK_ENGINES:
+            raise ValueError(f"Unknown knock engine: '{engine}'")
+        validate_algorithm(algorithm, loop_density)
+        self._width = width
+        self._height = height
+        self._entry_point = entry_point
+        self._exit_point = exit_point
+        self._perfect = perfect
+        self._seed = seed
+        self._pattern = pattern
+        self._engine = engine
+        self._algorithm = algorithm
+        self._loop_density = loop_density
+        self._row_bytes = (width + 1) // 2
+        # 壁情報はgenerate()で確保する
+        self._cells = bytearray()
+
+    def generate(self) -> None:
+        """迷路を生成する."""
+        validate_points(
+            self._width, self._height, self._entry_point, self._exit_point
+        )
+        # シード値(再現性の確保)、迷路ごとに別の乱数生成器を使う
+        rng = new_rng(self._seed)
+        rows = iter_algorithm_rows(
+            self._algorithm, self._width, self._height, self._perfect,
+            self._pattern, rng, self._engine, self._loop_density
+        )
+        # 左のセルを上位4ビット、右のセルを下位4ビットに詰める
+        self._cells = bytearray().join([pack_row(row) for row in rows])
+
+    def get_cell(self, x: int, y: int) -> int:
+        """セル(x, y)の壁(N=1, E=2, S=4, W=8)を返す."""
+        byte = self._cells[y * self._row_bytes + (x >> 1)]
+        return byte & 0xF if x & 1 else byte >> 4
+
+    def get_buffer(self) -> memoryview:
+        """壁情報のバイト列をコピーせずに返す.
+
+        縦(height) * 横((width + 1) // 2)の2次元memoryviewで、
+        1バイトに横2セル(左のセルが上位4ビット)が入っている.
+        """
+        return memoryview(self._cells).cast(
+            "B", (self._height, self._row_bytes)
+        )
+
+    def get_hex_grid(self) -> list[str]:
+        """迷路を16進数に変換する.
+
+        1バイトが16進数2桁になるので、バイト列をまとめて変換して行ごとに切り出す.
+        """
+        hex_str = self._cells.hex().upper()
+        step = self._row_bytes * 2
+        return [
+            hex_str[start:start + self._width]
+            for start in range(0, len(hex_str), step)
+        ]
+
+    def _walls(self) -> bytearray:
+        """2セルを詰めたバイトを上位と下位の4ビットに分けて1セル1バイトにする.
+
+        1行は_row_bytes * 2バイトになり、奇数幅の行末の余りは
+        隣のセルの東の壁で塞がれているので探索には入らない.
+        """
+        return unpack_cells(self._cells)
+
+    def solve_maze(self, method: str = "bfs") -> str:
+        """ゴールまでの最短経路を求める.
+
+        Args:
+            method (str): 探索の方式("bfs", "bidirectional", "astar").
+
+        Returns:
+            str: ゴールまでの道筋を'N', 'E', 'S', 'W'で表す.
+
+        Raises:
+            ValueError: methodが不明な値の場合.
+        """
+        return solve_walls(
+            self._walls(), self._row_bytes * 2,
+            self._entry_point, self._exit_point, method
+        )
+
+    def analyze(
+        self, method: str = "auto", path_str: str | None = None
+    ) -> "MazeAnalytics":
+        """迷路の難しさの指標を求める(MazeGenerator.analyzeと同じ).
+
+        Args:
+            method (str): 数え方("auto", "scalar", "vectorized").
+            path_str (str | None): solve_maze()の結果. Noneなら求める.
+
+        Returns:
+            MazeAnalytics: 迷路の指標.
+
+        Raises:
+            ValueError: methodが不明な値の場合.
+        """
+        from .analytics import analyze_walls
+
+        walls = self._walls()
+        stride = self._row_bytes * 2
+        if path_str is None:
+            path_str = solve_walls(
+                walls, stride, self._entry_point, self._exit_point
+            )
+        if stride != self._width:
+            # 奇数幅の行末の余りを除いてすき間なく並べる
+            walls = bytearray().join([
+                walls[start:start + self._width]
+                for start in range(0, len(walls), stride)
+            ])
+        return analyze_walls(
+            bytes(walls), self._width, self._height, len(path_str), method
+        )
+
+    def build_tree(self, root: tuple[int, int] | None = None) -> "MazeTree":
+        """完全迷路の木の索引を作る(MazeGenerator.build_treeと同じ).
+
+        Args:
+            root (tuple[int, int] | None): 木の根にするセル座標.
+                Noneなら入口.
+
+        Returns:
+            MazeTree: 迷路の木の索引.
+
+        Raises:
+            ValueError: 迷路にループがある(完全迷路でない)場合.
+        """
+        from .tree import MazeTree
+
+        return MazeTree(
+            self._walls(), self._row_bytes * 2, self._width, self._height,
+            self._entry_point if root is None else root
+        )
+
+    def distance_field(
+        self, source: tuple[int, int] | None = None
+    ) -> "DistanceField":
+        """1つのセルから全セルへの距離場を作る(MazeGenerator.distance_fieldと同じ).
+
+        Args:
+            source (tuple[int, int] | None): 出発するセル座標.
+                Noneなら入口.
+
+        Returns:
+            DistanceField: 距離場.
+
+        Raises:
+            ValueError: sourceが迷路の外の場合.
+        """
+        from .distance import DistanceField
+
+        return DistanceField(
+            self._walls(), self._row_bytes * 2, self._width, self._height,
+            self._entry_point if source is None else source
+        )
+
+    def save_binary(self, file_path: str, path_str: str = "") -> int:
+        """迷路をバイナリ形式(mazegen.mazefile)で保存する.
+
+        壁情報はファイルのセルと同じ形式なので、行をそのまま書き込む.
+
+        Args:
+            file_path (str): 保存するファイルパス.
+            path_str (str): 一緒に保存する経路. 空なら経路なし.
+
+        Returns:
+            int: 書き込んだバイト数.
+
+        Raises:
+            ValueError: 経路に不正な文字がある場合.
+        """
+        header = MazeHeader(
+            self._width, self._height, self._entry_point, self._exit_point,
+            self._seed, self._perfect, self._pattern
+        )
+        step = self._row_bytes
+        rows = (
+            bytes(self._cells[start:start + step])
+            for start in range(0, len(self._cells), step)
+        )
+        return write_maze_file(file_path, header, rows, path_str)
@@ -0,0 +1,363 @@
+"""迷路の生成の過程を記録し、再生・書き出しするモジュール.
+
+MazeGenerator.generate(recorder=...)に渡すと、グリッドのセルが変わるたびに
+(位置, 新しい値)を1件のイベントとして記録する.
+    indices: 変わったセルのグリッドの添字(y * 横の配列の長さ + x)のarray("I").
+    values: 新しいセルの値(Cell)のbytearray.
+    ends: ステップごとの、そのステップまでのイベント数のarray("I").
+イベント1件は5バイトなので、グリッドをフレームごとに持つより小さい.
+
+ステップは棒倒し法なら棒を1本倒すごと(柱と棒の2件)、他のアルゴリズムと
+一括抽選エンジンなら1行ごと、外壁と42スタンプはそれぞれ1ステップになる.
+記録した後は、生成し直さずに任意のステップから(grid_at, frames)、
+任意の速さで再生でき(replay)、asciicast(v2)に書き出せる(to_asciicast).
+asciicastはasciinema playや、aggなどで動画にできる.
+"""
+import io
+import json
+import sys
+from array import array
+from collections.abc import Callable, Iterator
+from time import monotonic, sleep
+
+from .export import atomic_open
+from .render import DiffRenderer
+
+
+class GenerationRecorder:
+    """迷路の生成中に変わったセルをステップごとに記録するクラス.
+
+    1つの記録は1回の生成分で、generate()に渡すたびに最初から記録し直す.
+
+    Attributes:
+        _w_grid (int): 横の配列の長さ.
+        _h_grid (int): 縦の配列の長さ.
+        _indices (array): 変わったセルの添字.
+        _values (bytearray): 新しいセルの値.
+        _ends (array): ステップごとの、そのステップまでのイベント数.
+        _shadow (bytearray): 記録したイベントを全て反映したグリッド
+            (変わっていないセルを記録しないために使う).
+    """
+
+    def __init__(self) -> None:
+        """空のGenerationRecorderを作る."""
+        self._w_grid = 0
+        self._h_grid = 0
+        self._indices: array[int] = array("I")
+        self._values = bytearray()
+        self._ends: array[int] = array("I")
+        self._shadow = bytearray()
+
+    def start(self, w_grid: int, h_grid: int) -> None:
+        """記録を消し、全てROADのグリッドから記録を始める.
+
+        Args:
+            w_grid (int): 横の配列の長さ.
+            h_grid (int): 縦の配列の長さ.
+        """
+        self._w_grid = w_grid
+        self._h_grid = h_grid
+        self._indices = array("I")
+        self._values = bytearray()
+        self._ends = array("I")
+        self._shadow = bytearray(w_grid * h_grid)
+
+    def set(self, index: int, value: int) -> None:
+        """グリッドのindex番目のセルがvalueになったことを記録する.
+
+        値が変わっていなければ記録しない.
+        """
+        if self._shadow[index] != value:
+            self._shadow[index] = value
+            self._indices.append(index)
+            self._values.append(value)
+
+    def capture(
+        self, grid: bytes | bytearray, start: int = 0, stop: int | None = None
+    ) -> None:
+        """グリッドのstart~stopの範囲で、前に記録した時から変わったセルを記録する.
+
+        まとめて書き換える処理(外壁、42スタンプ、行ごとの生成)に使う.
+
+        Args:
+            grid (bytes | bytearray): 迷路のグリッド.
+            start (int): 範囲の先頭の添字.
+            stop (int | None): 範囲の末尾の次の添字. Noneならグリッドの最後.
+        """
+        if stop is None:
+            stop = len(grid)
+        shadow = self._shadow
+        if grid[start:stop] == shadow[start:stop]:
+            return
+        indices = self._indices
+        values = self._values
+        for index in range(start, stop):
+            value = grid[index]
+            if shadow[index] != value:
+                shadow[index] = value
+                indices.append(index)
+                values.append(value)
+
+    def step(self) -> None:
+        """ここまでのイベントを1ステップにまとめる(イベントがなければ何もしない)."""
+        count = len(self._values)
+        if count and (not self._ends or self._ends[-1] != count):
+            self._ends.append(count)
+
+    @property
+    def w_grid(self) -> int:
+        """横の配列の長さ."""
+        return self._w_grid
+
+    @property
+    def h_grid(self) -> int:
+        """縦の配列の長さ."""
+        return self._h_grid
+
+    @property
+    def steps(self) -> int:
+        """記録したステップの数."""
+        return len(self._ends)
+
+    def __len__(self) -> int:
+        """記録したイベントの数."""
+        return len(self._values)
+
+    @property
+    def nbytes(self) -> int:
+        """記録に使っているバイト数(グリッドの写しを除く)."""
+        return (
+            len(self._indices) * self._indices.itemsize + len(self._values)
+            + len(self._ends) * self._ends.itemsize
+        )
+
+    def _check_step(self, step: int) -> None:
+        """ステップ番号が0~stepsの範囲か確かめる.
+
+        Raises:
+            ValueError: 範囲外の場合.
+        """
+        if not 0 <= step <= len(self._ends):
+            raise ValueError(
+                f"Step {step} is out of range (0-{len(self._ends)})"
+            )
+
+    def events(
+        self, start: int = 0, stop: int | None = None
+    ) -> Iterator[tuple[int, int, int]]:
+        """start番目のステップの後からstop番目のステップまでのイベントを順に返す.
+
+        Args:
+            start (int): 最初のステップ(0なら生成前から).
+            stop (int | None): 最後のステップ. Noneなら最後まで.
+
+        Yields:
+            tuple[int, int, int]: グリッドの座標(x, y)と新しいセルの値.
+
+        Raises:
+            ValueError: start, stopが範囲外の場合.
+        """
+        stop = len(self._ends) if stop is None else stop
+        self._check_step(start)
+        self._check_step(stop)
+        first = self._ends[start - 1] if start else 0
+        last = self._ends[stop - 1] if stop > start else first
+        w_grid = self._w_grid
+        for index, value in zip(
+            self._indices[first:last], self._values[first:last]
+        ):
+            y, x = divmod(index, w_grid)
+            yield x, y, value
+
+    def grid_at(self, step: int) -> bytearray:
+        """step番目のステップまで進めたグリッドを返す(0なら生成前).
+
+        Args:
+            step (int): ステップ番号(0~steps).
+
+        Returns:
+            bytearray: MazeGenerator._gridと同じ形式のグリッド.
+
+        Raises:
+            ValueError: stepが範囲外の場合.
+        """
+        self._check_step(step)
+        grid = bytearray(self._w_grid * self._h_grid)
+        count = self._ends[step - 1] if step else 0
+        for index, value in zip(
+            self._indices[:count], self._values[:count]
+        ):
+            grid[index] = value
+        return grid
+
+    def frames(
+        self, start: int = 0, stop: int | None = None
+    ) -> Iterator[tuple[int, bytearray]]:
+        """start番目のステップから1ステップずつ進めたグリッドを返す.
+
+        最初にstart番目のグリッドを返し、以降は同じbytearrayを
+        書き換えて返す(残す時は呼び出し側で写す).
+
+        Args:
+            start (int): 最初のステップ.
+            stop (int | None): 最後のステップ. Noneなら最後まで.
+
+        Yields:
+            tuple[int, bytearray]: ステップ番号と、その時点のグリッド.
+
+        Raises:
+            ValueError: start, stopが範囲外の場合.
+        """
+        stop = len(self._ends) if stop is None else stop
+        self._check_step(stop)
+        grid = self.grid_at(start)
+        yield start, grid
+        indices = self._indices
+        values = self._values
+        ends = self._ends
+        position = ends[start - 1] if start else 0
+        for step in range(start, stop):
+            end = ends[step]
+            for event in range(position, end):
+                grid[indices[event]] = values[event]
+            position = end
+            yield step + 1, grid
+
+    def replay(
+        self,
+        speed: float = 1.0,
+        start: int = 0,
+        stop: int | None = None,
+        fps: float = 30.0,
+        step_time: float = 0.05,
+        color_id: int = 0,
+        wait: Callable[[float], object] = sleep
+    ) -> None:
+        """記録した生成をターミナルに再生する.
+
+        生成し直さないので、速さと開始位置は自由に変えられる.
+
+        Args:
+            speed (float): 再生の速さ(1.0で1ステップstep_time秒).
+            start (int): 再生を始めるステップ.
+            stop (int | None): 再生を終えるステップ. Noneなら最後まで.
+            fps (float): 1秒あたりの最大描画回数.
+            step_time (float): 速さ1.0での1ステップの時間(秒).
+            color_id (int): 迷路のカラープリセットを選ぶ値.
+            wait (Callable[[float], object]): 秒数を受け取って待つ関数.
+
+        Raises:
+            ValueError: speed, fpsが正の値でない、start, stopが範囲外の場合.
+        """
+        begin = monotonic()
+        for seconds, text in self.iter_output(
+            speed, start, stop, fps, step_time, color_id
+        ):
+            delay = begin + seconds - monotonic()
+            if delay > 0:
+                wait(delay)
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+    def iter_output(
+        self,
+        speed: float = 1.0,
+        start: int = 0,
+        stop: int | None = None,
+        fps: float = 30.0,
+        step_time: float = 0.05,
+        color_id: int = 0
+    ) -> Iterator[tuple[float, str]]:
+        """replay()が描画する文字列を、待たずに再生開始からの時刻と一緒に返す.
+
+        引数はreplay()と同じ.
+
+        Yields:
+            tuple[float, str]: 再生開始からの秒と、その時に描画する文字列.
+
+        Raises:
+            ValueError: speed, fpsが正の値でない、start, stopが範囲外の場合.
+        """
+        if speed <= 0:
+            raise ValueError("speed must be a positive value")
+        if fps <= 0:
+            raise ValueError("fps must be a positive value")
+        seconds_per_step = step_time / speed
+        frame_time = 1.0 / fps
+        output = io.StringIO()
+        renderer = DiffRenderer(
+            self._w_grid, self._h_grid, color_id, stream=output
+        )
+        next_frame = 0.0
+        seconds = 0.0
+        grid = bytearray()
+        for step, grid in self.frames(start, stop):
+            seconds = (step - start) * seconds_per_step
+            if step == start:
+                renderer.draw_full(grid)
+            elif seconds >= next_frame:
+                renderer.draw_diff(grid)
+            else:
+                continue
+            next_frame = seconds + frame_time
+            text = output.getvalue()
+            if text:
+                output.seek(0)
+                output.truncate()
+                yield seconds, text
+        # 間引かれた最後のステップも反映する
+        renderer.draw_diff(grid)
+        text = output.getvalue()
+        if text:
+            yield seconds, text
+
+    def to_asciicast(
+        self,
+        file_path: str,
+        speed: float = 1.0,
+        start: int = 0,
+        stop: int | None = None,
+        fps: float = 30.0,
+        step_time: float = 0.05,
+        color_id: int = 0,
+        title: str | None = None
+    ) -> int:
+        """記録した生成をasciicast(v2)形式で書き出す.
+
+        1行目がヘッダ、以降は1行1フレームの [秒, "o", 出力] のJSON.
+        フレームはiter_output()と同じで、生成し直さず待たずに書き出す.
+
+        Args:
+            file_path (str): 保存するファイルパス(.castなど).
+            speed (float): 再生の速さ(1.0で1ステップstep_time秒).
+            start (int): 書き出しを始めるステップ.
+            stop (int | None): 書き出しを終えるステップ. Noneなら最後まで.
+            fps (float): 1秒あたりの最大フレーム数.
+            step_time (float): 速さ1.0での1ステップの時間(秒).
+            color_id (int): 迷路のカラープリセットを選ぶ値.
+            title (str | None): 再生する時に表示する題名.
+
+        Returns:
+            int: 書き込んだバイト数.
+
+        Raises:
+            ValueError: speed, fpsが正の値でない、start, stopが範囲外の場合.
+            OSError: 書き込めなかった場合(出力先は変わらない).
+        """
+        header: dict[str, object] = {
+            "version": 2,
+            # セル1つは全角1マス(半角2文字)、迷路の下に1行空ける
+            "width": self._w_grid * 2,
+            "height": self._h_grid + 2,
+            "env": {"TERM": "xterm-256color"},
+        }
+        if title is not None:
+            header["title"] = title
+        frames = self.iter_output(speed, start, stop, fps, step_time, color_id)
+        written = 0
+        with atomic_open(file_path) as f:
+            written += f.write((json.dumps(header) + "\n").encode("utf-8"))
+            for seconds, text in frames:
+                line = json.dumps([round(seconds, 6), "o", text]) + "\n"
+                written += f.write(line.encode("utf-8"))
+        return written
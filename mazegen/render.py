@@ -0,0 +1,259 @@
+"""ターミナルに迷路を描画するモジュール."""
+import sys
+from collections.abc import Callable
+from typing import TextIO
+from time import monotonic, sleep
+
+from .constants import COLOR_SCHEMES, Cell
+
+
+def cell_strings(color_id: int = 0, show_path: bool = False) -> list[str]:
+    """セルの値 -> 描画文字列(全角1マス分)の対応表を作る.
+
+    Args:
+        color_id (int): 迷路のカラープリセットを選ぶ値.
+        show_path (bool): ゴールまでの経路を表示するか.
+
+    Returns:
+        list[str]: セルの値を添字とする描画文字列のリスト.
+    """
+    colors = COLOR_SCHEMES.get(color_id, COLOR_SCHEMES[0])
+    reset = colors["reset"]
+    strings = [""] * len(Cell)
+    strings[Cell.ROAD.value] = f"{colors['r_color']}  {reset}"
+    strings[Cell.WALL.value] = f"{colors['w_color']}  {reset}"
+    strings[Cell.ENTRY.value] = f"{colors['s_color']}S {reset}"
+    strings[Cell.EXIT.value] = f"{colors['g_color']}G {reset}"
+    strings[Cell.FOURTY_TWO.value] = f"{colors['ft_color']}  {reset}"
+    # ROUTEは経路表示時のみ黄色、それ以外はROADと同じ
+    strings[Cell.ROUTE.value] = (
+        f"{colors['y_color']}  {reset}" if show_path
+        else strings[Cell.ROAD.value]
+    )
+    return strings
+
+
+class DiffRenderer:
+    """前回描画したフレームを保持し、変わったセルだけを書き換える描画クラス.
+
+    フレームは画面の左上から描画する前提で、変わったセルへは
+    カーソル移動(ESC[行;列H)で直接書き込む. 1フレーム分の出力は
+    まとめて1回のwriteで書き出す(出力先は既定でsys.stdout).
+    表示範囲(ビューポート)を迷路の一部に絞ると、その範囲だけを描画するので
+    1フレームの処理量は迷路の大きさではなく表示範囲の大きさで決まる.
+
+    Attributes:
+        _w_grid (int): 横の配列の長さ.
+        _h_grid (int): 縦の配列の長さ.
+        _x0 (int): 表示範囲の左端(配列の座標).
+        _y0 (int): 表示範囲の上端(配列の座標).
+        _cols (int): 表示範囲の横の長さ.
+        _rows (int): 表示範囲の縦の長さ.
+        _strings (list[str]): セルの値 -> 描画文字列.
+        _style (tuple[int, bool]): 現在の(color_id, show_path).
+        _frame (bytearray | None): 画面に出ているフレーム(未描画ならNone).
+        _stream (TextIO | None): 出力先(Noneなら書き込む時のsys.stdout).
+    """
+
+    def __init__(
+        self,
+        w_grid: int,
+        h_grid: int,
+        color_id: int = 0,
+        show_path: bool = False,
+        stream: TextIO | None = None
+    ) -> None:
+        """DiffRendererを初期化する.
+
+        Args:
+            w_grid (int): 横の配列の長さ.
+            h_grid (int): 縦の配列の長さ.
+            color_id (int): 迷路のカラープリセットを選ぶ値.
+            show_path (bool): ゴールまでの経路を表示するか.
+            stream (TextIO | None): 描画の出力先. Noneならsys.stdout.
+        """
+        self._w_grid = w_grid
+        self._h_grid = h_grid
+        # 表示範囲(最初は迷路全体)
+        self._x0 = 0
+        self._y0 = 0
+        self._cols = w_grid
+        self._rows = h_grid
+        self._style = (color_id, show_path)
+        self._strings = cell_strings(color_id, show_path)
+        self._frame: bytearray | None = None
+        self._stream = stream
+
+    def set_style(self, color_id: int, show_path: bool) -> None:
+        """配色と経路表示を切り替える. 変わった時は次の描画で全体を描き直す."""
+        if (color_id, show_path) != self._style:
+            self._style = (color_id, show_path)
+            self._strings = cell_strings(color_id, show_path)
+            self._frame = None
+
+    @property
+    def view(self) -> tuple[int, int, int, int]:
+        """表示範囲(左端, 上端, 横の長さ, 縦の長さ)を配列の座標で返す."""
+        return self._x0, self._y0, self._cols, self._rows
+
+    def set_view(self, x0: int, y0: int, cols: int, rows: int) -> None:
+        """表示範囲を設定する. 迷路からはみ出す分は内側に収める.
+
+        Args:
+            x0 (int): 表示範囲の左端(配列の座標).
+            y0 (int): 表示範囲の上端(配列の座標).
+            cols (int): 表示範囲の横の長さ.
+            rows (int): 表示範囲の縦の長さ.
+        """
+        cols = max(1, min(cols, self._w_grid))
+        rows = max(1, min(rows, self._h_grid))
+        x0 = max(0, min(x0, self._w_grid - cols))
+        y0 = max(0, min(y0, self._h_grid - rows))
+        if (x0, y0, cols, rows) != self.view:
+            self._x0, self._y0, self._cols, self._rows = x0, y0, cols, rows
+            self._frame = None
+
+    def pan(self, dx: int, dy: int) -> None:
+        """表示範囲を(dx, dy)だけずらす."""
+        self.set_view(self._x0 + dx, self._y0 + dy, self._cols, self._rows)
+
+    def center(self, x: int, y: int) -> None:
+        """配列の座標(x, y)が表示範囲の中心に来るようにずらす."""
+        self.set_view(
+            x - self._cols // 2, y - self._rows // 2, self._cols, self._rows
+        )
+
+    def _window(self, grid: bytes | bytearray) -> bytearray:
+        """グリッドから表示範囲の部分だけを切り出す."""
+        if self.view == (0, 0, self._w_grid, self._h_grid):
+            return bytearray(grid)
+        window = bytearray()
+        for y in range(self._y0, self._y0 + self._rows):
+            start = y * self._w_grid + self._x0
+            window += grid[start:start + self._cols]
+        return window
+
+    def draw_full(self, grid: bytes | bytearray) -> None:
+        """画面を消して表示範囲全体を描画する.
+
+        Args:
+            grid (bytes | bytearray): 迷路のグリッド.
+        """
+        strings = self._strings
+        cols = self._cols
+        window = self._window(grid)
+        lines = ["\x1b[H\x1b[0J"]
+        for y in range(self._rows):
+            row = window[y * cols:(y + 1) * cols]
+            lines.append("".join([strings[cell] for cell in row]) + "\n")
+        lines.append("\n")
+        self._write("".join(lines))
+        self._frame = window
+
+    def draw_diff(self, grid: bytes | bytearray) -> None:
+        """前回のフレームから変わったセルだけを描画する.
+
+        Args:
+            grid (bytes | bytearray): 迷路のグリッド.
+        """
+        frame = self._frame
+        if frame is None:
+            self.draw_full(grid)
+            return
+        strings = self._strings
+        w_grid = self._w_grid
+        cols = self._cols
+        parts = []
+        for y in range(self._rows):
+            start = (self._y0 + y) * w_grid + self._x0
+            new = grid[start:start + cols]
+            old = frame[y * cols:(y + 1) * cols]
+            if new == old:
+                continue
+            # 変わったセルが連続する区間ごとにカーソルを移動して書き込む
+            x = 0
+            while x < cols:
+                if new[x] == old[x]:
+                    x += 1
+                    continue
+                run = x
+                while x < cols and new[x] != old[x]:
+                    x += 1
+                parts.append(f"\x1b[{y + 1};{run * 2 + 1}H")
+                parts.extend([strings[cell] for cell in new[run:x]])
+            frame[y * cols:(y + 1) * cols] = new
+        if not parts:
+            return
+        # カーソルを全体描画した時と同じ迷路の下に戻す
+        parts.append(f"\x1b[{self._rows + 2};1H")
+        self._write("".join(parts))
+
+    def _write(self, text: str) -> None:
+        """描画した文字列を出力先に書き込む."""
+        stream = sys.stdout if self._stream is None else self._stream
+        stream.write(text)
+        stream.flush()
+
+
+class FramePacer:
+    """アニメーションのステップを一定のフレームレートで間引くクラス.
+
+    1ステップをstep_time秒として進め、描画はfps回/秒まで.
+    描画する時だけ実時間が追いつくまで待つので、ステップが多くても
+    描画回数は全体の時間 * fps に収まる.
+
+    Attributes:
+        _step_time (float): 1ステップの時間(秒).
+        _frame_time (float): 1フレームの時間(秒).
+        _start (float): 開始時刻.
+        _steps (int): 進めたステップ数.
+        _next_frame (float): 次に描画する時刻(開始からの秒).
+        _wait (Callable[[float], object]): 待つ関数.
+    """
+
+    def __init__(
+        self,
+        fps: float = 30.0,
+        step_time: float = 0.05,
+        wait: Callable[[float], object] = sleep
+    ) -> None:
+        """FramePacerを初期化する.
+
+        Args:
+            fps (float): 1秒あたりの最大描画回数.
+            step_time (float): 1ステップの時間(秒). 0なら待たずに間引くだけ.
+            wait (Callable[[float], object]): 秒数を受け取って待つ関数.
+                途中で止められる待ち方にする時に差し替える.
+
+        Raises:
+            ValueError: fpsが正の値でない、またはstep_timeが負の場合.
+        """
+        if fps <= 0:
+            raise ValueError("fps must be a positive value")
+        if step_time < 0:
+            raise ValueError("step_time must not be a minus value")
+        self._step_time = step_time
+        self._frame_time = 1.0 / fps
+        self._start = monotonic()
+        self._steps = 0
+        self._next_frame = 0.0
+        self._wait = wait
+
+    def step(self) -> bool:
+        """1ステップ進め、このステップで描画すべきかを返す.
+
+        Returns:
+            bool: 描画するタイミングならTrue.
+        """
+        self._steps += 1
+        if self._step_time:
+            now = self._steps * self._step_time
+        else:
+            now = monotonic() - self._start
+        if now < self._next_frame:
+            return False
+        delay = self._start + now - monotonic()
+        if delay > 0:
+            self._wait(delay)
+        self._next_frame = now + self._frame_time
+        return True
@@ -0,0 +1,214 @@
+"""棒倒し法で迷路を1行ずつ生成するモジュール.
+
+柱の行pの棒倒しは、柱の左と上の壁しか見ないので、
+行pが終わった時点でその上のセルの行p - 1の壁が確定する.
+直前の1行分だけを保持して確定した行から返すので、
+メモリは迷路の幅にのみ比例し、高さには依存しない.
+"""
+from collections.abc import Iterator
+from typing import Protocol
+
+from .constants import (
+    FT_PATTERN,
+    WALL_E,
+    WALL_N,
+    WALL_S,
+    WALL_W,
+    ft_start,
+)
+from .knock import (
+    KNOCK_E,
+    KNOCK_N,
+    KNOCK_S,
+    KNOCK_W,
+    KnockStream,
+    RandomSource,
+    ScalarRandomSource,
+    draw_row,
+    draw_row_scalar,
+    row_groups,
+)
+
+
+class RowRandomSource(RandomSource, ScalarRandomSource, Protocol):
+    """一括抽選と逐次版のどちらにも使える乱数生成器."""
+
+
+def _bit_table(bit: int) -> bytes:
+    """セルの値 -> そのビットの壁があれば1 の変換表を作る."""
+    return bytes(1 if value & bit else 0 for value in range(256))
+
+
+def _kind_table(kind: int) -> bytes:
+    """倒す向き -> その向きなら1 の変換表を作る."""
+    return bytes(1 if value == kind else 0 for value in range(256))
+
+
+_HAS_N = _bit_table(WALL_N)
+_HAS_W = _bit_table(WALL_W)
+_IS_S = _kind_table(KNOCK_S)
+_IS_E = _kind_table(KNOCK_E)
+_IS_N = _kind_table(KNOCK_N)
+# 1バイト -> 上位4ビット(左のセル)、下位4ビット(右のセル)
+_HIGH_NIBBLE = bytes(value >> 4 for value in range(256))
+_LOW_NIBBLE = bytes(value & 0xF for value in range(256))
+
+
+def pack_row(row: bytes) -> bytes:
+    """1セル1バイトの行を、1バイトに横2セル(左のセルが上位4ビット)に詰める.
+
+    幅が奇数なら最後のバイトの下位4ビットは0になる.
+    """
+    row_bytes = (len(row) + 1) // 2
+    high = int.from_bytes(row[0::2], "big")
+    low = int.from_bytes(row[1::2] + bytes(len(row) % 2), "big")
+    return (high << 4 | low).to_bytes(row_bytes, "big")
+
+
+def unpack_cells(packed: bytes | bytearray) -> bytearray:
+    """2セルを詰めたバイト列を1セル1バイトに戻す(pack_rowの逆).
+
+    幅が奇数の行の余りのセル(0)も含むので、長さは常にlen(packed) * 2になる.
+    """
+    cells = bytearray(len(packed) * 2)
+    cells[0::2] = packed.translate(_HIGH_NIBBLE)
+    cells[1::2] = packed.translate(_LOW_NIBBLE)
+    return cells
+
+
+def _stamp_planes(width: int, height: int) -> dict[int, bytes]:
+    """42スタンプで埋まる壁を行ごとのセルの値にする.
+
+    スタンプのセルは4方向とも壁(F)、隣のセルはスタンプ側の壁が立つ.
+
+    Args:
+        width (int): 迷路の幅.
+        height (int): 迷路の高さ.
+
+    Returns:
+        dict[int, bytes]: 行 -> その行の各セルの壁.
+    """
+    start = ft_start(width, height)
+    if start is None:
+        return {}
+    start_x, start_y = start
+    planes: dict[int, bytearray] = {}
+    for row, pattern_row in enumerate(FT_PATTERN):
+        for col, stamped in enumerate(pattern_row):
+            if not stamped:
+                continue
+            cx = start_x + col
+            cy = start_y + row
+            for x, y, bit in (
+                (cx, cy, WALL_N | WALL_E | WALL_S | WALL_W),
+                (cx, cy - 1, WALL_S),
+                (cx + 1, cy, WALL_W),
+                (cx, cy + 1, WALL_N),
+                (cx - 1, cy, WALL_E),
+            ):
+                planes.setdefault(y, bytearray(width))[x] |= bit
+    return {y: bytes(plane) for y, plane in planes.items()}
+
+
+def _finish_row(
+    north: bytes, vert: bytes, south: bytes, stamp: bytes | None
+) -> bytes:
+    """上下の壁とセル同士の間の壁から1行分のセルの値を作る.
+
+    各バイトを桁とする巨大な整数としてビット演算する
+    (各バイトは高々15なので桁あふれしない).
+
+    Args:
+        north (bytes): 各セルの北の壁(1/0).
+        vert (bytes): 隣り合うセル同士の間の壁(1/0、width - 1個).
+        south (bytes): 各セルの南の壁(1/0).
+        stamp (bytes | None): 42スタンプの壁.
+
+    Returns:
+        bytes: 各セルの値.
+    """
+    value = (
+        int.from_bytes(north, "big")
+        | int.from_bytes(vert + b"\x01", "big") << 1
+        | int.from_bytes(south, "big") << 2
+        | int.from_bytes(b"\x01" + vert, "big") << 3
+    )
+    if stamp is not None:
+        value |= int.from_bytes(stamp, "big")
+    return value.to_bytes(len(north), "big")
+
+
+def iter_cell_rows(
+    width: int,
+    height: int,
+    perfect: bool,
+    pattern: bool,
+    engine: str,
+    rng: RowRandomSource
+) -> Iterator[bytes]:
+    """棒倒し法で迷路を作り、確定した行から各セルの値を返す.
+
+    乱数の消費はMazeGenerator.generate()と同じ順番なので、
+    同じシード値なら同じ迷路になる.
+
+    Args:
+        width (int): 迷路の幅.
+        height (int): 迷路の高さ.
+        perfect (bool): 完全迷路にするかどうか.
+        pattern (bool): 42ロゴを埋め込むかどうか.
+        engine (str): 棒倒しのエンジン("auto", "scalar", "batch").
+        rng (RowRandomSource): 乱数生成器(シード値は呼び出し側で設定する).
+
+    Yields:
+        bytes: 上の行から順に、各セルの壁(0~15)を1セル1バイトで並べた列.
+    """
+    start = ft_start(width, height) if pattern else None
+    ft_box = None
+    stamp: dict[int, bytes] = {}
+    if start is not None:
+        start_x, start_y = start
+        ft_box = (
+            start_x * 2, (start_x + 7) * 2,
+            start_y * 2, (start_y + 5) * 2
+        )
+        stamp = _stamp_planes(width, height)
+
+    use_batch = engine == "batch" or (engine == "auto" and perfect)
+    stream = KnockStream(rng) if use_batch else None
+
+    outer = b"\x01" * width
+    no_wall = bytes(width)
+    # north: 今の行の上の壁、vert: 今の行のセル同士の間の壁(width - 1個)
+    north = outer
+    vert = bytes(width - 1)
+    above = left = b""
+    for p in range(1, height):
+        groups = row_groups(width, p * 2, ft_box)
+        if not perfect:
+            # 柱の上の壁(柱の右上のセルの西の壁)と、
+            # 柱の左の42スタンプの壁(柱の左下のセルの北の壁)
+            prev_stamp = stamp.get(p - 1, no_wall)
+            above = (
+                int.from_bytes(vert, "big")
+                | int.from_bytes(prev_stamp[1:].translate(_HAS_W), "big")
+            ).to_bytes(width - 1, "big")
+            left = stamp.get(p, no_wall)[:-1].translate(_HAS_N)
+        if stream is not None:
+            knocks = draw_row(stream, groups, width, perfect, above, left)
+        else:
+            knocks = draw_row_scalar(rng, groups, width, perfect, above, left)
+
+        # 柱の行pで倒れた棒が、行p - 1と行pの間の壁になる
+        west_knock = b"\x01" if knocks[:1] == bytes([KNOCK_W]) else b"\x00"
+        south = west_knock + knocks.translate(_IS_E)
+        if p == 1:
+            # 一番上の柱が上に倒れると、行0のセル同士の間の壁になる
+            vert = knocks.translate(_IS_N)
+        yield _finish_row(north, vert, south, stamp.get(p - 1))
+        north = south
+        # 下に倒れた棒は、行pのセル同士の間の壁になる
+        vert = knocks.translate(_IS_S)
+
+    if stream is not None:
+        stream.close()
+    yield _finish_row(north, vert, outer, stamp.get(height - 1))
@@ -0,0 +1,515 @@
+"""迷路をHTTPで返すローカルサーバーのモジュール(標準ライブラリのみ).
+
+    python3 -m mazegen.server --port 8000 [--jobs N] [--cache-bytes N]
+
+設定はconfig.txtと同じキー(WIDTH, HEIGHT, ENTRY, EXIT, PERFECT, SEED,
+PATTERN, ALGORITHM, LOOP_DENSITY. OUTPUT_FILEは使わない)で受け取る.
+    GET  /maze?WIDTH=20&HEIGHT=15&ENTRY=0,0&EXIT=19,14&PERFECT=True&SEED=42
+    POST /maze  本文はJSONのオブジェクトか、config.txtと同じ KEY=VALUE の行
+    GET  /health  キャッシュの状態など
+formatを"text"にすると出力ファイル(maze.txt)と同じ形式、
+既定の"json"なら {設定..., "seed", "cached", "seconds", "path", "rows"} を返す.
+
+迷路は起動時に作るプロセスプール(リクエストごとにプロセスを作らない)で
+生成し、シード値が1以上の迷路は結果のバイト列をLRUでキャッシュする.
+同じ迷路のリクエストが同時に来た時は、生成を1回だけにして結果を分け合う.
+大きい迷路(STREAM_CELLS以上)のJSONは全体の文字列を作らずに、
+行をまとめながらチャンク転送(Transfer-Encoding: chunked)で送る.
+"""
+import json
+import signal
+import threading
+from argparse import ArgumentParser, Namespace
+from collections import OrderedDict
+from collections.abc import Iterator, Mapping
+from concurrent.futures import Future, ProcessPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+from types import FrameType
+from urllib.parse import parse_qsl, urlsplit
+
+from .algorithms import (
+    DEFAULT_ALGORITHM,
+    DEFAULT_LOOP_DENSITY,
+    validate_algorithm,
+)
+from .batch import MazeParams, maze_text
+from .generator import validate_points
+
+DEFAULT_PORT = 8000
+# キャッシュするバイト数の既定
+DEFAULT_CACHE_BYTES = 64 * 2**20
+# このセル数以上の迷路のJSONはチャンク転送で送る
+STREAM_CELLS = 250_000
+# 1回に生成できる迷路のセル数の上限
+MAX_CELLS = 16_000_000
+# チャンク転送の1チャンクの大きさ(バイト)
+_CHUNK_BYTES = 1 << 16
+# リクエストの本文の上限(バイト)
+_MAX_BODY = 1 << 16
+
+# (迷路の設定, シード値)
+RequestKey = tuple[MazeParams, int]
+
+
+def _strtobool(key: str, value: str | None) -> bool:
+    """config.txtと同じくTrue/Falseだけを受け付ける."""
+    if value == "True":
+        return True
+    if value == "False":
+        return False
+    if not value:
+        raise ValueError(f"missing config key or value: {key}")
+    raise ValueError(f"invalid value for {key}: 'True or False'")
+
+
+def _point(key: str, value: str) -> tuple[int, int]:
+    """'x,y'を座標にする."""
+    x, sep, y = value.partition(",")
+    if not sep:
+        raise ValueError(f"invalid value for {key}: 'x,y'")
+    return int(x), int(y)
+
+
+def parse_request(fields: Mapping[str, str]) -> RequestKey:
+    """config.txtと同じキーの辞書から迷路の設定を作る.
+
+    Args:
+        fields (Mapping[str, str]): キー(大文字小文字は問わない) -> 値.
+
+    Returns:
+        RequestKey: 迷路の設定とシード値.
+
+    Raises:
+        ValueError: キーがない、値が無効な場合.
+    """
+    values = {key.strip().upper(): str(value).strip()
+              for key, value in fields.items()}
+    for key in ("WIDTH", "HEIGHT", "ENTRY", "EXIT"):
+        if key not in values:
+            raise ValueError(f"missing config key: {key}")
+    width = int(values["WIDTH"])
+    height = int(values["HEIGHT"])
+    if width < 1 or height < 1:
+        raise ValueError("WIDTH and HEIGHT must be 1 or more")
+    if width * height > MAX_CELLS:
+        raise ValueError(f"The maze must have at most {MAX_CELLS} cells")
+    entry_point = _point("ENTRY", values["ENTRY"])
+    exit_point = _point("EXIT", values["EXIT"])
+    validate_points(width, height, entry_point, exit_point)
+    algorithm = values.get("ALGORITHM", DEFAULT_ALGORITHM).lower()
+    loop_density = float(values.get("LOOP_DENSITY", DEFAULT_LOOP_DENSITY))
+    validate_algorithm(algorithm, loop_density)
+    params: MazeParams = (
+        width, height, entry_point, exit_point,
+        _strtobool("PERFECT", values.get("PERFECT")),
+        _strtobool("PATTERN", values.get("PATTERN", "True")),
+        algorithm, loop_density
+    )
+    return params, int(values.get("SEED", 0))
+
+
+def parse_config_text(text: str) -> dict[str, str]:
+    """config.txtと同じ KEY=VALUE の行を辞書にする(#の行は飛ばす).
+
+    Raises:
+        ValueError: =のない行や、同じキーが2回ある場合.
+    """
+    fields: dict[str, str] = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        key, sep, value = line.partition("=")
+        if not sep:
+            raise ValueError(f"invalid config line: '{line}'")
+        key = key.strip().upper()
+        if key in fields:
+            raise ValueError(f"Config key: '{key}' duplicated")
+        fields[key] = value.strip()
+    return fields
+
+
+class ResponseCache:
+    """生成した迷路(maze.txtの形式のバイト列)のLRUキャッシュ.
+
+    Attributes:
+        max_bytes (int): 合計バイト数の上限.
+        hits (int): 見つかった回数.
+        misses (int): 見つからなかった回数.
+        _entries (OrderedDict[RequestKey, bytes]): 古く使った順の迷路.
+        _size (int): 合計バイト数.
+        _lock (threading.Lock): _entriesと_sizeを守るロック.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES) -> None:
+        """ResponseCacheを初期化する."""
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[RequestKey, bytes] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """キャッシュしている迷路の数."""
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        """キャッシュしている迷路の合計バイト数."""
+        return self._size
+
+    def get(self, key: RequestKey) -> bytes | None:
+        """迷路を探す. なければNone."""
+        with self._lock:
+            text = self._entries.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, key: RequestKey, text: bytes) -> None:
+        """迷路を保存し、上限を超えたら古いものから捨てる."""
+        if len(text) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = text
+            self._size += len(text)
+            while self._size > self.max_bytes:
+                _, dropped = self._entries.popitem(last=False)
+                self._size -= len(dropped)
+
+
+def _generate(key: RequestKey) -> tuple[bytes, float]:
+    """子プロセスで迷路を生成する. (maze.txtの形式, 秒)を返す."""
+    start = perf_counter()
+    text = maze_text(*key)
+    return text, perf_counter() - start
+
+
+def iter_json(
+    meta: Mapping[str, object], text: bytes
+) -> Iterator[bytes]:
+    """maze.txtの形式の迷路をJSONにして少しずつ返す.
+
+    16進数の行は英数字だけなので、そのまま引用符で囲んで並べる
+    (行のリストやJSON全体の文字列は作らない).
+
+    Args:
+        meta (Mapping[str, object]): 先に並べる値.
+        text (bytes): maze.txtの形式の迷路.
+
+    Yields:
+        bytes: JSONの断片. つなげると1つのオブジェクトになる.
+    """
+    end = text.index(b"\n\n")
+    path = text[text.rindex(b"\n") + 1:].decode("ascii")
+    head = json.dumps({**meta, "path": path})
+    yield head[:-1].encode("ascii") + b', "rows": ['
+    start = 0
+    while start < end:
+        stop = text.find(b"\n", start, end)
+        if stop < 0:
+            stop = end
+        yield (b'"' if start == 0 else b', "') + text[start:stop] + b'"'
+        start = stop + 1
+    yield b"]}"
+
+
+class MazeServer(ThreadingHTTPServer):
+    """プロセスプールとキャッシュを持つ迷路のHTTPサーバー.
+
+    リクエストはスレッドで受け、生成はプロセスプールに任せる.
+
+    Attributes:
+        cache (ResponseCache): シード値が1以上の迷路のキャッシュ.
+        requests (int): 受けた/mazeのリクエストの数.
+        _executor (ProcessPoolExecutor): 迷路を生成するプロセスプール.
+        _inflight (dict[RequestKey, Future[tuple[bytes, float]]]):
+            生成中の迷路(同じ迷路のリクエストで分け合う).
+        _lock (threading.Lock): _inflightとrequestsを守るロック.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        workers: int | None = None,
+        cache_bytes: int = DEFAULT_CACHE_BYTES,
+    ) -> None:
+        """MazeServerを初期化し、プロセスプールを作る.
+
+        Args:
+            address (tuple[str, int]): 待ち受けるホストとポート.
+            workers (int | None): プロセス数. Noneならos.cpu_count().
+            cache_bytes (int): キャッシュするバイト数(0ならキャッシュしない).
+        """
+        # bindに失敗した時もserver_close()でプロセスプールを止められるよう先に作る
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        self._inflight: dict[RequestKey, Future[tuple[bytes, float]]] = {}
+        self._lock = threading.Lock()
+        self.cache = ResponseCache(cache_bytes)
+        self.requests = 0
+        super().__init__(address, MazeRequestHandler)
+
+    def server_close(self) -> None:
+        """ソケットを閉じ、プロセスプールを止める."""
+        super().server_close()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def maze(self, key: RequestKey) -> tuple[bytes, bool, float]:
+        """迷路を返す. キャッシュになければプロセスプールで生成する.
+
+        Args:
+            key (RequestKey): 迷路の設定とシード値.
+
+        Returns:
+            tuple[bytes, bool, float]: maze.txtの形式の迷路、
+                キャッシュから返したかどうか、生成にかかった秒.
+        """
+        with self._lock:
+            self.requests += 1
+        # シード値が0の迷路は毎回違うので、キャッシュも分け合いもしない
+        if key[1] < 1:
+            text, seconds = self._executor.submit(_generate, key).result()
+            return text, False, seconds
+        # キャッシュを見てから生成を登録するまでをロックの中で行い、
+        # 生成を終えた迷路がキャッシュにも_inflightにもない時間を作らない
+        with self._lock:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached, True, 0.0
+            future = self._inflight.get(key)
+            owner = future is None
+            if future is None:
+                future = self._executor.submit(_generate, key)
+                self._inflight[key] = future
+        try:
+            text, seconds = future.result()
+        except BaseException:
+            if owner:
+                with self._lock:
+                    del self._inflight[key]
+            raise
+        if owner:
+            # 先にキャッシュに入れてから_inflightから消す
+            self.cache.put(key, text)
+            with self._lock:
+                del self._inflight[key]
+        return text, not owner, seconds
+
+    def health(self) -> dict[str, object]:
+        """サーバーの状態を返す."""
+        return {
+            "status": "ok",
+            "requests": self.requests,
+            "cache": {
+                "mazes": len(self.cache),
+                "bytes": self.cache.size,
+                "hits": self.cache.hits,
+                "misses": self.cache.misses,
+            },
+        }
+
+
+class MazeRequestHandler(BaseHTTPRequestHandler):
+    """/maze と /health を処理するハンドラー(接続は使い回せる)."""
+
+    protocol_version = "HTTP/1.1"
+    # ヘッダーと本文を別々に書くので、Nagleと遅延ACKで待たされないようにする
+    disable_nagle_algorithm = True
+    server: MazeServer
+
+    def log_message(self, format: str, *args: object) -> None:
+        """リクエストごとのログは出さない(負荷試験の邪魔になるため)."""
+
+    def do_GET(self) -> None:  # noqa: N802 (http.serverが呼ぶ名前)
+        """GETのリクエストを処理する."""
+        url = urlsplit(self.path)
+        if url.path == "/health":
+            self._send_json(HTTPStatus.OK, self.server.health())
+        elif url.path == "/maze":
+            self._handle_maze(dict(parse_qsl(url.query)))
+        else:
+            self._send_error(HTTPStatus.NOT_FOUND, "Not found")
+
+    def do_POST(self) -> None:  # noqa: N802
+        """POSTのリクエストを処理する(本文はJSONかconfig.txtの形式)."""
+        url = urlsplit(self.path)
+        # 本文の長さが読めない時は、本文の終わりが分からないので接続を閉じる
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            self.close_connection = True
+            self._send_error(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+            return
+        if length > _MAX_BODY:
+            self.close_connection = True
+            self._send_error(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large"
+            )
+            return
+        body = self.rfile.read(length).decode("utf-8", "replace")
+        if url.path != "/maze":
+            self._send_error(HTTPStatus.NOT_FOUND, "Not found")
+            return
+        fields = dict(parse_qsl(url.query))
+        try:
+            if "json" in self.headers.get("Content-Type", ""):
+                data = json.loads(body or "{}")
+                if not isinstance(data, dict):
+                    raise ValueError("The JSON body must be an object")
+                fields.update({key: str(value) for key, value in data.items()})
+            else:
+                fields.update(parse_config_text(body))
+        except ValueError as e:
+            self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+        self._handle_maze(fields)
+
+    def _handle_maze(self, fields: dict[str, str]) -> None:
+        """迷路を生成して返す."""
+        output = fields.pop("format", fields.pop("FORMAT", "json")).lower()
+        if output not in ("json", "text"):
+            self._send_error(
+                HTTPStatus.BAD_REQUEST, "format must be 'json' or 'text'"
+            )
+            return
+        try:
+            key = parse_request(fields)
+        except ValueError as e:
+            self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+        # 生成のプロセスで失敗しても、接続を切らずにエラーを返す
+        try:
+            text, cached, seconds = self.server.maze(key)
+        except Exception as e:
+            self._send_error(
+                HTTPStatus.INTERNAL_SERVER_ERROR,
+                f"Failed to generate the maze: {e}"
+            )
+            return
+        if output == "text":
+            self._send_bytes(HTTPStatus.OK, "text/plain; charset=ascii", text)
+            return
+
+        params, seed = key
+        width, height, entry_point, exit_point, perfect, pattern = params[:6]
+        meta = {
+            "width": width, "height": height,
+            "entry": list(entry_point), "exit": list(exit_point),
+            "perfect": perfect, "pattern": pattern,
+            "algorithm": params[6], "loop_density": params[7],
+            "seed": seed, "cached": cached, "seconds": round(seconds, 6),
+        }
+        pieces = iter_json(meta, text)
+        if width * height < STREAM_CELLS:
+            self._send_bytes(
+                HTTPStatus.OK, "application/json", b"".join(pieces)
+            )
+        else:
+            self._send_chunked("application/json", pieces)
+
+    def _send_bytes(
+        self, status: HTTPStatus, content_type: str, body: bytes
+    ) -> None:
+        """本文の長さを付けて送る."""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunked(
+        self, content_type: str, pieces: Iterator[bytes]
+    ) -> None:
+        """断片を_CHUNK_BYTESずつまとめてチャンク転送で送る."""
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        buffer = bytearray()
+        for piece in pieces:
+            buffer += piece
+            if len(buffer) >= _CHUNK_BYTES:
+                self.wfile.write(b"%X\r\n%s\r\n" % (len(buffer), buffer))
+                buffer.clear()
+        if buffer:
+            self.wfile.write(b"%X\r\n%s\r\n" % (len(buffer), buffer))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _send_json(self, status: HTTPStatus, data: object) -> None:
+        """JSONを送る."""
+        self._send_bytes(
+            status, "application/json", json.dumps(data).encode("utf-8")
+        )
+
+    def _send_error(self, status: HTTPStatus, message: str) -> None:
+        """{"error": message}を送る."""
+        self._send_json(status, {"error": message})
+
+
+def parse_args() -> Namespace:
+    """コマンドライン引数を解析する.
+
+    Returns:
+        Namespace: 解析したコマンドライン引数.
+    """
+    parser = ArgumentParser(
+        prog="python3 -m mazegen.server",
+        usage="python3 -m mazegen.server [--host HOST] [--port PORT] "
+        "[--jobs N] [--cache-bytes N]"
+    )
+    parser.add_argument(
+        "--host", default="127.0.0.1",
+        help="待ち受けるホスト(既定: 127.0.0.1)"
+    )
+    parser.add_argument(
+        "--port", type=int, default=DEFAULT_PORT,
+        help=f"待ち受けるポート(既定: {DEFAULT_PORT})"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=None,
+        help="迷路を生成するプロセス数(既定: CPUの数)"
+    )
+    parser.add_argument(
+        "--cache-bytes", type=int, default=DEFAULT_CACHE_BYTES,
+        help="キャッシュするバイト数(0ならキャッシュしない)"
+    )
+    return parser.parse_args()
+
+
+def _interrupt(signum: int, frame: FrameType | None) -> None:
+    """SIGTERMをCtrl + cと同じに扱う(プロセスプールを止めてから終わる)."""
+    raise KeyboardInterrupt
+
+
+def main() -> None:
+    """サーバーを起動し、Ctrl + cかSIGTERMまで待ち受ける."""
+    args = parse_args()
+    signal.signal(signal.SIGTERM, _interrupt)
+    with MazeServer(
+        (args.host, args.port), args.jobs, args.cache_bytes
+    ) as server:
+        host, port = server.server_address[:2]
+        print(f"Serving mazes on http://{host!s}:{port}/maze", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""セル単位の壁情報で最短経路を求めるモジュール.
+
+迷路は1セル1バイトの壁(N=1, E=2, S=4, W=8)の配列で受け取り、
+セル(x, y)は添字 y * stride + x で扱う. 2倍の座標のグリッドと違って
+壁のマスを経由しないので、探索するノードは実際のセルの数だけになる.
+
+探索の状態は添字をそのまま使う平らな配列に持つ.
+    came: セルに来た向き(MOVESの添字 + 1、0は未訪問)のbytearray.
+    dist: 出発点からの距離のarray("i")(-1は未訪問).
+
+方式("bfs", "bidirectional", "astar")はどれも最短経路を返す.
+"bfs"はMazeGenerator.solve_maze()の従来の探索と同じ W, E, N, S の順に
+広げるので、最短経路が複数ある不完全迷路でも従来と同じ経路になる.
+"bidirectional"と"astar"は探索するセルが少ない代わりに、
+最短経路が複数ある時はどれを返すかが"bfs"と異なる場合がある
+(完全迷路では経路が1本なので常に同じ).
+"""
+from array import array
+from heapq import heappop, heappush
+
+from .constants import WALL_E, WALL_N, WALL_S, WALL_W
+
+SOLVERS = ("bfs", "bidirectional", "astar")
+
+# 探索で進む向き(従来の探索と同じ W, E, N, S の順)
+# (方角, 壁のビット, x の増分, y の増分)
+MOVES = (
+    ("W", WALL_W, -1, 0),
+    ("E", WALL_E, 1, 0),
+    ("N", WALL_N, 0, -1),
+    ("S", WALL_S, 0, 1),
+)
+# 向きの番号(MOVESの添字 + 1) -> 方角、逆向きの番号
+_NAMES = ("",) + tuple(name for name, _, _, _ in MOVES)
+OPPOSITE = (0, 2, 1, 4, 3)
+# 出発点の印(どの向きの番号とも重ならない値)
+_ORIGIN = len(MOVES) + 1
+
+
+def open_moves(stride: int) -> list[tuple[tuple[int, int], ...]]:
+    """壁の値(0-15) -> 進める(向きの番号, 添字の増分)の対応表を作る."""
+    return [
+        tuple(
+            (code, dy * stride + dx)
+            for code, (_, bit, dx, dy) in enumerate(MOVES, 1)
+            if not walls & bit
+        )
+        for walls in range(16)
+    ]
+
+
+def _trace(came: bytearray, stride: int, start: int, node: int) -> list[int]:
+    """来た向きをnodeからstartまでたどり、start -> nodeの向きの番号を返す."""
+    deltas = [0] + [dy * stride + dx for _, _, dx, dy in MOVES]
+    codes = []
+    while node != start:
+        code = came[node]
+        codes.append(code)
+        node -= deltas[code]
+    codes.reverse()
+    return codes
+
+
+def to_path(codes: list[int]) -> str:
+    """向きの番号の列を'N', 'E', 'S', 'W'の文字列にする."""
+    return "".join([_NAMES[code] for code in codes])
+
+
+def _bfs(
+    walls: bytes | bytearray, stride: int, start: int, goal: int
+) -> tuple[str, int]:
+    """幅優先探索(1段ずつ広げる). (経路, 広げたセル数)を返す."""
+    opens = open_moves(stride)
+    came = bytearray(len(walls))
+    came[start] = _ORIGIN
+    frontier = [start]
+    expanded = 0
+    while frontier and not came[goal]:
+        expanded += len(frontier)
+        reached = []
+        for current in frontier:
+            for code, delta in opens[walls[current]]:
+                nxt = current + delta
+                if not came[nxt]:
+                    came[nxt] = code
+                    reached.append(nxt)
+        frontier = reached
+    if not came[goal]:
+        return "", expanded
+    return to_path(_trace(came, stride, start, goal)), expanded
+
+
+def _bidirectional(
+    walls: bytes | bytearray, stride: int, start: int, goal: int
+) -> tuple[str, int]:
+    """入口と出口の両側から、小さい方の段を1段ずつ広げる幅優先探索."""
+    if start == goal:
+        return "", 0
+    opens = open_moves(stride)
+    size = len(walls)
+    # 0: 入口側、1: 出口側
+    came = (bytearray(size), bytearray(size))
+    dist = (array("i", [-1]) * size, array("i", [-1]) * size)
+    frontiers = ([start], [goal])
+    for side, node in enumerate((start, goal)):
+        came[side][node] = _ORIGIN
+        dist[side][node] = 0
+
+    meet = -1
+    expanded = 0
+    while frontiers[0] and frontiers[1] and meet < 0:
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        expanded += len(frontiers[side])
+        own_came, own_dist = came[side], dist[side]
+        other_dist = dist[1 - side]
+        reached = []
+        for current in frontiers[side]:
+            step = own_dist[current] + 1
+            for code, delta in opens[walls[current]]:
+                nxt = current + delta
+                if own_came[nxt]:
+                    continue
+                own_came[nxt] = code
+                own_dist[nxt] = step
+                reached.append(nxt)
+                # 反対側が到達済みなら、この段の中で合計が最短の所で繋ぐ
+                if other_dist[nxt] >= 0 and (
+                    meet < 0 or other_dist[nxt] < other_dist[meet]
+                ):
+                    meet = nxt
+        if side == 0:
+            frontiers = (reached, frontiers[1])
+        else:
+            frontiers = (frontiers[0], reached)
+    if meet < 0:
+        return "", expanded
+
+    # 入口 -> 合流点、合流点 -> 出口(出口側は来た向きの逆に進む)
+    codes = _trace(came[0], stride, start, meet)
+    back = _trace(came[1], stride, goal, meet)
+    codes.extend(OPPOSITE[code] for code in reversed(back))
+    return to_path(codes), expanded
+
+
+def _astar(
+    walls: bytes | bytearray, stride: int, start: int, goal: int
+) -> tuple[str, int]:
+    """マンハッタン距離を推定値にしたA*探索."""
+    opens = open_moves(stride)
+    size = len(walls)
+    came = bytearray(size)
+    dist = array("i", [-1]) * size
+    gy, gx = divmod(goal, stride)
+
+    def estimate(node: int) -> int:
+        y, x = divmod(node, stride)
+        return abs(x - gx) + abs(y - gy)
+
+    came[start] = _ORIGIN
+    dist[start] = 0
+    # (推定の合計, 残りの推定, 添字) 合計が同じならゴールに近い方から
+    heap = [(estimate(start), estimate(start), start)]
+    expanded = 0
+    while heap:
+        total, rest, current = heappop(heap)
+        if current == goal:
+            return to_path(_trace(came, stride, start, goal)), expanded
+        # 後から短い距離で積み直された古い要素は飛ばす
+        if total - rest > dist[current]:
+            continue
+        expanded += 1
+        step = dist[current] + 1
+        for code, delta in opens[walls[current]]:
+            nxt = current + delta
+            if dist[nxt] < 0 or step < dist[nxt]:
+                came[nxt] = code
+                dist[nxt] = step
+                left = estimate(nxt)
+                heappush(heap, (step + left, left, nxt))
+    return "", expanded
+
+
+def solve_walls(
+    walls: bytes | bytearray,
+    stride: int,
+    start: tuple[int, int],
+    goal: tuple[int, int],
+    method: str = "bfs",
+    counters: dict[str, int] | None = None
+) -> str:
+    """セル単位の壁情報から最短経路を求める.
+
+    迷路の外周のセルは外側の壁のビットが立っている前提で、
+    配列の範囲チェックはしない(ファイルから読んだ壁は呼び出し側で確かめる.
+    mazegen.mazefile.MazeFile.solve_maze()を参照).
+
+    Args:
+        walls (bytes | bytearray): 1セル1バイトの壁(N=1, E=2, S=4, W=8).
+        stride (int): 1行分のバイト数(迷路の幅以上).
+        start (tuple[int, int]): 出発するセル座標.
+        goal (tuple[int, int]): 目的のセル座標.
+        method (str): 探索の方式("bfs", "bidirectional", "astar").
+        counters (dict[str, int] | None): 渡すと探索で広げたセル数を
+            "nodes_expanded"に入れる.
+
+    Returns:
+        str: ゴールまでの道筋を'N', 'E', 'S', 'W'で表す.
+            到達できなければ、どの方式でも空.
+
+    Raises:
+        ValueError: methodが不明な値の場合.
+    """
+    if method not in SOLVERS:
+        raise ValueError(f"Unknown solver: '{method}'")
+    begin = start[1] * stride + start[0]
+    end = goal[1] * stride + goal[0]
+    if method == "bidirectional":
+        path, expanded = _bidirectional(walls, stride, begin, end)
+    elif method == "astar":
+        path, expanded = _astar(walls, stride, begin, end)
+    else:
+        path, expanded = _bfs(walls, stride, begin, end)
+    if counters is not None:
+        counters["nodes_expanded"] = expanded
+    return path
@@ -0,0 +1,100 @@
+"""迷路生成の処理ごとの時間とカウンタを記録するモジュール.
+
+MazeGeneratorにMazeStatsを渡した時だけ記録する. 渡さなければ
+各処理の前後で記録するかどうかを1回判定するだけで、計測の処理は行わない.
+"""
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+# 記録した時に呼ぶ関数(処理名, 秒, カウンタ)
+StatsHook = Callable[[str, float, dict[str, int]], None]
+
+
+@dataclass
+class PhaseStats:
+    """1つの処理の記録.
+
+    Attributes:
+        calls (int): 処理を呼んだ回数.
+        seconds (float): 合計の時間(秒).
+        counters (dict[str, int]): 合計のカウンタ.
+    """
+
+    calls: int = 0
+    seconds: float = 0.0
+    counters: dict[str, int] = field(default_factory=dict)
+
+
+class MazeStats:
+    """処理ごとの時間とカウンタを集計するクラス.
+
+    記録する処理とカウンタ:
+        _build_outer_walls: 時間のみ.
+        _build_fourty_two: 時間のみ.
+        _pillars_and_knock: pillars_visited(棒を倒そうとした柱),
+            knocks(倒した棒), skipped(不完全迷路で倒さなかった柱).
+        _carve_rows: rows(棒倒し法以外のアルゴリズムで埋めた行).
+        solve_maze: nodes_expanded(探索で広げたセル), path_length.
+        get_hex_grid: rows.
+        export_text: rows, bytes_written(圧縮後のバイト数).
+        export_image: rows(グリッドの行), bytes_written.
+        analyze: dead_ends, junctions, loops.
+        cache: hits(生成せずにキャッシュから読み込んだ回数).
+
+    Attributes:
+        phases (dict[str, PhaseStats]): 処理名 -> 記録(記録した順).
+        _hook (StatsHook | None): 記録した時に呼ぶ関数.
+    """
+
+    def __init__(self, hook: StatsHook | None = None) -> None:
+        """MazeStatsを初期化する.
+
+        Args:
+            hook (StatsHook | None): 記録するたびに(処理名, 秒, カウンタ)で
+                呼ぶ関数. 外部の計測の仕組みに送る時に使う.
+        """
+        self.phases: dict[str, PhaseStats] = {}
+        self._hook = hook
+
+    def record(self, phase: str, seconds: float, **counters: int) -> None:
+        """処理1回分の時間とカウンタを足す.
+
+        Args:
+            phase (str): 処理名.
+            seconds (float): かかった時間(秒).
+            **counters (int): カウンタ名 -> 値.
+        """
+        stats = self.phases.setdefault(phase, PhaseStats())
+        stats.calls += 1
+        stats.seconds += seconds
+        for name, value in counters.items():
+            stats.counters[name] = stats.counters.get(name, 0) + value
+        if self._hook is not None:
+            self._hook(phase, seconds, counters)
+
+    def reset(self) -> None:
+        """記録を消す."""
+        self.phases.clear()
+
+    def as_dict(self) -> dict[str, dict[str, float | int]]:
+        """記録をJSONにできる辞書で返す."""
+        return {
+            phase: {
+                "calls": stats.calls, "seconds": stats.seconds,
+                **stats.counters
+            }
+            for phase, stats in self.phases.items()
+        }
+
+    def report(self) -> str:
+        """記録を表にした文字列を返す."""
+        lines = []
+        for phase, stats in self.phases.items():
+            counters = ", ".join(
+                f"{name}={value}" for name, value in stats.counters.items()
+            )
+            lines.append(
+                f"{phase:20} {stats.calls:4}x {stats.seconds * 1000:10.2f} ms"
+                + (f"  {counters}" if counters else "")
+            )
+        return "\n".join(lines)
@@ -0,0 +1,205 @@
+"""完全迷路を木として扱い、任意の2セル間の経路を求めるモジュール.
+
+完全迷路はセルを頂点、壁のない所を辺とする全域木になる.
+根から深さ優先でたどったオイラーツアーに(深さ, セル)のスパーステーブルを作ると、
+2セルの最小共通祖先(LCA)は表を2回引くだけ(O(1))で求まり、
+    距離 = depth[a] + depth[b] - 2 * depth[LCA]
+になる. 経路はaとbからそれぞれLCAまで親をたどるので、経路の長さに比例する.
+
+索引は迷路1つにつき1回作る. メモリはセル数 * log2(セル数)に比例する
+(スパーステーブルの各段がarray("q")で、1000 * 1000の迷路で約300MB).
+"""
+from array import array
+
+from .solver import MOVES, OPPOSITE, open_moves, to_path
+
+# 根の印(どの向きの番号とも重ならない値)
+_ROOT = len(MOVES) + 1
+
+
+class MazeTree:
+    """完全迷路の木の索引.
+
+    壁情報はmazegen.solverと同じ1セル1バイト(N=1, E=2, S=4, W=8)で受け取る.
+    根と繋がっていないセル(42スタンプなど)は木に含まれず、
+    そのセルへの距離は-1、経路は空になる.
+
+    Attributes:
+        _width (int):迷路の幅.
+        _height (int):迷路の高さ.
+        _stride (int):壁情報の1行分のバイト数.
+        _came (bytearray):セルに親から来た向きの番号(0は木に含まれない).
+        _depth (array):根からの距離(-1は木に含まれない).
+        _first (array):オイラーツアーで最初に現れる位置.
+        _table (list[array]):k段目は長さ2**kの区間の最小の(深さ, セル)を
+            深さ * セル数 + セル の1つの整数で持つ.
+        _deltas (list[int]):向きの番号 -> 添字の増分.
+    """
+
+    def __init__(
+        self,
+        walls: bytes | bytearray,
+        stride: int,
+        width: int,
+        height: int,
+        root: tuple[int, int],
+    ) -> None:
+        """MazeTreeを初期化し、索引を作る.
+
+        Args:
+            walls (bytes | bytearray): 1セル1バイトの壁(N=1, E=2, S=4, W=8).
+            stride (int): 1行分のバイト数(迷路の幅以上).
+            width (int): 迷路の幅.
+            height (int): 迷路の高さ.
+            root (tuple[int, int]): 木の根にするセル座標.
+
+        Raises:
+            ValueError: rootが迷路の外の場合、または迷路にループがある場合.
+        """
+        self._width = width
+        self._height = height
+        self._stride = stride
+        size = len(walls)
+        start = self._index(root)
+        opens = open_moves(stride)
+        deltas = [0] + [dy * stride + dx for _, _, dx, dy in MOVES]
+
+        came = bytearray(size)
+        depth = array("i", [-1]) * size
+        first = array("i", [-1]) * size
+        tour = array("i")
+        came[start] = _ROOT
+        depth[start] = 0
+
+        # 深さ優先でたどる. 負の値(~セル)は子から戻った時に親をツアーに足す印
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            if node < 0:
+                tour.append(~node)
+                continue
+            first[node] = len(tour)
+            tour.append(node)
+            parent = node - deltas[came[node]] if node != start else -1
+            child_depth = depth[node] + 1
+            for code, delta in opens[walls[node]]:
+                child = node + delta
+                if child == parent:
+                    continue
+                if came[child]:
+                    raise ValueError("The maze has a loop. It is not perfect.")
+                came[child] = code
+                depth[child] = child_depth
+                stack.append(~node)
+                stack.append(child)
+
+        # 1段ごとに区間を倍にして、前の段の2つの最小値の小さい方を取る
+        table = [array("q", [depth[node] * size + node for node in tour])]
+        span = 1
+        while span * 2 <= len(tour):
+            prev = table[-1]
+            table.append(array("q", [
+                left if left < right else right
+                for left, right in zip(prev, prev[span:])
+            ]))
+            span *= 2
+
+        self._came = came
+        self._depth = depth
+        self._first = first
+        self._table = table
+        self._deltas = deltas
+
+    def _index(self, cell: tuple[int, int]) -> int:
+        """セル座標を壁情報の添字にする.
+
+        Raises:
+            ValueError: セルが迷路の外の場合.
+        """
+        x, y = cell
+        if not (0 <= x < self._width and 0 <= y < self._height):
+            raise ValueError(f"Cell {cell} is out of the maze")
+        return y * self._stride + x
+
+    def _lca(self, a: int, b: int) -> int:
+        """2セルの最小共通祖先の添字を返す. どちらかが木になければ-1."""
+        left = self._first[a]
+        right = self._first[b]
+        if left < 0 or right < 0:
+            return -1
+        if left > right:
+            left, right = right, left
+        level = (right - left + 1).bit_length() - 1
+        row = self._table[level]
+        key = min(row[left], row[right - (1 << level) + 1])
+        return key % len(self._came)
+
+    def lca(
+        self, a: tuple[int, int], b: tuple[int, int]
+    ) -> tuple[int, int] | None:
+        """2セルの最小共通祖先(根から見て2セルが分かれる所)を返す.
+
+        Args:
+            a (tuple[int, int]): セル座標.
+            b (tuple[int, int]): セル座標.
+
+        Returns:
+            tuple[int, int] | None: セル座標. どちらかが木になければNone.
+        """
+        node = self._lca(self._index(a), self._index(b))
+        if node < 0:
+            return None
+        y, x = divmod(node, self._stride)
+        return x, y
+
+    def distance(self, a: tuple[int, int], b: tuple[int, int]) -> int:
+        """2セル間の距離(進むセル数)をO(1)で返す.
+
+        Args:
+            a (tuple[int, int]): セル座標.
+            b (tuple[int, int]): セル座標.
+
+        Returns:
+            int: 距離. 繋がっていなければ-1.
+        """
+        start = self._index(a)
+        goal = self._index(b)
+        node = self._lca(start, goal)
+        if node < 0:
+            return -1
+        depth = self._depth
+        return depth[start] + depth[goal] - 2 * depth[node]
+
+    def path(self, a: tuple[int, int], b: tuple[int, int]) -> str:
+        """aからbまでの経路を経路の長さに比例する時間で返す.
+
+        Args:
+            a (tuple[int, int]): 出発するセル座標.
+            b (tuple[int, int]): 目的のセル座標.
+
+        Returns:
+            str: 道筋を'N', 'E', 'S', 'W'で表す. 繋がっていなければ空.
+        """
+        start = self._index(a)
+        goal = self._index(b)
+        top = self._lca(start, goal)
+        if top < 0:
+            return ""
+        came = self._came
+        deltas = self._deltas
+
+        # a -> LCAは親へ戻る(来た向きの逆)、LCA -> bは来た向きのまま進む
+        up = []
+        node = start
+        while node != top:
+            code = came[node]
+            up.append(OPPOSITE[code])
+            node -= deltas[code]
+        down = []
+        node = goal
+        while node != top:
+            code = came[node]
+            down.append(code)
+            node -= deltas[code]
+        down.reverse()
+        return to_path(up + down)
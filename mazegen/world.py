@@ -0,0 +1,386 @@
+"""チャンクに分けて必要な所だけ生成する、端のない迷路(ワールド)のモジュール.
+
+ワールドは chunk_size * chunk_size セルのチャンクを縦横に並べたもので、
+チャンク(cx, cy)はワールドのセル(cx * chunk_size, cy * chunk_size)から始まる
+(座標は負でもよい). 各チャンクは(シード値, cx, cy)から作ったシード値の
+乱数でMazeGeneratorと同じアルゴリズム(既定は棒倒し法)の迷路にするので、
+どのチャンクもほかのチャンクと関係なく、どの順番で作っても同じになる.
+
+隣り合うチャンクの境界の壁は、境界ごとに(シード値, 境界の位置)から決めた
+1か所(扉)だけを開ける. 扉の位置は両側のチャンクが同じ式で求めるので、
+別々に生成しても境界の壁は必ず一致し、ワールド全体が繋がる.
+
+生成したチャンクは上限の数までLRUでメモリに置く. prefetch()は周りの
+チャンクをプロセスプールで先に生成しておく. ワールドの任意の範囲を
+出力ファイル(maze.txt)と同じ16進数の形式で書き出せる.
+"""
+import os
+import random
+from collections import OrderedDict
+from collections.abc import Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from types import TracebackType
+
+from .algorithms import (
+    DEFAULT_ALGORITHM,
+    DEFAULT_LOOP_DENSITY,
+    iter_algorithm_rows,
+    validate_algorithm,
+)
+from .constants import HEX_DIGITS, WALL_E, WALL_N, WALL_S, WALL_W
+from .export import DEFAULT_BUFFER_SIZE, ExportResult, write_maze_text
+from .generator import validate_points
+from .solver import solve_walls
+
+# ワールドの設定(シード値, チャンクの幅, 完全迷路, アルゴリズム, ループの確率)
+WorldParams = tuple[int, int, bool, str, float]
+
+DEFAULT_CHUNK_SIZE = 32
+# メモリに置くチャンクの数の既定(32 * 32なら1チャンク1KiB)
+DEFAULT_RESIDENT_CHUNKS = 1024
+
+_MASK64 = (1 << 64) - 1
+# 境界の扉の位置を決める時の印(チャンクのシード値と重ならないようにする)
+_DOOR_WEST = 0x5745
+_DOOR_NORTH = 0x4E4F
+
+
+def _mix(value: int) -> int:
+    """64ビットの値をかき混ぜる(splitmix64の出力関数)."""
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+def chunk_seed(seed: int, cx: int, cy: int, salt: int = 0) -> int:
+    """(シード値, cx, cy)からチャンクのシード値(1以上)を作る.
+
+    PythonのhashやPYTHONHASHSEEDに依らないので、どのプロセスでも同じ値になる.
+
+    Args:
+        seed (int): ワールドのシード値.
+        cx (int): チャンクの横の位置.
+        cy (int): チャンクの縦の位置.
+        salt (int): 用途ごとに値を分ける印(チャンクの中身は0).
+
+    Returns:
+        int: 1以上2**63未満のシード値.
+    """
+    value = _mix(seed & _MASK64)
+    value = _mix(value ^ (cx & _MASK64))
+    value = _mix(value ^ (cy & _MASK64))
+    value = _mix(value ^ salt)
+    return (value >> 1) or 1
+
+
+def generate_chunk(params: WorldParams, cx: int, cy: int) -> bytes:
+    """チャンクを1つ生成する(プロセスプールからも呼ぶ).
+
+    Args:
+        params (WorldParams): ワールドの設定.
+        cx (int): チャンクの横の位置.
+        cy (int): チャンクの縦の位置.
+
+    Returns:
+        bytes: 各セルの壁(N=1, E=2, S=4, W=8)を1セル1バイトで行順に
+            すき間なく並べたもの(chunk_size * chunk_size).
+    """
+    seed, size, perfect, algorithm, loop_density = params
+    rng = random.Random(chunk_seed(seed, cx, cy))
+    walls = bytearray().join(iter_algorithm_rows(
+        algorithm, size, size, perfect, False, rng,
+        loop_density=loop_density
+    ))
+    # 境界の扉. 東と南は隣のチャンクの西と北の扉と同じ位置
+    west = chunk_seed(seed, cx, cy, _DOOR_WEST) % size
+    east = chunk_seed(seed, cx + 1, cy, _DOOR_WEST) % size
+    north = chunk_seed(seed, cx, cy, _DOOR_NORTH) % size
+    south = chunk_seed(seed, cx, cy + 1, _DOOR_NORTH) % size
+    walls[west * size] &= ~WALL_W
+    walls[east * size + size - 1] &= ~WALL_E
+    walls[north] &= ~WALL_N
+    walls[(size - 1) * size + south] &= ~WALL_S
+    return bytes(walls)
+
+
+class MazeWorld:
+    """チャンクを必要な時に生成する、端のない迷路.
+
+    Attributes:
+        hits (int): メモリ(または先に生成したもの)にあったチャンクの数.
+        misses (int): その場で生成したチャンクの数.
+        _params (WorldParams): ワールドの設定.
+        _size (int): チャンクの幅(セル数).
+        _resident (int): メモリに置くチャンクの数の上限.
+        _workers (int | None): prefetchのプロセス数.
+        _chunks (OrderedDict[tuple[int, int], bytes]): 古く使った順のチャンク.
+        _pending (dict[tuple[int, int], Future[bytes]]): 生成中のチャンク.
+        _executor (ProcessPoolExecutor | None): prefetchのプロセスプール
+            (最初のprefetchで作る).
+    """
+
+    def __init__(
+        self,
+        seed: int,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        perfect: bool = True,
+        algorithm: str = DEFAULT_ALGORITHM,
+        loop_density: float = DEFAULT_LOOP_DENSITY,
+        resident_chunks: int = DEFAULT_RESIDENT_CHUNKS,
+        workers: int | None = None,
+    ) -> None:
+        """MazeWorldを初期化する. チャンクはまだ生成しない.
+
+        Args:
+            seed (int): ワールドのシード値(1以上).
+            chunk_size (int): チャンクの幅と高さ(セル数、2以上).
+            perfect (bool): チャンクの中を完全迷路にするかどうか.
+            algorithm (str): 迷路生成のアルゴリズム(mazegen.algorithms).
+            loop_density (float): 不完全迷路でループを作る確率.
+            resident_chunks (int): メモリに置くチャンクの数の上限(1以上).
+            workers (int | None): prefetchのプロセス数.
+                Noneならos.cpu_count().
+
+        Raises:
+            ValueError: 設定が無効な場合.
+        """
+        if seed < 1:
+            raise ValueError("The world seed must be 1 or more")
+        if chunk_size < 2:
+            raise ValueError("chunk_size must be 2 or more")
+        if resident_chunks < 1:
+            raise ValueError("resident_chunks must be 1 or more")
+        validate_algorithm(algorithm, loop_density)
+        self.hits = 0
+        self.misses = 0
+        self._params: WorldParams = (
+            seed, chunk_size, perfect, algorithm, loop_density
+        )
+        self._size = chunk_size
+        self._resident = resident_chunks
+        self._workers = workers
+        self._chunks: OrderedDict[tuple[int, int], bytes] = OrderedDict()
+        self._pending: dict[tuple[int, int], Future[bytes]] = {}
+        self._executor: ProcessPoolExecutor | None = None
+
+    def __enter__(self) -> "MazeWorld":
+        """withの中で使う."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """withを抜けた時にプロセスプールを止める."""
+        self.close()
+
+    def __len__(self) -> int:
+        """メモリにあるチャンクの数."""
+        return len(self._chunks)
+
+    @property
+    def chunk_size(self) -> int:
+        """チャンクの幅と高さ(セル数)."""
+        return self._size
+
+    def close(self) -> None:
+        """プロセスプールを止める(生成中のチャンクは捨てる)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self._pending.clear()
+
+    def chunk_of(self, x: int, y: int) -> tuple[int, int]:
+        """ワールドのセル(x, y)を含むチャンクの位置を返す."""
+        return x // self._size, y // self._size
+
+    def chunk(self, cx: int, cy: int) -> bytes:
+        """チャンクの壁を返す. なければ生成してメモリに置く.
+
+        Args:
+            cx (int): チャンクの横の位置.
+            cy (int): チャンクの縦の位置.
+
+        Returns:
+            bytes: 1セル1バイトの壁を行順に並べたもの(generate_chunkと同じ).
+        """
+        key = (cx, cy)
+        walls = self._chunks.get(key)
+        if walls is not None:
+            self._chunks.move_to_end(key)
+            self.hits += 1
+            return walls
+        future = self._pending.pop(key, None)
+        if future is not None:
+            walls = future.result()
+            self.hits += 1
+        else:
+            walls = generate_chunk(self._params, cx, cy)
+            self.misses += 1
+        self._store(key, walls)
+        return walls
+
+    def _store(self, key: tuple[int, int], walls: bytes) -> None:
+        """チャンクをメモリに置き、上限を超えたら古いものから捨てる."""
+        self._chunks[key] = walls
+        self._chunks.move_to_end(key)
+        while len(self._chunks) > self._resident:
+            self._chunks.popitem(last=False)
+
+    def _collect(self) -> None:
+        """生成し終わったprefetchのチャンクをメモリに移す."""
+        for key, future in list(self._pending.items()):
+            if future.done():
+                del self._pending[key]
+                if future.exception() is None:
+                    self._store(key, future.result())
+
+    def prefetch(self, cx: int, cy: int, radius: int = 1) -> int:
+        """(cx, cy)の周りのチャンクをプロセスプールで先に生成し始める.
+
+        結果は待たずに返る. 生成し終わったものは次のprefetchか
+        chunk()でメモリに移る.
+
+        Args:
+            cx (int): 中心のチャンクの横の位置.
+            cy (int): 中心のチャンクの縦の位置.
+            radius (int): 中心から何チャンク先までを生成するか.
+
+        Returns:
+            int: 新しく生成を始めたチャンクの数.
+        """
+        self._collect()
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self._workers)
+        # 生成中のものが溜まりすぎないよう、プロセス数の4倍までにする
+        limit = (self._workers or os.cpu_count() or 1) * 4
+        started = 0
+        # 中心に近い順に投入する
+        keys = sorted(
+            (
+                (cx + dx, cy + dy)
+                for dy in range(-radius, radius + 1)
+                for dx in range(-radius, radius + 1)
+            ),
+            key=lambda key: abs(key[0] - cx) + abs(key[1] - cy)
+        )
+        for key in keys:
+            if len(self._pending) >= limit:
+                break
+            if key in self._chunks or key in self._pending:
+                continue
+            self._pending[key] = self._executor.submit(
+                generate_chunk, self._params, key[0], key[1]
+            )
+            started += 1
+        return started
+
+    def cell(self, x: int, y: int) -> int:
+        """ワールドのセル(x, y)の壁(N=1, E=2, S=4, W=8)を返す."""
+        cx, lx = divmod(x, self._size)
+        cy, ly = divmod(y, self._size)
+        return self.chunk(cx, cy)[ly * self._size + lx]
+
+    def iter_region_rows(
+        self, x0: int, y0: int, width: int, height: int
+    ) -> Iterator[bytes]:
+        """ワールドの範囲を上の行から順に、1セル1バイトの壁の行で返す.
+
+        範囲の端の壁は開いていることがある(隣のセルへ続いている).
+
+        Args:
+            x0 (int): 範囲の左端のセル.
+            y0 (int): 範囲の上端のセル.
+            width (int): 範囲の幅.
+            height (int): 範囲の高さ.
+
+        Yields:
+            bytes: 各セルの壁の行(width バイト).
+        """
+        size = self._size
+        for y in range(y0, y0 + height):
+            cy, ly = divmod(y, size)
+            start = ly * size
+            row = bytearray()
+            x = x0
+            while x < x0 + width:
+                cx, lx = divmod(x, size)
+                end = min(size, lx + x0 + width - x)
+                row += self.chunk(cx, cy)[start + lx:start + end]
+                x += end - lx
+            yield bytes(row)
+
+    def region_walls(
+        self, x0: int, y0: int, width: int, height: int
+    ) -> bytearray:
+        """ワールドの範囲を外周の壁で閉じた1つの迷路にする.
+
+        Returns:
+            bytearray: 1セル1バイトの壁を行順にすき間なく並べたもの.
+        """
+        walls = bytearray().join(
+            self.iter_region_rows(x0, y0, width, height)
+        )
+        last = (height - 1) * width
+        for x in range(width):
+            walls[x] |= WALL_N
+            walls[last + x] |= WALL_S
+        for start in range(0, len(walls), width):
+            walls[start] |= WALL_W
+            walls[start + width - 1] |= WALL_E
+        return walls
+
+    def export_region(
+        self,
+        file_path: str,
+        x0: int,
+        y0: int,
+        width: int,
+        height: int,
+        entry_point: tuple[int, int] | None = None,
+        exit_point: tuple[int, int] | None = None,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+    ) -> ExportResult:
+        """ワールドの範囲を出力ファイル(maze.txt)の形式で書き込む.
+
+        範囲の外周は壁で閉じ、入口から出口までの最短経路も書き込む.
+        チャンクの境界に揃えた範囲なら全セルが繋がるが、チャンクの途中で
+        切ると扉が範囲の外になって繋がらないことがある(その時は経路は空).
+
+        Args:
+            file_path (str): 保存するファイルパス(拡張子で圧縮を選ぶ).
+            x0 (int): 範囲の左端のセル.
+            y0 (int): 範囲の上端のセル.
+            width (int): 範囲の幅.
+            height (int): 範囲の高さ.
+            entry_point (tuple[int, int] | None): 範囲の中の入口の座標.
+                Noneなら左上.
+            exit_point (tuple[int, int] | None): 範囲の中の出口の座標.
+                Noneなら右下.
+            buffer_size (int): まとめて書き込むバイト数.
+
+        Returns:
+            ExportResult: 書き込んだバイト数と行数.
+
+        Raises:
+            OSError: 書き込めなかった場合.
+            ValueError: 範囲や入口・出口が無効な場合.
+        """
+        if entry_point is None:
+            entry_point = (0, 0)
+        if exit_point is None:
+            exit_point = (width - 1, height - 1)
+        validate_points(width, height, entry_point, exit_point)
+        walls = self.region_walls(x0, y0, width, height)
+        path_str = solve_walls(walls, width, entry_point, exit_point)
+        hex_rows = (
+            bytes(walls[start:start + width]).translate(HEX_DIGITS)
+            for start in range(0, len(walls), width)
+        )
+        return write_maze_text(
+            file_path, hex_rows, entry_point, exit_point, path_str,
+            buffer_size
+        )